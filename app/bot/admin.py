@@ -1,30 +1,52 @@
 from __future__ import annotations
 
+import asyncio
 import csv
 import io
 import logging
+import tempfile
+import time
+from itertools import chain
+from typing import Iterable
 
-from aiogram import Router, F
-from aiogram.filters import Command
+from aiogram import Bot, Router, F
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.types import Message, BufferedInputFile
-from sqlalchemy import delete, select, update
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, BufferedInputFile, CallbackQuery, InlineKeyboardMarkup
 
 from app.config import settings
-from app.db import SessionMaker
-from app.models import Participant, PromoCode
+from app.db import SessionMaker, SqlStats, read_session
 from app.repositories.bot_texts import BotTextRepo
-from app.repositories.bot_config import BotConfigRepo
+from app.repositories.broadcasts import BroadcastRepo
 from app.repositories.participants import ParticipantRepo
-from app.repositories.promo_codes import PromoCodeRepo
+from app.repositories.promo_codes import BulkInsertResult, PromoCodeRepo
+from app.models import Broadcast
+from app.services.broadcast import BroadcastProgress, BroadcastService
+from app.services.campaigns import CampaignInfo, CampaignService
+from app.services.cleanup import CleanupService, ClearProgress
+from app.services.jobs import JobRegistry
+from app.services.profiler import Profiler
+from app.services.sql_stats import SqlStatsService
+from app.services.stats import PromoDashboard, StatsService
 from app.services.texts import TextService
+from app.tracing import span
+from app.utils.promo_codes import iter_codes, iter_csv_codes, parse_codes
 from app.bot.keyboards import (
     kb_main,
     kb_admin_main,
+    kb_admin_campaigns,
+    kb_admin_campaign_archive_confirm,
+    kb_admin_campaign_restore,
     kb_admin_texts,
     kb_admin_promos,
     kb_admin_confirm_clear,
+    kb_admin_stats,
+    kb_admin_job_cancel,
+    kb_admin_broadcast_audience,
+    kb_admin_broadcast_confirm,
+    kb_admin_back,
 )
 
 log = logging.getLogger(__name__)
@@ -37,24 +59,46 @@ class AdminStates(StatesGroup):
     waiting_limit = State()
     waiting_promo_list = State()
     confirm_clear_users = State()
+    waiting_broadcast_audience = State()
+    waiting_broadcast_text = State()
+    confirm_broadcast = State()
+    waiting_campaign = State()
 
 
 def is_admin(user_id: int | None) -> bool:
     return user_id is not None and user_id in settings.admin_ids
 
 
-def parse_codes(raw: str) -> list[str]:
-    codes: list[str] = []
-    for line in raw.splitlines():
-        parts = line.strip().split()
-        if not parts:
-            continue
-        if len(parts) == 1:
-            code = parts[0]
-        else:
-            code = "".join(parts)
-        codes.append(code)
-    return codes
+async def current_campaign(user_id: int) -> CampaignInfo:
+    """
+    Every admin works in one campaign at a time (chosen in «🗂 Кампании»).
+    """
+    return await CampaignService.get_admin_campaign(user_id)
+
+
+def text_scope(campaign: CampaignInfo) -> int | None:
+    # texts edited in the default campaign are shared by all campaigns; others get overrides
+    return None if campaign.slug == settings.default_campaign else campaign.id
+
+
+# Bot API refuses to serve files larger than this to bots.
+MAX_PROMO_FILE_SIZE = 20 * 1024 * 1024
+PROMO_FILE_EXTENSIONS = (".txt", ".csv")
+
+CLEAR_JOB = "clear_users"
+PROFILE_JOB = "profile"
+PROFILE_DEFAULT_SECONDS = 30.0
+BROADCAST_JOB_PREFIX = "broadcast:"
+BROADCAST_AUDIENCES: dict[str, str | None] = {
+    "👥 Всем": None,
+    "🎬 Победителям (cinema)": "cinema",
+    "🎁 С промокодом (promo)": "promo",
+    "📘 С гидом (guide)": "guide",
+}
+# Telegram rate-limits edits of a single message; keep progress updates sparse.
+PROGRESS_EDIT_INTERVAL = 3.0
+# how often worker 0 looks for broadcasts created by other worker processes
+BROADCAST_WATCH_INTERVAL = 5.0
 
 
 async def route_admin_action(m: Message, state: FSMContext) -> bool:
@@ -80,7 +124,13 @@ async def route_admin_action(m: Message, state: FSMContext) -> bool:
     if text == "🧹 Очистить пользователей":
         await admin_users_clear(m, state)
         return True
-    if text == "📊 Статистика промокодов":
+    if text == "📣 Рассылка":
+        await admin_broadcast(m, state)
+        return True
+    if text == "🗂 Кампании":
+        await admin_campaigns(m, state)
+        return True
+    if text in {"📊 Статистика", "📊 Статистика промокодов"}:
         await admin_promos_stats(m)
         return True
     if text in {"➕ Добавить промокоды", "♻️ Заменить промокоды"}:
@@ -95,7 +145,70 @@ async def admin_start(m: Message, state: FSMContext) -> None:
         await m.answer("Нет доступа.")
         return
     await state.clear()
-    await m.answer("Админ-панель", reply_markup=kb_admin_main())
+    campaign = await current_campaign(m.from_user.id)
+    await m.answer(f"Админ-панель\nКампания: {campaign.title} ({campaign.slug})", reply_markup=kb_admin_main())
+
+
+async def run_profile_job(status: Message, seconds: float) -> None:
+    report = await Profiler(settings.profile_interval).run(seconds)
+    worker = "" if settings.worker_index is None else f", воркер {settings.worker_index}"
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    await edit_status(
+        status,
+        f"🔬 Профилирование {'остановлено' if report.cancelled else 'завершено'}: "
+        f"{report.seconds:.0f} с, {report.samples} сэмплов{worker}.",
+    )
+    if report.samples:
+        await status.answer_document(
+            BufferedInputFile(report.collapsed().encode("utf-8"), filename=f"profile_{stamp}.folded"),
+            caption="Стеки в формате collapsed (flamegraph.pl, speedscope.app)",
+        )
+    await status.answer_document(
+        BufferedInputFile(report.summary().encode("utf-8"), filename=f"profile_{stamp}.txt"),
+        caption="Топ корутин и задержка event loop",
+    )
+
+
+@router.message(Command("profile"))
+async def admin_profile(m: Message, command: CommandObject) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        await m.answer("Нет доступа.")
+        return
+    try:
+        seconds = float(command.args) if command.args else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        await m.answer("Использование: /profile [секунды]")
+        return
+    if not 1 <= seconds <= settings.profile_max_seconds:
+        await m.answer(f"Длительность: от 1 до {settings.profile_max_seconds:.0f} секунд.")
+        return
+    if JobRegistry.is_running(PROFILE_JOB):
+        await m.answer("Профилирование уже выполняется.")
+        return
+    status = await m.answer(
+        f"🔬 Профилирование {seconds:.0f} с…", reply_markup=kb_admin_job_cancel(PROFILE_JOB)
+    )
+    JobRegistry.start(PROFILE_JOB, run_profile_job(status, seconds))
+
+
+@router.message(Command("sql"))
+async def admin_sql_stats(m: Message, command: CommandObject) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        await m.answer("Нет доступа.")
+        return
+    if not settings.sql_stats_enabled:
+        await m.answer("Статистика SQL выключена (SQL_STATS_ENABLED).")
+        return
+    if (command.args or "").strip() == "reset":
+        SqlStats.reset()
+        await m.answer("Статистика SQL сброшена.")
+        return
+    if not SqlStats.statements:
+        await m.answer("Запросов пока не было.")
+        return
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    data = BufferedInputFile(SqlStatsService.render_summary().encode("utf-8"), filename=f"sql_{stamp}.txt")
+    await m.answer_document(data, caption="SQL: время по запросам, ожидание блокировок, планы медленных запросов")
 
 
 @router.message(F.text == "Админ панель")
@@ -143,8 +256,9 @@ async def admin_text_key(m: Message, state: FSMContext) -> None:
     if key not in TextService.list_keys():
         await m.answer("Неизвестный ключ. Нажмите «Список ключей» и выберите корректный.")
         return
+    campaign = await current_campaign(m.from_user.id)
     async with SessionMaker() as session:
-        current = await TextService.get_text(session, key)
+        current = await TextService.get_text(session, key, campaign.id)
     await state.update_data(text_key=key)
     await state.set_state(AdminStates.waiting_text_value)
     await m.answer(
@@ -169,9 +283,11 @@ async def admin_text_value(m: Message, state: FSMContext) -> None:
     if not value:
         await m.answer("Пустой текст не сохранён. Отправьте новый текст.")
         return
+    campaign = await current_campaign(m.from_user.id)
     async with SessionMaker() as session:
         async with session.begin():
-            await BotTextRepo.set(session, key, value)
+            await BotTextRepo.set(session, key, value, text_scope(campaign))
+    TextService.invalidate()
     await m.answer(f"Текст для <code>{key}</code> обновлён.", reply_markup=kb_admin_texts())
     await state.set_state(AdminStates.waiting_text_key)
 
@@ -180,12 +296,10 @@ async def admin_text_value(m: Message, state: FSMContext) -> None:
 async def admin_limit(m: Message, state: FSMContext) -> None:
     if not is_admin(m.from_user.id if m.from_user else None):
         return
-    async with SessionMaker() as session:
-        current = await BotConfigRepo.get(session, "cinema_limit")
-        current_value = current.value if current else str(settings.cinema_limit)
+    campaign = await current_campaign(m.from_user.id)
     await state.set_state(AdminStates.waiting_limit)
     await m.answer(
-        f"Текущий лимит: {current_value}\nОтправьте новое число.",
+        f"Текущий лимит кампании {campaign.slug}: {campaign.limit}\nОтправьте новое число.",
         reply_markup=kb_admin_main(),
     )
 
@@ -200,9 +314,9 @@ async def admin_limit_value(m: Message, state: FSMContext) -> None:
     if not raw.isdigit():
         await m.answer("Нужно число. Или нажмите «↩️ Назад».")
         return
-    async with SessionMaker() as session:
-        async with session.begin():
-            await BotConfigRepo.set(session, "cinema_limit", raw)
+    campaign = await current_campaign(m.from_user.id)
+    await CampaignService.set_cinema_limit(campaign.id, int(raw))
+    StatsService.invalidate(campaign.id)
     await m.answer(f"Лимит обновлён: {raw}")
     await state.clear()
 
@@ -215,19 +329,56 @@ async def admin_promos(m: Message, state: FSMContext) -> None:
     await m.answer("Управление промокодами.", reply_markup=kb_admin_promos())
 
 
-@router.message(F.text == "📊 Статистика промокодов")
+def render_dashboard(campaign: CampaignInfo, dashboard: PromoDashboard) -> str:
+    cinema = dashboard.cinema
+    claim_rate = f"{cinema.used / cinema.total:.0%}" if cinema.total else "—"
+    sellout = dashboard.projected_sellout
+    sellout_text = sellout.strftime("%d.%m %H:%M UTC") if sellout else "—"
+    lines = [
+        "📊 Статистика",
+        f"Кампания: {campaign.title} ({campaign.slug})",
+        "",
+        "Промокоды cinema:",
+        f"Всего: {cinema.total}",
+        f"Использовано: {cinema.used} ({claim_rate})",
+        f"Свободно: {cinema.free}",
+        "",
+        f"Победителей: {dashboard.cinema_winners} из лимита {dashboard.cinema_limit}",
+        f"Осталось выдать: {dashboard.cinema_remaining}",
+        f"Выдано за последний час: {cinema.claimed_last_hour}",
+        f"Прогноз окончания: {sellout_text}",
+    ]
+    others = [item for kind, item in dashboard.kinds.items() if kind != "cinema"]
+    if others:
+        lines.append("")
+        lines.extend(f"{item.kind}: {item.used}/{item.total}, свободно {item.free}" for item in others)
+    lines.append("")
+    lines.append(f"Обновлено: {dashboard.generated_at.strftime('%H:%M:%S UTC')}")
+    return "\n".join(lines)
+
+
+@router.message(F.text.in_(["📊 Статистика", "📊 Статистика промокодов"]))
 async def admin_promos_stats(m: Message) -> None:
     if not is_admin(m.from_user.id if m.from_user else None):
         return
-    async with SessionMaker() as session:
-        stats = await PromoCodeRepo.stats(session, kind="cinema")
-    await m.answer(
-        f"Промокоды cinema:\n"
-        f"Всего: {stats['total']}\n"
-        f"Использовано: {stats['used']}\n"
-        f"Свободно: {stats['free']}",
-        reply_markup=kb_admin_promos(),
-    )
+    campaign = await current_campaign(m.from_user.id)
+    dashboard = await StatsService.get_dashboard(campaign.id)
+    await m.answer(render_dashboard(campaign, dashboard), reply_markup=kb_admin_stats())
+
+
+@router.callback_query(F.data == "admin_stats_refresh")
+async def admin_stats_refresh(cb: CallbackQuery) -> None:
+    if not is_admin(cb.from_user.id if cb.from_user else None):
+        await cb.answer()
+        return
+    campaign = await current_campaign(cb.from_user.id)
+    dashboard = await StatsService.get_dashboard(campaign.id)
+    await cb.answer()
+    try:
+        await cb.message.edit_text(render_dashboard(campaign, dashboard), reply_markup=kb_admin_stats())
+    except TelegramBadRequest:
+        # "message is not modified" — the cached snapshot has not changed yet
+        pass
 
 
 @router.message(F.text.in_(["➕ Добавить промокоды", "♻️ Заменить промокоды"]))
@@ -238,11 +389,42 @@ async def admin_promos_mode(m: Message, state: FSMContext) -> None:
     await state.update_data(promo_mode=mode)
     await state.set_state(AdminStates.waiting_promo_list)
     await m.answer(
-        "Отправьте список промокодов (по одному на строку). Формат может быть `80 88151262` или `8088151262`.",
+        "Отправьте список промокодов (по одному на строку) или файл .txt/.csv. "
+        "Формат может быть `80 88151262` или `8088151262`.",
         reply_markup=kb_admin_promos(),
     )
 
 
+async def import_promo_codes(campaign_id: int, mode: str, codes: Iterable[str]) -> BulkInsertResult | None:
+    codes = iter(codes)
+    first = next(codes, None)
+    if first is None:
+        return None
+    with span("admin.promo_import", **{"promo.mode": mode}) as current:
+        async with SessionMaker() as session:
+            async with session.begin():
+                if mode == "replace":
+                    await PromoCodeRepo.delete_kind(session, campaign_id, kind="cinema")
+                result = await PromoCodeRepo.bulk_insert(session, campaign_id, chain([first], codes), kind="cinema")
+        if current is not None:
+            current.set(**{"promo.total": result.total, "promo.inserted": result.inserted})
+    StatsService.invalidate(campaign_id)
+    return result
+
+
+async def import_promo_document(m: Message, campaign_id: int, mode: str) -> BulkInsertResult | None:
+    document = m.document
+    filename = (document.file_name or "").lower()
+    log.info("Importing promo codes from document", extra={"file_name": document.file_name, "size": document.file_size})
+    with tempfile.TemporaryFile() as tmp:
+        with span("admin.promo_download", **{"file.size": document.file_size or 0}):
+            await m.bot.download(document, destination=tmp)
+        tmp.seek(0)
+        with io.TextIOWrapper(tmp, encoding="utf-8-sig", errors="replace", newline="") as stream:
+            codes = iter_csv_codes(stream) if filename.endswith(".csv") else iter_codes(stream)
+            return await import_promo_codes(campaign_id, mode, codes)
+
+
 @router.message(AdminStates.waiting_promo_list)
 async def admin_promos_list(m: Message, state: FSMContext) -> None:
     if not is_admin(m.from_user.id if m.from_user else None):
@@ -251,26 +433,23 @@ async def admin_promos_list(m: Message, state: FSMContext) -> None:
         return
     data = await state.get_data()
     mode = data.get("promo_mode", "add")
-    codes = parse_codes(m.text or "")
-    if not codes:
+    campaign = await current_campaign(m.from_user.id)
+    if m.document:
+        if not (m.document.file_name or "").lower().endswith(PROMO_FILE_EXTENSIONS):
+            await m.answer("Поддерживаются только файлы .txt и .csv.")
+            return
+        if m.document.file_size and m.document.file_size > MAX_PROMO_FILE_SIZE:
+            await m.answer("Файл больше 20 МБ — разбейте его на несколько частей.")
+            return
+        result = await import_promo_document(m, campaign.id, mode)
+    else:
+        result = await import_promo_codes(campaign.id, mode, parse_codes(m.text or ""))
+    if result is None:
         await m.answer("Список пуст. Отправьте промокоды ещё раз.")
         return
-    inserted = 0
-    async with SessionMaker() as session:
-        async with session.begin():
-            if mode == "replace":
-                await session.execute(delete(PromoCode).where(PromoCode.kind == "cinema"))
-                existing_codes = set()
-            else:
-                existing = await session.execute(select(PromoCode.code).where(PromoCode.kind == "cinema"))
-                existing_codes = {row[0] for row in existing.fetchall()}
-            for code in codes:
-                if code in existing_codes:
-                    continue
-                session.add(PromoCode(kind="cinema", code=code))
-                inserted += 1
     await m.answer(
-        f"Промокоды обработаны. Добавлено: {inserted} (режим: {mode}).",
+        f"Промокоды обработаны ({campaign.slug}). Добавлено: {result.inserted}, дубликатов: {result.duplicates} "
+        f"(режим: {mode}).",
         reply_markup=kb_admin_promos(),
     )
     await state.clear()
@@ -280,8 +459,9 @@ async def admin_promos_list(m: Message, state: FSMContext) -> None:
 async def admin_users_list(m: Message) -> None:
     if not is_admin(m.from_user.id if m.from_user else None):
         return
-    async with SessionMaker() as session:
-        participants = await ParticipantRepo.list_all(session)
+    campaign = await current_campaign(m.from_user.id)
+    async with read_session() as session:
+        participants = await ParticipantRepo.list_all(session, campaign.id)
     if not participants:
         await m.answer("Пользователей пока нет.", reply_markup=kb_admin_main())
         return
@@ -290,7 +470,7 @@ async def admin_users_list(m: Message) -> None:
     writer.writerow(["id", "telegram_id", "email", "reward_type", "promo_code", "created_at"])
     for p in participants:
         writer.writerow([p.id, p.telegram_id, p.email, p.reward_type, p.promo_code, p.created_at])
-    data = BufferedInputFile(output.getvalue().encode("utf-8"), filename="participants.csv")
+    data = BufferedInputFile(output.getvalue().encode("utf-8"), filename=f"participants_{campaign.slug}.csv")
     await m.answer_document(data, caption="Список пользователей", reply_markup=kb_admin_main())
 
 
@@ -298,44 +478,431 @@ async def admin_users_list(m: Message) -> None:
 async def admin_users_clear(m: Message, state: FSMContext) -> None:
     if not is_admin(m.from_user.id if m.from_user else None):
         return
+    campaign = await current_campaign(m.from_user.id)
     await state.set_state(AdminStates.confirm_clear_users)
     await m.answer(
-        "Это удалит всех пользователей из БД. Подтвердите действие.",
+        f"Это удалит всех пользователей кампании {campaign.slug}. Подтвердите действие.",
         reply_markup=kb_admin_confirm_clear(),
     )
 
 
+async def edit_status(status: Message, text: str, reply_markup: InlineKeyboardMarkup | None = None) -> None:
+    try:
+        await status.edit_text(text, reply_markup=reply_markup)
+    except TelegramBadRequest:
+        log.debug("Status message not edited", exc_info=True)
+
+
+def render_clear_progress(progress: ClearProgress) -> str:
+    lines = ["🧹 Очистка пользователей", f"Удалено пользователей: {progress.participants_deleted}"]
+    if progress.reset_promos:
+        lines.append(f"Сброшено промокодов: {progress.promo_codes_reset}")
+    return "\n".join(lines)
+
+
+async def run_clear_job(status: Message, campaign_id: int, reset_promos: bool) -> None:
+    progress = ClearProgress(campaign_id=campaign_id, reset_promos=reset_promos)
+    last_edit = time.monotonic()
+
+    async def report(current: ClearProgress) -> None:
+        nonlocal last_edit
+        if time.monotonic() - last_edit < PROGRESS_EDIT_INTERVAL:
+            return
+        last_edit = time.monotonic()
+        await edit_status(status, render_clear_progress(current), reply_markup=kb_admin_job_cancel(CLEAR_JOB))
+
+    try:
+        await CleanupService.clear_participants(progress, on_batch=report)
+    except asyncio.CancelledError:
+        await edit_status(status, render_clear_progress(progress) + "\n\n⛔ Остановлено.")
+        raise
+    except Exception:
+        log.exception("Clear users job failed")
+        await edit_status(status, render_clear_progress(progress) + "\n\n❌ Ошибка, подробности в логах.")
+        return
+    finally:
+        StatsService.invalidate(campaign_id)
+    await edit_status(status, render_clear_progress(progress) + "\n\n✅ Готово.")
+
+
+async def start_clear_job(m: Message, state: FSMContext, reset_promos: bool) -> None:
+    await state.clear()
+    if JobRegistry.is_running(CLEAR_JOB):
+        await m.answer("Очистка уже выполняется.", reply_markup=kb_admin_main())
+        return
+    await m.answer("Очистка запущена в фоне, бот продолжает работать.", reply_markup=kb_admin_main())
+    status = await m.answer("🧹 Очистка пользователей…", reply_markup=kb_admin_job_cancel(CLEAR_JOB))
+    campaign = await current_campaign(m.from_user.id)
+    JobRegistry.start(CLEAR_JOB, run_clear_job(status, campaign.id, reset_promos=reset_promos))
+
+
 @router.message(AdminStates.confirm_clear_users, F.text == "✅ Очистить пользователей")
 async def admin_users_clear_confirm(m: Message, state: FSMContext) -> None:
     if not is_admin(m.from_user.id if m.from_user else None):
         return
-    async with SessionMaker() as session:
-        async with session.begin():
-            await session.execute(delete(Participant))
-    await m.answer("Пользователи удалены.", reply_markup=kb_admin_main())
-    await state.clear()
+    await start_clear_job(m, state, reset_promos=False)
 
 
 @router.message(AdminStates.confirm_clear_users, F.text == "✅ Очистить пользователей + промокоды")
 async def admin_users_clear_confirm_with_promos(m: Message, state: FSMContext) -> None:
     if not is_admin(m.from_user.id if m.from_user else None):
         return
+    await start_clear_job(m, state, reset_promos=True)
+
+
+@router.callback_query(F.data.startswith("admin_job_cancel:"))
+async def admin_job_cancel(cb: CallbackQuery) -> None:
+    if not is_admin(cb.from_user.id if cb.from_user else None):
+        await cb.answer()
+        return
+    job_name = cb.data.split(":", 1)[1]
+    if job_name.startswith(BROADCAST_JOB_PREFIX):
+        # the DB status stops it in whichever process sends it and keeps it from being resumed after a restart
+        cancelled = await BroadcastService.cancel(int(job_name.removeprefix(BROADCAST_JOB_PREFIX)))
+        JobRegistry.cancel(job_name)
+    elif JobRegistry.cancel(job_name):
+        cancelled = True
+    elif settings.worker_index is not None:
+        # the job may be running in another worker process
+        await JobRegistry.request_cancel(job_name)
+        cancelled = True
+    else:
+        cancelled = False
+    if cancelled:
+        await cb.answer("Останавливаю…")
+    else:
+        await cb.answer("Задача уже завершена.")
+
+
+@router.message(AdminStates.confirm_clear_users)
+async def admin_users_clear_cancel(m: Message, state: FSMContext) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        return
+    if await route_admin_action(m, state):
+        return
+    await state.clear()
+    await m.answer("Отменено.", reply_markup=kb_admin_main())
+
+
+def render_broadcast_progress(progress: BroadcastProgress) -> str:
+    eta = progress.eta_seconds
+    eta_text = f"{int(eta // 60)} мин {int(eta % 60)} с" if eta is not None else "—"
+    return (
+        f"📣 Рассылка #{progress.broadcast_id}\n"
+        f"Получателей: {progress.total}\n"
+        f"Отправлено: {progress.sent}\n"
+        f"Заблокировали бота: {progress.blocked}\n"
+        f"Ошибок: {progress.failed}\n"
+        f"Осталось: {eta_text}"
+    )
+
+
+async def edit_broadcast_status(
+    bot: Bot,
+    broadcast: Broadcast,
+    text: str,
+    reply_markup: InlineKeyboardMarkup | None = None,
+) -> None:
+    if not broadcast.status_message_id:
+        return
+    try:
+        await bot.edit_message_text(
+            text,
+            chat_id=broadcast.admin_chat_id,
+            message_id=broadcast.status_message_id,
+            reply_markup=reply_markup,
+        )
+    except TelegramBadRequest:
+        log.debug("Broadcast status message not edited", exc_info=True)
+
+
+async def run_broadcast_job(bot: Bot, broadcast: Broadcast) -> None:
+    job_name = f"{BROADCAST_JOB_PREFIX}{broadcast.id}"
+    progress = BroadcastProgress.from_model(broadcast)
+    last_edit = 0.0
+
+    async def report(current: BroadcastProgress) -> None:
+        nonlocal progress, last_edit
+        progress = current
+        if time.monotonic() - last_edit < PROGRESS_EDIT_INTERVAL:
+            return
+        last_edit = time.monotonic()
+        await edit_broadcast_status(
+            bot, broadcast, render_broadcast_progress(current), reply_markup=kb_admin_job_cancel(job_name)
+        )
+
+    try:
+        progress = await BroadcastService.run(bot, broadcast, on_page=report)
+        if progress.cancelled:
+            await edit_broadcast_status(bot, broadcast, render_broadcast_progress(progress) + "\n\n⛔ Остановлено.")
+            return
+    except asyncio.CancelledError:
+        await edit_broadcast_status(bot, broadcast, render_broadcast_progress(progress) + "\n\n⛔ Остановлено.")
+        raise
+    except Exception:
+        log.exception("Broadcast job failed", extra={"broadcast_id": broadcast.id})
+        await edit_broadcast_status(
+            bot,
+            broadcast,
+            render_broadcast_progress(progress) + "\n\n❌ Ошибка, рассылка продолжится после перезапуска.",
+        )
+        return
+    await edit_broadcast_status(bot, broadcast, render_broadcast_progress(progress) + "\n\n✅ Готово.")
+
+
+def start_broadcast_job(bot: Bot, broadcast: Broadcast) -> None:
+    JobRegistry.start(f"{BROADCAST_JOB_PREFIX}{broadcast.id}", run_broadcast_job(bot, broadcast))
+
+
+async def resume_broadcasts(bot: Bot) -> None:
+    async with SessionMaker() as session:
+        broadcasts = await BroadcastRepo.list_running(session)
+    for broadcast in broadcasts:
+        if JobRegistry.is_running(f"{BROADCAST_JOB_PREFIX}{broadcast.id}"):
+            continue
+        log.info("Resuming broadcast", extra={"broadcast_id": broadcast.id})
+        start_broadcast_job(bot, broadcast)
+
+
+async def watch_broadcasts(bot: Bot, interval: float = BROADCAST_WATCH_INTERVAL) -> None:
+    """
+    Multi-process mode: broadcasts are sent by worker 0 only, so two processes never share
+    one rate limit or send the same page. Broadcasts created on other workers are picked up here.
+    """
+    while True:
+        try:
+            await resume_broadcasts(bot)
+        except Exception:
+            log.exception("Failed to pick up broadcasts")
+        await asyncio.sleep(interval)
+
+
+@router.message(F.text == "📣 Рассылка")
+async def admin_broadcast(m: Message, state: FSMContext) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        return
+    await state.set_state(AdminStates.waiting_broadcast_audience)
+    await m.answer("Кому отправить рассылку?", reply_markup=kb_admin_broadcast_audience(list(BROADCAST_AUDIENCES)))
+
+
+@router.message(AdminStates.waiting_broadcast_audience)
+async def admin_broadcast_audience(m: Message, state: FSMContext) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        return
+    if await route_admin_action(m, state):
+        return
+    audience = (m.text or "").strip()
+    if audience not in BROADCAST_AUDIENCES:
+        await m.answer("Выберите получателей кнопкой ниже.")
+        return
+    await state.update_data(broadcast_audience=audience)
+    await state.set_state(AdminStates.waiting_broadcast_text)
+    await m.answer("Отправьте текст рассылки.", reply_markup=kb_admin_back())
+
+
+@router.message(AdminStates.waiting_broadcast_text)
+async def admin_broadcast_text(m: Message, state: FSMContext) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        return
+    if await route_admin_action(m, state):
+        return
+    value = (m.html_text or m.text or "").strip()
+    if not value:
+        await m.answer("Пустой текст. Отправьте текст рассылки.")
+        return
+    data = await state.get_data()
+    audience = data.get("broadcast_audience", "👥 Всем")
+    campaign = await current_campaign(m.from_user.id)
+    async with read_session() as session:
+        total = await ParticipantRepo.count_recipients(
+            session, campaign.id, reward_type=BROADCAST_AUDIENCES.get(audience)
+        )
+    await state.update_data(broadcast_text=value)
+    await state.set_state(AdminStates.confirm_broadcast)
+    await m.answer(
+        f"Кампания {campaign.slug}. Получатели: {audience}, всего {total}. Так будет выглядеть сообщение:",
+        reply_markup=kb_admin_broadcast_confirm(),
+    )
+    await m.answer(value)
+
+
+@router.message(AdminStates.confirm_broadcast, F.text == "✅ Отправить рассылку")
+async def admin_broadcast_confirm(m: Message, state: FSMContext) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        return
+    data = await state.get_data()
+    await state.clear()
+    text = data.get("broadcast_text")
+    if not text:
+        await m.answer("Текст не найден. Начните заново.", reply_markup=kb_admin_main())
+        return
+    reward_type = BROADCAST_AUDIENCES.get(data.get("broadcast_audience", "👥 Всем"))
+    campaign = await current_campaign(m.from_user.id)
     async with SessionMaker() as session:
         async with session.begin():
-            await session.execute(delete(Participant))
-            await session.execute(
-                update(PromoCode)
-                .values(is_used=False, used_by_participant_id=None, used_at=None)
+            total = await ParticipantRepo.count_recipients(session, campaign.id, reward_type=reward_type)
+            broadcast = await BroadcastRepo.create(
+                session, campaign.id, text=text, reward_type=reward_type, admin_chat_id=m.chat.id, total=total
             )
-    await m.answer("Пользователи удалены, промокоды сброшены.", reply_markup=kb_admin_main())
+    await m.answer("Рассылка запущена в фоне.", reply_markup=kb_admin_main())
+    status = await m.answer(
+        f"📣 Рассылка #{broadcast.id}: {total} получателей…",
+        reply_markup=kb_admin_job_cancel(f"{BROADCAST_JOB_PREFIX}{broadcast.id}"),
+    )
+    broadcast.status_message_id = status.message_id
+    async with SessionMaker() as session:
+        async with session.begin():
+            await BroadcastRepo.set_status_message(session, broadcast.id, status.message_id)
+    if settings.is_primary_worker:
+        start_broadcast_job(m.bot, broadcast)
+
+
+@router.message(AdminStates.confirm_broadcast)
+async def admin_broadcast_cancel(m: Message, state: FSMContext) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        return
+    if await route_admin_action(m, state):
+        return
     await state.clear()
+    await m.answer("Рассылка отменена.", reply_markup=kb_admin_main())
 
 
-@router.message(AdminStates.confirm_clear_users)
-async def admin_users_clear_cancel(m: Message, state: FSMContext) -> None:
+async def render_campaigns(admin_id: int) -> tuple[str, InlineKeyboardMarkup]:
+    current = await current_campaign(admin_id)
+    campaigns = await CampaignService.list_all()
+    text = (
+        f"🗂 Кампании\nТекущая: {current.title} ({current.slug})\n\n"
+        "Ссылка для участников: t.me/<бот>?start=<slug>"
+    )
+    items = [(item.id, f"{item.title} ({item.slug})") for item in campaigns if item.is_active]
+    # archived but still attached: the archive can be cancelled until the detach comes due
+    pending = [(item.id, f"{item.title} ({item.slug})") for item in campaigns if item.detach_after]
+    return text, kb_admin_campaigns(items, current.id, pending)
+
+
+@router.message(F.text == "🗂 Кампании")
+async def admin_campaigns(m: Message, state: FSMContext) -> None:
+    if not is_admin(m.from_user.id if m.from_user else None):
+        return
+    await state.clear()
+    text, markup = await render_campaigns(m.from_user.id)
+    await m.answer(text, reply_markup=markup)
+
+
+@router.callback_query(F.data.startswith("admin_campaign_select:"))
+async def admin_campaign_select(cb: CallbackQuery) -> None:
+    if not is_admin(cb.from_user.id if cb.from_user else None):
+        await cb.answer()
+        return
+    campaign = await CampaignService.get(int(cb.data.split(":", 1)[1]))
+    if campaign is None or not campaign.is_active:
+        await cb.answer("Кампания не найдена или в архиве.")
+        return
+    await CampaignService.set_admin_campaign(cb.from_user.id, campaign.id)
+    await cb.answer(f"Текущая кампания: {campaign.slug}")
+    text, markup = await render_campaigns(cb.from_user.id)
+    await edit_status(cb.message, text, reply_markup=markup)
+
+
+@router.callback_query(F.data == "admin_campaign_new")
+async def admin_campaign_new(cb: CallbackQuery, state: FSMContext) -> None:
+    if not is_admin(cb.from_user.id if cb.from_user else None):
+        await cb.answer()
+        return
+    await cb.answer()
+    await state.set_state(AdminStates.waiting_campaign)
+    await cb.message.answer(
+        "Отправьте кампанию в формате:\n<code>slug | Название | list_id | лимит</code>\n"
+        "list_id и лимит можно не указывать — тогда используются общие настройки.",
+        reply_markup=kb_admin_back(),
+    )
+
+
+@router.message(AdminStates.waiting_campaign)
+async def admin_campaign_create(m: Message, state: FSMContext) -> None:
     if not is_admin(m.from_user.id if m.from_user else None):
         return
     if await route_admin_action(m, state):
         return
+    parts = [item.strip() for item in (m.text or "").split("|")]
+    slug = parts[0].lower() if parts else ""
+    title = parts[1] if len(parts) > 1 else ""
+    list_id = parts[2] if len(parts) > 2 and parts[2] else None
+    raw_limit = parts[3] if len(parts) > 3 else ""
+    if not slug.replace("_", "").replace("-", "").isalnum() or len(slug) > 64 or not title:
+        await m.answer("Нужны slug (латиница, цифры, - и _) и название через «|».")
+        return
+    if raw_limit and not raw_limit.isdigit():
+        await m.answer("Лимит должен быть числом.")
+        return
+    if await CampaignService.get_by_slug(slug):
+        await m.answer("Кампания с таким slug уже есть.")
+        return
+    campaign = await CampaignService.create(slug, title, list_id, int(raw_limit) if raw_limit else None)
+    await CampaignService.set_admin_campaign(m.from_user.id, campaign.id)
     await state.clear()
-    await m.answer("Отменено.", reply_markup=kb_admin_main())
+    await m.answer(
+        f"Кампания {campaign.title} ({campaign.slug}) создана и выбрана текущей.\n"
+        "Не забудьте загрузить для неё промокоды.",
+        reply_markup=kb_admin_main(),
+    )
+
+
+@router.callback_query(F.data == "admin_campaign_archive")
+async def admin_campaign_archive(cb: CallbackQuery) -> None:
+    if not is_admin(cb.from_user.id if cb.from_user else None):
+        await cb.answer()
+        return
+    await cb.answer()
+    campaign = await current_campaign(cb.from_user.id)
+    if campaign.slug == settings.default_campaign:
+        await cb.message.answer("Кампанию по умолчанию архивировать нельзя.")
+        return
+    await cb.message.answer(
+        f"Архивировать {campaign.title} ({campaign.slug})? Новые участники попадут в кампанию по умолчанию, "
+        "данные кампании будут отсоединены от основных таблиц.",
+        reply_markup=kb_admin_campaign_archive_confirm(campaign.id),
+    )
+
+
+@router.callback_query(F.data.startswith("admin_campaign_archive_confirm:"))
+async def admin_campaign_archive_confirm(cb: CallbackQuery) -> None:
+    if not is_admin(cb.from_user.id if cb.from_user else None):
+        await cb.answer()
+        return
+    campaign_id = int(cb.data.split(":", 1)[1])
+    await cb.answer("Архивирую…")
+    try:
+        detach_after = await CampaignService.deactivate(campaign_id)
+    except ValueError as e:
+        await cb.message.answer(str(e))
+        return
+    except Exception:
+        log.exception("Campaign archive failed", extra={"campaign_id": campaign_id})
+        await cb.message.answer("❌ Не удалось архивировать кампанию, подробности в логах.")
+        return
+    StatsService.invalidate(campaign_id)
+    # other processes still hold the campaign as active in their cache, so the partitions are
+    # detached later by the primary worker, once detach_after has passed
+    when = detach_after.astimezone().strftime("%H:%M:%S") if detach_after else "—"
+    await edit_status(
+        cb.message,
+        "🗄 Кампания отключена, новые участники попадают в кампанию по умолчанию. "
+        f"Таблицы будут отсоединены после {when}; до этого архивацию можно отменить.",
+        reply_markup=kb_admin_campaign_restore(campaign_id),
+    )
+
+
+@router.callback_query(F.data.startswith("admin_campaign_restore:"))
+async def admin_campaign_restore(cb: CallbackQuery) -> None:
+    if not is_admin(cb.from_user.id if cb.from_user else None):
+        await cb.answer()
+        return
+    campaign_id = int(cb.data.split(":", 1)[1])
+    if not await CampaignService.restore(campaign_id):
+        await cb.answer("Таблицы уже отсоединяются, отменить нельзя.", show_alert=True)
+        return
+    await cb.answer("Архивация отменена")
+    StatsService.invalidate(campaign_id)
+    text, markup = await render_campaigns(cb.from_user.id)
+    await edit_status(cb.message, "↩️ Кампания снова активна.\n\n" + text, reply_markup=markup)
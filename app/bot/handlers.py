@@ -1,72 +1,122 @@
 from __future__ import annotations
 
 import logging
+import time
 
 from aiogram import Router, F
-from aiogram.filters import CommandStart
+from aiogram.filters import CommandObject, CommandStart
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
 
-from app.db import SessionMaker
+from app.db import SessionMaker, read_session
+from app.services.campaigns import CampaignService
+from app.services.events import EventLog, elapsed_ms
 from app.services.unisender import unisender
-from app.services.rewards import RewardService
+from app.services.pending import PendingVerificationService
+from app.services.rewards import ClaimResult, RewardService
 from app.services.texts import TextService
 from app.utils.validators import normalize_email
 from app.bot.keyboards import kb_retry_check, kb_main
 from app.config import settings
+from app.metrics import EMAIL_FLOW_OUTCOMES, EMAIL_FLOW_STAGE_SECONDS, REWARDS_ASSIGNED, track_stage
+from app.repositories.broadcasts import BlockedUserRepo
 from app.repositories.participants import ParticipantRepo
+from app.tracing import span
 
 log = logging.getLogger(__name__)
 router = Router()
 
 
+def record_outcome(outcome: str, campaign_id: int, telegram_id: int, started: float, **fields) -> None:
+    # the event is buffered; nothing here waits on the DB
+    EMAIL_FLOW_OUTCOMES.labels(outcome).inc()
+    EventLog.record(outcome, campaign_id, telegram_id, elapsed_ms(started), **fields)
+
+
 @router.message(CommandStart())
-async def start(m: Message) -> None:
-    log.info("Start command received", extra={"telegram_id": m.from_user.id if m.from_user else None})
-    text = await TextService.get_text_global("welcome")
+async def start(m: Message, command: CommandObject, state: FSMContext) -> None:
+    # deep link t.me/<bot>?start=<slug> picks the campaign; a plain /start keeps the default one
+    campaign = await CampaignService.resolve(slug=command.args)
+    await state.update_data(campaign_id=campaign.id)
+    log.info(
+        "Start command received",
+        extra={"telegram_id": m.from_user.id if m.from_user else None, "campaign_id": campaign.id},
+    )
+    if m.from_user:
+        # a user who blocked the bot and came back gets broadcasts again; almost nobody is in
+        # blocked_users, so /start only reads and the primary sees a write for the few who are
+        async with read_session() as session:
+            blocked = await BlockedUserRepo.exists(session, m.from_user.id)
+        if blocked:
+            async with SessionMaker() as session:
+                async with session.begin():
+                    await BlockedUserRepo.remove(session, m.from_user.id)
+    text = await TextService.get_text_global("welcome", campaign.id)
     is_admin = m.from_user and m.from_user.id in settings.admin_ids
     await m.answer(text, reply_markup=kb_main(bool(is_admin)))
 
 
 @router.callback_query(F.data == "check_again")
-async def check_again(cb: CallbackQuery) -> None:
+async def check_again(cb: CallbackQuery, state: FSMContext) -> None:
     log.info(
         "Check again callback",
         extra={"telegram_id": cb.from_user.id if cb.from_user else None},
     )
     await cb.answer()
-    text = await TextService.get_text_global("check_again_prompt")
+    campaign = await CampaignService.resolve(campaign_id=(await state.get_data()).get("campaign_id"))
+    text = await TextService.get_text_global("check_again_prompt", campaign.id)
     await cb.message.answer(text)
 
 
-@router.message(F.text)
-async def email_flow(m: Message) -> None:
+# the flag puts the handler behind AdmissionMiddleware
+@router.message(F.text, flags={"admission": True})
+async def email_flow(m: Message, state: FSMContext) -> None:
     if (m.text or "").strip() == "Админ панель":
         return
+    started = time.perf_counter()
+    campaign = await CampaignService.resolve(campaign_id=(await state.get_data()).get("campaign_id"))
     tg_id = m.from_user.id if m.from_user else 0
     if tg_id == 0:
         log.error("Telegram ID not found in message")
-        text = await TextService.get_text_global("telegram_id_missing")
+        record_outcome("telegram_id_missing", campaign.id, tg_id, started)
+        text = await TextService.get_text_global("telegram_id_missing", campaign.id)
         await m.answer(text)
         return
 
     # 1) validate email
     try:
-        email = normalize_email(m.text or "")
+        with track_stage("validate"), span("email_flow.validate"):
+            email = normalize_email(m.text or "")
     except ValueError:
         log.warning("Invalid email received", extra={"telegram_id": tg_id, "text": m.text})
-        text = await TextService.get_text_global("invalid_email")
-        await m.answer(text)
+        record_outcome("invalid_email", campaign.id, tg_id, started)
+        text = await TextService.get_text_global("invalid_email", campaign.id)
+        with track_stage("reply"), span("email_flow.reply"):
+            await m.answer(text)
         return
-    log.info("Email received", extra={"telegram_id": tg_id, "email": email})
+    log.info("Email received", extra={"telegram_id": tg_id, "email": email, "campaign_id": campaign.id})
 
     # 2) check Unisender confirmation + list membership
+    unisender_started = time.perf_counter()
     try:
-        status = await unisender.check_confirmed_in_list(email=email, list_id=settings.unisender_list_id)
+        with track_stage("unisender"), span("email_flow.unisender"):
+            status = await unisender.check_confirmed_in_list(email=email, list_id=campaign.list_id)
     except Exception:
         log.exception("Unisender check failed")
-        text = await TextService.get_text_global("unisender_unavailable")
-        await m.answer(text)
+        record_outcome(
+            "unisender_unavailable",
+            campaign.id,
+            tg_id,
+            started,
+            email=email,
+            unisender_ms=elapsed_ms(unisender_started),
+        )
+        text = await TextService.get_text_global("unisender_unavailable", campaign.id)
+        with track_stage("reply"), span("email_flow.reply"):
+            await m.answer(text)
+        await PendingVerificationService.enqueue(campaign.id, tg_id, email, "unisender_unavailable")
         return
+    unisender_ms = elapsed_ms(unisender_started)
     log.debug(
         "Unisender status fetched",
         extra={
@@ -84,58 +134,98 @@ async def email_flow(m: Message) -> None:
         log.warning("Email not confirmed", extra={"email": email, "status": status})
         # explain precisely based on statuses (invited is the typical "not confirmed yet")  [oai_citation:3‡Unisender](https://www.unisender.com/ru/support/api/contacts/getcontact/)
         if status.email_status == "invited":
-            template = await TextService.get_text_global("not_confirmed_invited")
+            text_key = "not_confirmed_invited"
+            template = await TextService.get_text_global(text_key, campaign.id)
             reason = template
         elif status.email_status in {"new", None}:
-            template = await TextService.get_text_global("not_confirmed_new")
+            text_key = "not_confirmed_new"
+            template = await TextService.get_text_global(text_key, campaign.id)
             reason = template
         elif status.email_status in {"unsubscribed", "blocked", "inactive"}:
-            template = await TextService.get_text_global("not_confirmed_unsubscribed")
+            text_key = "not_confirmed_unsubscribed"
+            template = await TextService.get_text_global(text_key, campaign.id)
             reason = template.format(email_status=status.email_status)
         else:
-            template = await TextService.get_text_global("not_confirmed_other")
+            text_key = "not_confirmed_other"
+            template = await TextService.get_text_global(text_key, campaign.id)
             reason = template.format(
                 email_status=status.email_status,
                 in_list=status.in_list,
                 list_status=status.list_status,
             )
 
-        await m.answer(reason, reply_markup=kb_retry_check())
+        record_outcome(
+            text_key,
+            campaign.id,
+            tg_id,
+            started,
+            email=email,
+            email_status=status.email_status,
+            unisender_ms=unisender_ms,
+        )
+        with track_stage("reply"), span("email_flow.reply"):
+            await m.answer(reason, reply_markup=kb_retry_check())
+        # only "invited" can still turn active on its own; the service ignores other keys
+        await PendingVerificationService.enqueue(campaign.id, tg_id, email, text_key)
         return
 
-    # 3) confirmed: DB transaction: create participant + assign reward atomically
-    async with SessionMaker() as session:
-        async with session.begin():
-            log.info("Creating or loading participant", extra={"telegram_id": tg_id, "email": email})
-            participant = await ParticipantRepo.create_if_missing(session, telegram_id=tg_id, email=email)
-
-            # if already rewarded — show the same
-            if participant.reward_type:
+    # 3) confirmed: repeat submissions are answered from the read replica without touching the primary
+    already_rewarded_text: str | None = None
+    rewarded_type: str | None = None
+    db_started = time.perf_counter()
+    with span("email_flow.db.precheck"):
+        async with read_session() as session:
+            existing = await ParticipantRepo.get_by_email(session, campaign.id, email)
+            if existing and existing.reward_type:
                 log.info(
                     "Participant already rewarded",
-                    extra={
-                        "participant_id": participant.id,
-                        "reward_type": participant.reward_type,
-                    },
-                )
-                reward_message = await RewardService.render_message(
-                    session=session,
-                    reward_type=participant.reward_type,
-                    promo_code=participant.promo_code,
+                    extra={"participant_id": existing.id, "reward_type": existing.reward_type},
                 )
-                prefix = await TextService.get_text(session, "already_rewarded")
-                await m.answer(prefix.format(reward_message=reward_message))
-                return
-
-            # assign new reward
-            log.info("Assigning new reward", extra={"participant_id": participant.id})
-            reward = await RewardService.assign_reward(session, participant_id=participant.id)
-            participant.reward_type = reward.reward_type
-            participant.promo_code = reward.promo_code
-
-        # committed
-        log.info(
-            "Reward assigned and committed",
-            extra={"participant_id": participant.id, "reward_type": reward.reward_type},
+                already_rewarded_text = await RewardService.render_already_rewarded(session, campaign, existing)
+                rewarded_type = existing.reward_type
+
+    # 4) DB transaction on the primary: create participant + assign reward atomically
+    claim: ClaimResult | None = None
+    if already_rewarded_text is None:
+        claim = await RewardService.claim(campaign, tg_id, email)
+        if not claim.is_new:
+            already_rewarded_text = claim.message
+            rewarded_type = claim.reward_type
+    EMAIL_FLOW_STAGE_SECONDS.labels("db").observe(time.perf_counter() - db_started)
+    db_ms = elapsed_ms(db_started)
+
+    if already_rewarded_text is not None:
+        record_outcome(
+            "already_rewarded",
+            campaign.id,
+            tg_id,
+            started,
+            email=email,
+            email_status=status.email_status,
+            reward_type=rewarded_type,
+            unisender_ms=unisender_ms,
+            db_ms=db_ms,
         )
-        await m.answer(reward.message)
+        with track_stage("reply"), span("email_flow.reply"):
+            await m.answer(already_rewarded_text)
+        return
+
+    # committed
+    record_outcome(
+        "reward_assigned",
+        campaign.id,
+        tg_id,
+        started,
+        email=email,
+        email_status=status.email_status,
+        reward_type=claim.reward_type,
+        unisender_ms=unisender_ms,
+        db_ms=db_ms,
+    )
+    REWARDS_ASSIGNED.labels(campaign.slug, claim.reward_type).inc()
+    log.info(
+        "Reward assigned and committed",
+        extra={"participant_id": claim.participant_id, "reward_type": claim.reward_type},
+    )
+    with track_stage("reply"), span("email_flow.reply"):
+        await m.answer(claim.message)
@@ -27,7 +27,8 @@ def kb_admin_main() -> ReplyKeyboardMarkup:
         keyboard=[
             [KeyboardButton(text="📝 Тексты"), KeyboardButton(text="🎟 Промокоды")],
             [KeyboardButton(text="🎯 Лимит"), KeyboardButton(text="👥 Пользователи")],
-            [KeyboardButton(text="🧹 Очистить пользователей")],
+            [KeyboardButton(text="📊 Статистика"), KeyboardButton(text="📣 Рассылка")],
+            [KeyboardButton(text="🗂 Кампании"), KeyboardButton(text="🧹 Очистить пользователей")],
             [KeyboardButton(text="↩️ Назад")],
         ],
         resize_keyboard=True,
@@ -35,6 +36,76 @@ def kb_admin_main() -> ReplyKeyboardMarkup:
     )
 
 
+def kb_admin_campaigns(
+    campaigns: list[tuple[int, str]],
+    current_id: int,
+    pending_archive: list[tuple[int, str]] | None = None,
+) -> InlineKeyboardMarkup:
+    rows = [
+        [
+            InlineKeyboardButton(
+                text=f"{'✅ ' if campaign_id == current_id else ''}{label}",
+                callback_data=f"admin_campaign_select:{campaign_id}",
+            )
+        ]
+        for campaign_id, label in campaigns
+    ]
+    rows.extend(
+        [
+            InlineKeyboardButton(
+                text=f"↩️ Вернуть из архива: {label}",
+                callback_data=f"admin_campaign_restore:{campaign_id}",
+            )
+        ]
+        for campaign_id, label in pending_archive or []
+    )
+    rows.append([InlineKeyboardButton(text="➕ Новая кампания", callback_data="admin_campaign_new")])
+    rows.append([InlineKeyboardButton(text="🗄 Архивировать текущую", callback_data="admin_campaign_archive")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def kb_admin_campaign_archive_confirm(campaign_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="🗄 Да, архивировать",
+                    callback_data=f"admin_campaign_archive_confirm:{campaign_id}",
+                )
+            ],
+        ]
+    )
+
+
+def kb_admin_campaign_restore(campaign_id: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text="↩️ Отменить архивацию",
+                    callback_data=f"admin_campaign_restore:{campaign_id}",
+                )
+            ],
+        ]
+    )
+
+
+def kb_admin_stats() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="🔄 Обновить", callback_data="admin_stats_refresh")],
+        ]
+    )
+
+
+def kb_admin_job_cancel(job_name: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="⛔ Остановить", callback_data=f"admin_job_cancel:{job_name}")],
+        ]
+    )
+
+
 def kb_admin_texts() -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         keyboard=[
@@ -70,5 +141,32 @@ def kb_admin_confirm_clear() -> ReplyKeyboardMarkup:
     )
 
 
+def kb_admin_broadcast_audience(audiences: list[str]) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text=item)] for item in audiences] + [[KeyboardButton(text="↩️ Назад")]],
+        resize_keyboard=True,
+        selective=True,
+    )
+
+
+def kb_admin_back() -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        keyboard=[[KeyboardButton(text="↩️ Назад")]],
+        resize_keyboard=True,
+        selective=True,
+    )
+
+
+def kb_admin_broadcast_confirm() -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        keyboard=[
+            [KeyboardButton(text="✅ Отправить рассылку")],
+            [KeyboardButton(text="↩️ Назад")],
+        ],
+        resize_keyboard=True,
+        selective=True,
+    )
+
+
 def kb_remove() -> ReplyKeyboardRemove:
     return ReplyKeyboardRemove()
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.fsm.context import FSMContext
+from aiogram.types import Message, TelegramObject, Update
+
+from app.bot.handlers import record_outcome
+from app.config import settings
+from app.metrics import HANDLERS_IN_FLIGHT, UPDATE_SECONDS
+from app.services.campaigns import CampaignService
+from app.services.recorder import TrafficRecorder
+from app.services.texts import TextService
+from app.tracing import span, trace_update
+from app.utils.admission import AdmissionGate
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: concurrency and end-to-end time per update type.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        event_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        in_flight = HANDLERS_IN_FLIGHT.labels(event_type)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            in_flight.dec()
+            UPDATE_SECONDS.labels(event_type).observe(time.perf_counter() - started)
+
+
+class RecordingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware, registered only with RECORD_FILE: hands every update to the recorder.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if isinstance(event, Update):
+            TrafficRecorder.record_update(event)
+        return await handler(event, data)
+
+
+class TracingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: opens the root span of the update's trace.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        with trace_update(event.update_id, event.event_type) as root:
+            if event.event_type in {"message", "callback_query"}:
+                user = event.event.from_user
+                if user:
+                    root.set(**{"user.id": user.id})
+            return await handler(event, data)
+
+
+class HandlerSpanMiddleware(BaseMiddleware):
+    """
+    Inner message/callback middleware: one span named after the handler that matched.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        with span(f"handler.{name}"):
+            return await handler(event, data)
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    """
+    Inner message middleware: handlers flagged `admission` run through the gate. A request that
+    does not get a slot is answered with the "overloaded" text at once; admins use the priority lane.
+    """
+    def __init__(self, gate: AdmissionGate) -> None:
+        self.gate = gate
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        if not get_flag(data, "admission") or not isinstance(event, Message):
+            return await handler(event, data)
+        started = time.perf_counter()
+        user_id = event.from_user.id if event.from_user else 0
+        async with self.gate.slot(priority=user_id in settings.admin_ids) as admitted:
+            if admitted:
+                return await handler(event, data)
+        with span("email_flow.shed"):
+            state: FSMContext | None = data.get("state")
+            campaign_id = (await state.get_data()).get("campaign_id") if state else None
+            campaign = await CampaignService.resolve(campaign_id=campaign_id)
+            record_outcome("overloaded", campaign.id, user_id, started)
+            text = await TextService.get_text_global("overloaded", campaign.id)
+            await event.answer(text)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from typing import Any
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from app.db import SessionMaker
+from app.repositories.fsm import FsmStateRepo
+
+
+class DbStorage(BaseStorage):
+    """
+    FSM storage in fsm_states. Updates of one user may land on any worker process, so the
+    conversation state has to live outside of them; reads go to the primary for the same reason.
+    """
+    @staticmethod
+    def make_key(key: StorageKey) -> str:
+        return ":".join(
+            str(part)
+            for part in (
+                key.bot_id,
+                key.chat_id,
+                key.user_id,
+                key.thread_id or "",
+                key.business_connection_id or "",
+                key.destiny,
+            )
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        async with SessionMaker() as session:
+            async with session.begin():
+                await FsmStateRepo.set_state(session, self.make_key(key), value)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        async with SessionMaker() as session:
+            return await FsmStateRepo.get_state(session, self.make_key(key))
+
+    async def set_data(self, key: StorageKey, data: dict[str, Any]) -> None:
+        async with SessionMaker() as session:
+            async with session.begin():
+                await FsmStateRepo.set_data(session, self.make_key(key), data)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        async with SessionMaker() as session:
+            return await FsmStateRepo.get_data(session, self.make_key(key))
+
+    async def close(self) -> None:
+        pass
@@ -1,13 +1,298 @@
 from __future__ import annotations
 
+import asyncio
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from functools import cache, lru_cache
 import logging
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+import random
+import re
+import time
+from typing import Any, AsyncIterator
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.config import settings
+from app.utils.lazy import LazyProxy, unwrap
+from app.metrics import (
+    DB_POOL_CHECKOUT_WAIT_SECONDS,
+    DB_POOL_TIMEOUTS,
+    DB_READ_ROUTING,
+    DB_REPLICA_LAG_SECONDS,
+    SQL_SLOW_STATEMENTS,
+    SQL_STATEMENT_SECONDS,
+)
 
 log = logging.getLogger(__name__)
 
-engine = create_async_engine(settings.database_url, pool_pre_ping=True)
-SessionMaker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+REPLICA_CHECK_INTERVAL = 2.0  # seconds between replica lag checks
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+# statement normalization: literals and bind parameters become "?", so one query shape is one entry
+SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+SQL_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s|%s|(?<![:\w]):\w+|\b\d+(?:\.\d+)?\b")
+SQL_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+SQL_SPACE_RE = re.compile(r"\s+")
+SQL_TABLE_RE = re.compile(r"\b(?:from|into|update|join)\s+\"?(\w+)", re.I)
+SQL_EXPLAINABLE = ("select", "update", "delete", "insert", "with")
+SQL_MAX_STATEMENT_LENGTH = 2000
+SQL_EXPLAIN_QUEUE_SIZE = 20
+
+
+@lru_cache(maxsize=4096)
+def normalize_statement(statement: str) -> str:
+    normalized = SQL_SPACE_RE.sub(" ", statement).strip()
+    normalized = SQL_PARAM_RE.sub("?", SQL_STRING_RE.sub("?", normalized))
+    return SQL_IN_LIST_RE.sub("(...)", normalized)[:SQL_MAX_STATEMENT_LENGTH]
+
+
+@lru_cache(maxsize=4096)
+def statement_label(normalized: str) -> str:
+    """
+    Low-cardinality metric label: the verb and the first table, e.g. "update promo_codes".
+    """
+    verb = normalized.split(" ", 1)[0].lower()
+    table = SQL_TABLE_RE.search(normalized)
+    return f"{verb} {table.group(1).lower()}" if table else verb
+
+
+@dataclass
+class StatementStats:
+    statement: str
+    label: str
+    calls: int = 0
+    errors: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    slow: int = 0
+    lock_wait: float = 0.0  # estimated from pg_stat_activity samples
+    plan: str | None = None  # last EXPLAIN of a slow execution
+    plan_options: str = ""  # "ANALYZE, BUFFERS" for plain reads, "" (estimates only) otherwise
+    plan_duration: float = 0.0
+    explained_at: float = 0.0
+
+
+class SqlStats:
+    """
+    Per-process aggregation of statement timings from the engine hooks (see instrument_engine).
+    Slow executions are sampled into a small queue; SqlStatsService EXPLAINs them off the hot path.
+    """
+    statements: dict[str, StatementStats] = {}
+    started_at: float = time.time()
+    explain_queue: deque[tuple[str, str, Any, float]] = deque(maxlen=SQL_EXPLAIN_QUEUE_SIZE)
+
+    @classmethod
+    def get(cls, statement: str) -> StatementStats:
+        normalized = normalize_statement(statement)
+        stats = cls.statements.get(normalized)
+        if stats is None:
+            stats = cls.statements[normalized] = StatementStats(normalized, statement_label(normalized))
+        return stats
+
+    @classmethod
+    def record(
+        cls,
+        engine_name: str,
+        statement: str,
+        parameters: Any,
+        elapsed: float,
+        executemany: bool,
+        failed: bool = False,
+    ) -> None:
+        stats = cls.get(statement)
+        stats.calls += 1
+        stats.total += elapsed
+        stats.max = max(stats.max, elapsed)
+        if failed:
+            stats.errors += 1
+        SQL_STATEMENT_SECONDS.labels(engine_name, stats.label).observe(elapsed)
+        if elapsed < settings.sql_slow_threshold:
+            return
+        stats.slow += 1
+        SQL_SLOW_STATEMENTS.labels(engine_name, stats.label).inc()
+        if (
+            not failed
+            and not executemany
+            and statement.lstrip()[:6].lower().startswith(SQL_EXPLAINABLE)
+            and time.monotonic() - stats.explained_at >= settings.sql_explain_interval
+            and random.random() < settings.sql_explain_sample_rate
+        ):
+            # claimed now, so a burst of slow executions queues one plan, not one per execution
+            stats.explained_at = time.monotonic()
+            cls.explain_queue.append((engine_name, statement, parameters, elapsed))
+
+    @classmethod
+    def reset(cls) -> None:
+        cls.statements = {}
+        cls.started_at = time.time()
+        cls.explain_queue.clear()
+
+
+def instrument_engine(target: AsyncEngine, name: str) -> None:
+    """
+    Times every statement with before/after_cursor_execute on the sync engine behind `target`.
+    Statements run with execution_options(sql_stats=False) are not counted (the EXPLAINs themselves).
+    """
+    sync_engine = target.sync_engine
+
+    def enabled(context: Any) -> bool:
+        return context is None or context.execution_options.get("sql_stats", True)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if enabled(context):
+            conn.info.setdefault("sql_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if enabled(context) and conn.info.get("sql_started"):
+            elapsed = time.perf_counter() - conn.info["sql_started"].pop()
+            SqlStats.record(name, statement, parameters, elapsed, executemany)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context) -> None:
+        conn = exception_context.connection
+        if conn is None or not conn.info.get("sql_started") or exception_context.statement is None:
+            return
+        if not enabled(exception_context.execution_context):
+            return
+        elapsed = time.perf_counter() - conn.info["sql_started"].pop()
+        SqlStats.record(
+            name,
+            exception_context.statement,
+            exception_context.parameters,
+            elapsed,
+            executemany=False,
+            failed=True,
+        )
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited for a connection.
+    Metrics are labelled with the pool logging name (survives pool recreation on dispose).
+    """
+    def _do_get(self) -> Any:
+        name = self._orig_logging_name or "primary"
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            DB_POOL_TIMEOUTS.labels(name).inc()
+            raise
+        finally:
+            DB_POOL_CHECKOUT_WAIT_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+
+def build_engine(url: str | None = None, name: str = "primary", **overrides: Any) -> AsyncEngine:
+    options: dict[str, Any] = {
+        "poolclass": TimedQueuePool,
+        "pool_logging_name": name,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {"prepared_statement_cache_size": settings.db_statement_cache_size},
+    }
+    options.update(overrides)
+    created = create_async_engine(url or settings.database_url, **options)
+    if settings.sql_stats_enabled:
+        instrument_engine(created, name)
+    return created
+
+
+# Nothing connects (or even reads settings) until first use; see warm_pool() for the startup path.
+engine: AsyncEngine = LazyProxy(build_engine)  # type: ignore[assignment]
+SessionMaker: async_sessionmaker[AsyncSession] = LazyProxy(  # type: ignore[assignment]
+    lambda: async_sessionmaker(unwrap(engine), expire_on_commit=False, class_=AsyncSession)
+)
+
+
+@cache
+def get_replica_engine() -> AsyncEngine | None:
+    if not settings.database_replica_url:
+        return None
+    return build_engine(settings.database_replica_url, name="replica")
+
+
+@cache
+def get_replica_session_maker() -> async_sessionmaker[AsyncSession] | None:
+    replica_engine = get_replica_engine()
+    if replica_engine is None:
+        return None
+    return async_sessionmaker(replica_engine, expire_on_commit=False, class_=AsyncSession)
+
+
+async def warm_pool(target: AsyncEngine, connections: int) -> int:
+    """
+    Opens up to `connections` pooled connections at once (capped at pool_size, so they stay in the pool)
+    and runs a trivial query on each. Returns how many were opened.
+    """
+    count = max(0, min(connections, target.pool.size()))
+    # all connections are held at once, so each one is a distinct new connection
+    async with AsyncExitStack() as stack:
+        conns = await asyncio.gather(*(stack.enter_async_context(target.connect()) for _ in range(count)))
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    log.info("Connection pool warmed", extra={"engine": target.pool.logging_name, "connections": count})
+    return count
+
+
+class ReplicaHealth:
+    """
+    Cached replica lag check; concurrent callers share one probe.
+    """
+    healthy: bool = False
+    checked_at: float = 0.0
+    _lock = asyncio.Lock()
+
+    @classmethod
+    async def is_healthy(cls) -> bool:
+        replica_engine = get_replica_engine()
+        if replica_engine is None:
+            return False
+        if time.monotonic() - cls.checked_at < REPLICA_CHECK_INTERVAL:
+            return cls.healthy
+        async with cls._lock:
+            if time.monotonic() - cls.checked_at < REPLICA_CHECK_INTERVAL:
+                return cls.healthy
+            try:
+                async with replica_engine.connect() as conn:
+                    lag = float((await conn.execute(REPLICA_LAG_QUERY)).scalar_one())
+                DB_REPLICA_LAG_SECONDS.set(lag)
+                healthy = lag <= settings.replica_max_lag
+                if not healthy:
+                    log.warning("Replica is lagging, reading from primary", extra={"lag": lag})
+            except Exception:
+                log.warning("Replica check failed, reading from primary", exc_info=True)
+                healthy = False
+            if healthy != cls.healthy:
+                log.info("Replica routing changed", extra={"healthy": healthy})
+            cls.healthy = healthy
+            cls.checked_at = time.monotonic()
+            return healthy
+
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """
+    Session for read-only work that tolerates a few seconds of staleness.
+    Uses the replica when configured and within REPLICA_MAX_LAG, the primary otherwise.
+    """
+    replica_maker = get_replica_session_maker()
+    if replica_maker is not None and await ReplicaHealth.is_healthy():
+        DB_READ_ROUTING.labels("replica").inc()
+        maker = replica_maker
+    else:
+        DB_READ_ROUTING.labels("primary").inc()
+        maker = SessionMaker
+    async with maker() as session:
+        yield session
 
-log.debug("Database engine initialized")
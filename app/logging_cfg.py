@@ -1,9 +1,158 @@
+from __future__ import annotations
+
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from app.metrics import LOG_ENQUEUE_SECONDS, LOG_RECORDS
+
+
+TEXT_FORMAT = "%(asctime)s | %(levelname)s | %(name)s | %(message)s"
+
+# attributes every LogRecord has; anything else came from extra={...}
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def record_extras(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in record.__dict__.items() if key not in RESERVED_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: timestamp, level, logger, message, the extra={...} fields and the traceback.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record_extras(record).items():
+            # an extra named like a core field must not overwrite it
+            payload[f"extra_{key}" if key in payload else key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    The classic format, with extra fields appended as key=value.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extras = record_extras(record)
+        if extras:
+            line += " | " + " ".join(f"{key}={value}" for key, value in extras.items())
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of records below WARNING for the configured logger prefixes (the longest prefix wins).
+    """
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+        # longest prefix first
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def rate_for(self, name: str) -> float:
+        for prefix, rate in self.rates:
+            if name == prefix or name.startswith(prefix + "."):
+                return rate
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rate_for(record.name)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        LOG_RECORDS.labels("sampled_out").inc()
+        return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Runs on the calling thread (the event loop): renders the message and the traceback, then hands the
+    record to the listener thread. A full queue drops the record instead of blocking the loop.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        started = time.perf_counter()
+        try:
+            self.queue.put_nowait(self.prepare(record))
+            LOG_RECORDS.labels("queued").inc()
+        except queue.Full:
+            LOG_RECORDS.labels("dropped").inc()
+        except Exception:
+            self.handleError(record)
+        LOG_ENQUEUE_SECONDS.observe(time.perf_counter() - started)
+
+
+def stop_listener(listener: logging.handlers.QueueListener) -> None:
+    # QueueListener.stop() fails when called twice (e.g. by main() and then at exit)
+    if listener._thread is not None:
+        listener.stop()
+
+
+def parse_sampling(raw: str) -> dict[str, float]:
+    rates: dict[str, float] = {}
+    for item in (raw or "").split(","):
+        if not item.strip():
+            continue
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+def setup_logging(
+    level: str = "INFO",
+    fmt: str = "json",
+    sampling: str = "",
+    queue_size: int = 10000,
+) -> logging.handlers.QueueListener:
+    """
+    Stream writes happen on a QueueListener thread; the root logger only has the queue handler.
+    The listener is stopped (and the queue drained) at interpreter exit.
+    """
+    formatter = JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT)
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    rates = parse_sampling(sampling)
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
 
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level.upper(), logging.INFO))
 
-def setup_logging(level: str = "INFO") -> None:
-    logging.basicConfig(
-        level=getattr(logging, level.upper(), logging.INFO),
-        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_listener, listener)
+    logging.getLogger(__name__).info(
+        "Logging configured",
+        extra={"log_level": level, "log_format": fmt, "sampling": rates, "queue_size": queue_size},
     )
-    logging.getLogger(__name__).info("Logging configured", extra={"level": level})
+    return listener
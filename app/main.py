@@ -1,45 +1,173 @@
 from __future__ import annotations
 
 import asyncio
+from contextlib import contextmanager
 import logging
+import time
+from typing import Iterator
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 
 from app.config import settings
 from app.logging_cfg import setup_logging
+from app.bot.admin import resume_broadcasts
+from app.bot.middlewares import (
+    AdmissionMiddleware,
+    HandlerSpanMiddleware,
+    MetricsMiddleware,
+    RecordingMiddleware,
+    TracingMiddleware,
+)
 from app.bot.router import router
-from app.db import engine
-from app.models import Base
+from app.bot.storage import DbStorage
+from app.db import engine, get_replica_engine, warm_pool
+from app.metrics import STARTUP_PHASE_SECONDS, observe_pool
+from app.migrations.runner import pending_migrations
+from app.services.campaigns import CampaignService
+from app.services.events import EventLog
+from app.services.monitoring import monitor_event_loop_lag, refresh_promo_gauges, start_metrics_server
+from app.services.pending import PendingVerificationService
+from app.services.recorder import TrafficRecorder
+from app.services.sql_stats import SqlStatsService
+from app.services.texts import TextService
+from app.services.unisender import unisender
+from app.tracing import TraceExporter
+from app.utils.admission import AdmissionGate
 
 
 log = logging.getLogger(__name__)
 
 
-async def init_db() -> None:
-    log.info("Initializing database")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    log.info("Database initialized")
+async def check_schema() -> None:
+    """
+    Migrations are a separate deploy step (`python -m app.migrations upgrade`); the bot only verifies them.
+    """
+    pending = await pending_migrations(engine)
+    if pending:
+        names = ", ".join(f"{item.version:04d}_{item.name}" for item in pending)
+        raise SystemExit(f"Database schema is outdated, pending migrations: {names}. Run: python -m app.migrations upgrade")
+    log.info("Database schema is up to date")
 
 
-async def main() -> None:
-    setup_logging(settings.log_level)
+@contextmanager
+def startup_phase(name: str, timings: dict[str, float]) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - started
+        STARTUP_PHASE_SECONDS.labels(name).set(timings[name])
+
+
+async def warmup(bot: Bot, timings: dict[str, float]) -> None:
+    """
+    Pays the cold-start costs before the first update instead of on it: DB connections,
+    campaigns and texts, the Unisender keep-alive pool and the Telegram session.
+    """
+    with startup_phase("db_pool", timings):
+        await warm_pool(engine, settings.db_warmup_connections)
+        replica_engine = get_replica_engine()
+        if replica_engine is not None:
+            await warm_pool(replica_engine, settings.db_warmup_connections)
+    with startup_phase("config", timings):
+        campaigns = await CampaignService.preload()
+        await TextService.preload(campaign.id for campaign in campaigns)
+    with startup_phase("unisender", timings):
+        await unisender.warmup()
+    with startup_phase("telegram", timings):
+        me = await bot.get_me()
+    log.info("Warmup finished", extra={"bot_username": me.username, "campaigns": len(campaigns)})
 
-    log.info("Application starting")
-    await init_db()
 
-    bot = Bot(
+def build_bot() -> Bot:
+    return Bot(
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
 
-    dp = Dispatcher()
+
+def build_dispatcher(storage: BaseStorage | None = None) -> Dispatcher:
+    if storage is None:
+        storage = DbStorage() if settings.fsm_storage == "db" else MemoryStorage()
+    dp = Dispatcher(storage=storage)
+    if TrafficRecorder.enabled():
+        dp.update.outer_middleware(RecordingMiddleware())
+    dp.update.outer_middleware(MetricsMiddleware())
+    dp.update.outer_middleware(TracingMiddleware())
+    dp.message.middleware(HandlerSpanMiddleware())
+    dp.message.middleware(
+        AdmissionMiddleware(
+            AdmissionGate(
+                settings.email_flow_concurrency,
+                settings.email_flow_queue_size,
+                settings.email_flow_queue_timeout,
+            )
+        )
+    )
+    dp.callback_query.middleware(HandlerSpanMiddleware())
     dp.include_router(router)
+    return dp
 
-    log.info("Bot started")
-    await dp.start_polling(bot)
+
+async def main() -> None:
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+    setup_logging(settings.log_level, settings.log_format, settings.log_sampling, settings.log_queue_size)
+
+    log.info("Application starting")
+    with startup_phase("schema_check", timings):
+        await check_schema()
+
+    bot = build_bot()
+    dp = build_dispatcher()
+
+    observe_pool(engine)
+    if get_replica_engine() is not None:
+        observe_pool(get_replica_engine(), name="replica")
+    metrics_runner = None
+    if settings.metrics_port:
+        metrics_runner = await start_metrics_server(settings.metrics_host, settings.metrics_port)
+    background = [
+        asyncio.create_task(monitor_event_loop_lag()),
+        asyncio.create_task(refresh_promo_gauges()),
+        asyncio.create_task(SqlStatsService.run()),
+        asyncio.create_task(CampaignService.run_detacher()),
+    ]
+    event_flusher = asyncio.create_task(EventLog.run_flusher())
+    trace_exporter = asyncio.create_task(TraceExporter.run())
+    recorder = asyncio.create_task(TrafficRecorder.run())
+
+    await warmup(bot, timings)
+    await resume_broadcasts(bot)
+    if settings.pending_enabled:
+        background.append(asyncio.create_task(PendingVerificationService.run(bot)))
+
+    time_to_ready = time.perf_counter() - started
+    STARTUP_PHASE_SECONDS.labels("total").set(time_to_ready)
+    log.info(
+        "Bot started",
+        extra={
+            "time_to_ready_ms": round(time_to_ready * 1000),
+            "phases_ms": {name: round(value * 1000) for name, value in timings.items()},
+        },
+    )
+    try:
+        await dp.start_polling(bot)
+    finally:
+        for task in background:
+            task.cancel()
+        # the flusher drains the buffer on cancellation; wait for it so the last events are not lost
+        event_flusher.cancel()
+        trace_exporter.cancel()
+        recorder.cancel()
+        await asyncio.gather(event_flusher, trace_exporter, recorder, return_exceptions=True)
+        await unisender.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
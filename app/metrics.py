@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+import os
+import time
+from typing import Any, Iterator
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+# Latency buckets tuned for a chat bot: most stages are tens of ms, Unisender can take seconds.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+
+EMAIL_FLOW_STAGE_SECONDS = Histogram(
+    "email_flow_stage_seconds",
+    "Time spent in each email_flow stage.",
+    ["stage"],  # validate | unisender | db | reply
+    buckets=LATENCY_BUCKETS,
+)
+EMAIL_FLOW_OUTCOMES = Counter(
+    "email_flow_outcomes_total",
+    "email_flow results by outcome.",
+    ["outcome"],
+)
+UNISENDER_REQUEST_SECONDS = Histogram(
+    "unisender_get_contact_seconds",
+    "Unisender getContact latency by outcome.",
+    ["outcome"],  # ok | not_found | error | exception
+    buckets=LATENCY_BUCKETS,
+)
+REWARDS_ASSIGNED = Counter(
+    "rewards_assigned_total",
+    "Committed reward assignments.",
+    ["campaign", "reward_type"],
+)
+PROMO_CODES_FREE = Gauge(
+    "promo_codes_free",
+    "Free promo codes per campaign and kind (refreshed periodically from the stats cache).",
+    ["campaign", "kind"],
+    multiprocess_mode="livemax",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "Connections currently checked out of the pool.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow",
+    "Connections opened above pool_size (negative while the pool is warming up).",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured pool size.", ["engine"], multiprocess_mode="livesum")
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation",
+    "Checked-out connections / (pool_size + max_overflow).",
+    ["engine"],
+    multiprocess_mode="livemax",
+)
+DB_POOL_CHECKOUT_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection.",
+    ["engine"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0),
+)
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that gave up after pool_timeout.", ["engine"])
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "db_replica_lag_seconds",
+    "Replication lag seen by the last replica health check.",
+    multiprocess_mode="livemax",
+)
+SQL_STATEMENT_SECONDS = Histogram(
+    "db_statement_seconds",
+    "Statement execution time as seen by the driver, by engine and statement kind.",
+    ["engine", "statement"],  # statement: "<verb> <first table>", e.g. "update promo_codes"
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+SQL_LOCK_WAIT_SECONDS = Counter(
+    "db_statement_lock_wait_seconds_total",
+    "Estimated time statements spent waiting on locks (sampled from pg_stat_activity).",
+    ["statement"],
+)
+SQL_SLOW_STATEMENTS = Counter(
+    "db_slow_statements_total",
+    "Statements slower than SQL_SLOW_THRESHOLD.",
+    ["engine", "statement"],
+)
+DB_READ_ROUTING = Counter("db_read_sessions_total", "Read-only sessions by the engine that served them.", ["engine"])
+EVENT_LOOP_LAG_SECONDS = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop wakes up a periodic sleep.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+FLOW_EVENTS_WRITTEN = Counter("flow_events_written_total", "email_flow events written to flow_events.")
+FLOW_EVENTS_DROPPED = Counter(
+    "flow_events_dropped_total",
+    "email_flow events lost before reaching the DB.",
+    ["reason"],  # overflow | write_error
+)
+FLOW_EVENTS_BUFFERED = Gauge(
+    "flow_events_buffered",
+    "email_flow events waiting in memory for the next flush.",
+    multiprocess_mode="livesum",
+)
+FLOW_EVENTS_FLUSH_SECONDS = Histogram(
+    "flow_events_flush_seconds",
+    "Time to write one batch of email_flow events.",
+    buckets=LATENCY_BUCKETS,
+)
+LOG_RECORDS = Counter(
+    "log_records_total",
+    "Log records by what happened to them on the calling thread.",
+    ["result"],  # queued | sampled_out | dropped
+)
+LOG_ENQUEUE_SECONDS = Histogram(
+    "log_enqueue_seconds",
+    "Time a logging call spends on the calling thread (format args, serialize extras, enqueue).",
+    buckets=(0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005),
+)
+TRACES_EXPORTED = Counter("traces_exported_total", "Update traces written to the trace file or collector.")
+TRACES_DROPPED = Counter(
+    "traces_dropped_total",
+    "Update traces lost before export.",
+    ["reason"],  # overflow | export_error
+)
+RECORDED_EVENTS = Counter(
+    "recorded_events_total",
+    "Updates and Unisender responses seen by the traffic recorder.",
+    ["kind", "result"],  # update | unisender; recorded | dropped
+)
+PENDING_VERIFICATIONS = Counter(
+    "pending_verifications_total",
+    "Pending re-verification queue events.",
+    ["result"],  # enqueued | rewarded | already_rewarded | still_pending | error | expired | campaign_closed
+)
+PENDING_QUEUE_SIZE = Gauge(
+    "pending_verifications_queued",
+    "Users waiting in the pending re-verification queue.",
+    multiprocess_mode="livemax",
+)
+ADMISSION_ACTIVE = Gauge(
+    "email_flow_admission_active",
+    "email_flow requests holding an admission slot.",
+    multiprocess_mode="livesum",
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    "email_flow_admission_queue_depth",
+    "email_flow requests waiting for an admission slot.",
+    ["lane"],  # admin | user
+    multiprocess_mode="livesum",
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "email_flow_admission_wait_seconds",
+    "Time admitted email_flow requests waited for a slot.",
+    ["lane"],
+    buckets=(0.0, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+ADMISSION_SHED = Counter(
+    "email_flow_admission_shed_total",
+    "email_flow requests refused by the admission gate.",
+    ["reason"],  # queue_full | timeout
+)
+STARTUP_PHASE_SECONDS = Gauge(
+    "startup_phase_seconds",
+    "Duration of each startup phase.",
+    ["phase"],
+    multiprocess_mode="livemax",  # the slowest worker
+)
+HANDLERS_IN_FLIGHT = Gauge(
+    "bot_handlers_in_flight",
+    "Updates currently being processed.",
+    ["event_type"],
+    multiprocess_mode="livesum",
+)
+UPDATE_SECONDS = Histogram(
+    "bot_update_seconds",
+    "Full update processing time.",
+    ["event_type"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        EMAIL_FLOW_STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def is_multiprocess() -> bool:
+    # set by the supervisor before the workers import prometheus_client
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+# (name, pool, capacity) of pools whose gauges are pushed by update_pool_gauges()
+_pushed_pools: list[tuple[str, Any, int]] = []
+
+
+def observe_pool(engine: AsyncEngine, name: str = "primary") -> None:
+    """
+    Pool gauges are read lazily at scrape time, so there is no per-checkout cost.
+    In multi-process mode the scrape reads the shared files instead of this process,
+    so the values are pushed periodically by update_pool_gauges().
+    """
+    pool = engine.pool
+    capacity = pool.size() + max(0, pool._max_overflow)
+    if is_multiprocess():
+        _pushed_pools.append((name, pool, capacity))
+        update_pool_gauges()
+        return
+    DB_POOL_CHECKED_OUT.labels(name).set_function(pool.checkedout)
+    DB_POOL_OVERFLOW.labels(name).set_function(pool.overflow)
+    DB_POOL_SIZE.labels(name).set_function(pool.size)
+    DB_POOL_SATURATION.labels(name).set_function(lambda: pool.checkedout() / capacity if capacity else 0.0)
+
+
+def update_pool_gauges() -> None:
+    for name, pool, capacity in _pushed_pools:
+        checked_out = pool.checkedout()
+        DB_POOL_CHECKED_OUT.labels(name).set(checked_out)
+        DB_POOL_OVERFLOW.labels(name).set(pool.overflow())
+        DB_POOL_SIZE.labels(name).set(pool.size())
+        DB_POOL_SATURATION.labels(name).set(checked_out / capacity if capacity else 0.0)
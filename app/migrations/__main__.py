@@ -0,0 +1,49 @@
+"""
+    python -m app.migrations upgrade       apply pending migrations
+    python -m app.migrations status        list pending migrations
+    python -m app.migrations check-plans   EXPLAIN the hot-path queries and verify their indexes
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+
+from app.db import engine
+from app.logging_cfg import TEXT_FORMAT, TextFormatter
+from app.migrations.runner import check_plans, pending_migrations, upgrade
+
+
+# TextFormatter appends the extra={...} fields to each line
+handler = logging.StreamHandler()
+handler.setFormatter(TextFormatter(TEXT_FORMAT))
+logging.basicConfig(level=logging.INFO, handlers=[handler])
+log = logging.getLogger(__name__)
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Database schema migrations.")
+    parser.add_argument("command", choices=["upgrade", "status", "check-plans"])
+    args = parser.parse_args()
+    try:
+        if args.command == "upgrade":
+            await upgrade(engine)
+        elif args.command == "status":
+            pending = await pending_migrations(engine)
+            for migration in pending:
+                print(f"pending: {migration.version:04d}_{migration.name}")
+            if not pending:
+                print("up to date")
+        else:
+            problems = await check_plans(engine)
+            for problem in problems:
+                log.error("Plan check failed", extra={"problem": problem})
+            return 1 if problems else 0
+    finally:
+        await engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import importlib
+import json
+import logging
+import pkgutil
+from typing import Awaitable, Callable
+
+from sqlalchemy import Select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.migrations import versions
+
+
+log = logging.getLogger(__name__)
+
+# a migration step: an SQL string, or a coroutine function for steps that depend on the catalog
+# or run in batches (partition indexes, backfills)
+Step = str | Callable[[AsyncConnection], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: list[Step]
+    transactional: bool
+
+
+def load_migrations() -> list[Migration]:
+    """
+    Migrations live in app/migrations/versions as NNNN_name.py with STATEMENTS and TRANSACTIONAL.
+    A step that is not a string is awaited with the connection.
+    """
+    migrations: list[Migration] = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        prefix, _, name = info.name.partition("_")
+        if not prefix.isdigit():
+            continue
+        module = importlib.import_module(f"{versions.__name__}.{info.name}")
+        migrations.append(
+            Migration(
+                version=int(prefix),
+                name=name,
+                statements=list(module.STATEMENTS),
+                transactional=getattr(module, "TRANSACTIONAL", True),
+            )
+        )
+    migrations.sort(key=lambda item: item.version)
+    return migrations
+
+
+async def ensure_version_table(conn: AsyncConnection) -> None:
+    await conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            " version INTEGER PRIMARY KEY,"
+            " name VARCHAR(128) NOT NULL,"
+            " applied_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL)"
+        )
+    )
+
+
+async def applied_versions(engine: AsyncEngine, create: bool = False) -> set[int]:
+    async with engine.begin() as conn:
+        if create:
+            await ensure_version_table(conn)
+        else:
+            exists = await conn.execute(text("SELECT to_regclass('schema_migrations')"))
+            if exists.scalar_one() is None:
+                return set()
+        res = await conn.execute(text("SELECT version FROM schema_migrations"))
+        return {row[0] for row in res.fetchall()}
+
+
+async def pending_migrations(engine: AsyncEngine, create: bool = False) -> list[Migration]:
+    applied = await applied_versions(engine, create=create)
+    return [item for item in load_migrations() if item.version not in applied]
+
+
+async def record(conn: AsyncConnection, migration: Migration) -> None:
+    await conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name},
+    )
+
+
+async def run_step(conn: AsyncConnection, step: Step) -> None:
+    if isinstance(step, str):
+        await conn.execute(text(step))
+    else:
+        await step(conn)
+
+
+async def apply(engine: AsyncEngine, migration: Migration) -> None:
+    log.info("Applying migration", extra={"version": migration.version, "migration": migration.name})
+    if migration.transactional:
+        async with engine.begin() as conn:
+            for statement in migration.statements:
+                await run_step(conn, statement)
+            await record(conn, migration)
+        return
+    # CREATE INDEX CONCURRENTLY and friends cannot run inside a transaction;
+    # statements must be idempotent (IF NOT EXISTS) so a failed run can simply be repeated.
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for statement in migration.statements:
+            await run_step(conn, statement)
+        await record(conn, migration)
+
+
+async def upgrade(engine: AsyncEngine) -> list[Migration]:
+    pending = await pending_migrations(engine, create=True)
+    for migration in pending:
+        await apply(engine, migration)
+    log.info("Schema is up to date", extra={"applied": len(pending)})
+    return pending
+
+
+def explain_sql(stmt: Select) -> str:
+    compiled = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    return f"EXPLAIN (FORMAT JSON) {compiled}"
+
+
+def plan_index_names(plan: dict) -> set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= plan_index_names(child)
+    return names
+
+
+def plan_node_types(plan: dict) -> set[str]:
+    types = {plan["Node Type"]}
+    for child in plan.get("Plans", []):
+        types |= plan_node_types(child)
+    return types
+
+
+async def index_family(conn: AsyncConnection, index_name: str) -> set[str]:
+    """
+    An index on a partitioned table plus its per-partition children, which are what the plan shows.
+    """
+    res = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:name)"
+        ),
+        {"name": index_name},
+    )
+    return {index_name, *(row[0] for row in res.fetchall())}
+
+
+async def check_plans(engine: AsyncEngine) -> list[str]:
+    """
+    Guards the hot-path plans: returns a list of problems, empty when every query uses its index
+    and none falls back to a Seq Scan. Seq scans are disabled for the check, so a tiny table does
+    not hide a missing or unusable index. Run by tests/test_plans.py and `check-plans`.
+    """
+    from app.repositories.campaigns import DEFAULT_CAMPAIGN_ID
+    from app.repositories.participants import ParticipantRepo
+    from app.repositories.promo_codes import PromoCodeRepo
+
+    expected = {
+        "claim": (PromoCodeRepo.free_code_query(DEFAULT_CAMPAIGN_ID, "cinema"), "ix_promo_codes_free"),
+        "cinema_winners_count": (ParticipantRepo.cinema_winners_query(DEFAULT_CAMPAIGN_ID), "ix_participants_reward_type"),
+        "email_lookup": (
+            ParticipantRepo.by_email_query(DEFAULT_CAMPAIGN_ID, "Plan.Check@example.com"),
+            "uq_participants_email_lower",
+        ),
+    }
+    problems: list[str] = []
+    async with engine.connect() as conn:
+        # the connection is closed without commit, so SET LOCAL dies with the transaction
+        await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        for name, (stmt, index_name) in expected.items():
+            res = await conn.exec_driver_sql(explain_sql(stmt))
+            raw = res.scalar_one()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            used = plan_index_names(plan)
+            if "Seq Scan" in plan_node_types(plan):
+                problems.append(f"{name}: plan has a Seq Scan")
+            elif not used & await index_family(conn, index_name):
+                problems.append(f"{name}: expected {index_name}, plan uses {sorted(used) or 'no index'}")
+            else:
+                log.info("Plan check passed", extra={"query": name, "index": index_name})
+    return problems
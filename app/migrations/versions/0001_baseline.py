@@ -0,0 +1,71 @@
+"""
+Baseline: the schema previously produced by create_all. IF NOT EXISTS makes it a no-op on existing databases.
+"""
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS participants (
+        id SERIAL PRIMARY KEY,
+        telegram_id BIGINT NOT NULL,
+        email VARCHAR(320) NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        reward_type VARCHAR(32),
+        promo_code VARCHAR(128),
+        CONSTRAINT uq_participants_email UNIQUE (email),
+        CONSTRAINT uq_participants_telegram_id UNIQUE (telegram_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS promo_codes (
+        id SERIAL PRIMARY KEY,
+        kind VARCHAR(32) NOT NULL,
+        code VARCHAR(128) NOT NULL,
+        is_used BOOLEAN NOT NULL,
+        used_by_participant_id INTEGER,
+        used_at TIMESTAMP WITH TIME ZONE,
+        note TEXT,
+        CONSTRAINT uq_promo_codes_code UNIQUE (code)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bot_texts (
+        id SERIAL PRIMARY KEY,
+        key VARCHAR(128) NOT NULL,
+        value TEXT NOT NULL,
+        CONSTRAINT uq_bot_texts_key UNIQUE (key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS bot_config (
+        id SERIAL PRIMARY KEY,
+        key VARCHAR(128) NOT NULL,
+        value TEXT NOT NULL,
+        CONSTRAINT uq_bot_config_key UNIQUE (key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS broadcasts (
+        id SERIAL PRIMARY KEY,
+        text TEXT NOT NULL,
+        reward_type VARCHAR(32),
+        status VARCHAR(16) NOT NULL,
+        admin_chat_id BIGINT NOT NULL,
+        status_message_id INTEGER,
+        total INTEGER NOT NULL,
+        last_participant_id INTEGER NOT NULL,
+        sent INTEGER NOT NULL,
+        failed INTEGER NOT NULL,
+        blocked INTEGER NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        finished_at TIMESTAMP WITH TIME ZONE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS blocked_users (
+        telegram_id BIGINT PRIMARY KEY,
+        blocked_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+    )
+    """,
+]
@@ -0,0 +1,14 @@
+"""
+Indexes for the hot predicates: the claim (free code of a kind, lowest id first), per-kind stats,
+the cinema winners count and case-insensitive email lookups.
+Built CONCURRENTLY so a live bot keeps writing while they are created.
+"""
+
+TRANSACTIONAL = False
+
+STATEMENTS = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_promo_codes_free ON promo_codes (kind, id) WHERE is_used IS FALSE",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_promo_codes_kind_used_id ON promo_codes (kind, is_used, id)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participants_reward_type ON participants (reward_type)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_participants_email_lower ON participants (lower(email))",
+]
@@ -0,0 +1,105 @@
+"""
+Campaigns as a first-class entity; participants and promo_codes become LIST-partitioned by campaign_id.
+
+Existing rows become campaign 1 ("default"). The old tables are not copied: they get a campaign_id column
+(a metadata-only change) and are attached as the first partitions, participants_c1 and promo_codes_c1.
+The CHECK constraints let ATTACH skip its validation scan. Later campaigns get their partitions from
+CampaignService.create, and CampaignService.archive detaches them.
+"""
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS campaigns (
+        id SERIAL PRIMARY KEY,
+        slug VARCHAR(64) NOT NULL,
+        title VARCHAR(255) NOT NULL,
+        unisender_list_id VARCHAR(64),
+        cinema_limit INTEGER,
+        guide_link TEXT,
+        fallback_promo VARCHAR(128),
+        is_active BOOLEAN NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        CONSTRAINT uq_campaigns_slug UNIQUE (slug)
+    )
+    """,
+    # list id / guide link stay NULL: the default campaign keeps using the values from .env
+    """
+    INSERT INTO campaigns (id, slug, title, cinema_limit, is_active)
+    VALUES (
+        1,
+        'default',
+        'Основная кампания',
+        (SELECT value::integer FROM bot_config WHERE key = 'cinema_limit' AND value ~ '^[0-9]+$'),
+        true
+    )
+    """,
+    "SELECT setval('campaigns_id_seq', (SELECT max(id) FROM campaigns))",
+
+    # participants
+    "ALTER TABLE participants RENAME TO participants_c1",
+    "ALTER TABLE participants_c1 DROP CONSTRAINT participants_pkey",
+    "ALTER TABLE participants_c1 DROP CONSTRAINT uq_participants_email",
+    "ALTER TABLE participants_c1 DROP CONSTRAINT uq_participants_telegram_id",
+    "DROP INDEX IF EXISTS ix_participants_reward_type",
+    "DROP INDEX IF EXISTS ix_participants_email_lower",
+    "ALTER TABLE participants_c1 ADD COLUMN campaign_id INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE participants_c1 ALTER COLUMN campaign_id DROP DEFAULT",
+    "ALTER TABLE participants_c1 ADD CONSTRAINT participants_c1_campaign CHECK (campaign_id = 1)",
+    """
+    CREATE TABLE participants (
+        id INTEGER NOT NULL DEFAULT nextval('participants_id_seq'),
+        campaign_id INTEGER NOT NULL,
+        telegram_id BIGINT NOT NULL,
+        email VARCHAR(320) NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        reward_type VARCHAR(32),
+        promo_code VARCHAR(128),
+        CONSTRAINT participants_pkey PRIMARY KEY (campaign_id, id),
+        CONSTRAINT uq_participants_email UNIQUE (campaign_id, email),
+        CONSTRAINT uq_participants_telegram_id UNIQUE (campaign_id, telegram_id)
+    ) PARTITION BY LIST (campaign_id)
+    """,
+    "CREATE INDEX ix_participants_reward_type ON participants (campaign_id, reward_type)",
+    "CREATE INDEX ix_participants_email_lower ON participants (campaign_id, lower(email))",
+    "ALTER TABLE participants ATTACH PARTITION participants_c1 FOR VALUES IN (1)",
+    "ALTER SEQUENCE participants_id_seq OWNED BY participants.id",
+
+    # promo_codes
+    "ALTER TABLE promo_codes RENAME TO promo_codes_c1",
+    "ALTER TABLE promo_codes_c1 DROP CONSTRAINT promo_codes_pkey",
+    "ALTER TABLE promo_codes_c1 DROP CONSTRAINT uq_promo_codes_code",
+    "DROP INDEX IF EXISTS ix_promo_codes_free",
+    "DROP INDEX IF EXISTS ix_promo_codes_kind_used_id",
+    "ALTER TABLE promo_codes_c1 ADD COLUMN campaign_id INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE promo_codes_c1 ALTER COLUMN campaign_id DROP DEFAULT",
+    "ALTER TABLE promo_codes_c1 ADD CONSTRAINT promo_codes_c1_campaign CHECK (campaign_id = 1)",
+    """
+    CREATE TABLE promo_codes (
+        id INTEGER NOT NULL DEFAULT nextval('promo_codes_id_seq'),
+        campaign_id INTEGER NOT NULL,
+        kind VARCHAR(32) NOT NULL,
+        code VARCHAR(128) NOT NULL,
+        is_used BOOLEAN NOT NULL,
+        used_by_participant_id INTEGER,
+        used_at TIMESTAMP WITH TIME ZONE,
+        note TEXT,
+        CONSTRAINT promo_codes_pkey PRIMARY KEY (campaign_id, id),
+        CONSTRAINT uq_promo_codes_code UNIQUE (campaign_id, code)
+    ) PARTITION BY LIST (campaign_id)
+    """,
+    "CREATE INDEX ix_promo_codes_free ON promo_codes (campaign_id, kind, id) WHERE is_used IS FALSE",
+    "CREATE INDEX ix_promo_codes_kind_used_id ON promo_codes (campaign_id, kind, is_used, id)",
+    "ALTER TABLE promo_codes ATTACH PARTITION promo_codes_c1 FOR VALUES IN (1)",
+    "ALTER SEQUENCE promo_codes_id_seq OWNED BY promo_codes.id",
+
+    # per-campaign texts override the shared ones (campaign_id IS NULL)
+    "ALTER TABLE bot_texts ADD COLUMN campaign_id INTEGER",
+    "ALTER TABLE bot_texts DROP CONSTRAINT uq_bot_texts_key",
+    "CREATE UNIQUE INDEX uq_bot_texts_campaign_key ON bot_texts (COALESCE(campaign_id, 0), key)",
+
+    "ALTER TABLE broadcasts ADD COLUMN campaign_id INTEGER NOT NULL DEFAULT 1",
+    "ALTER TABLE broadcasts ALTER COLUMN campaign_id DROP DEFAULT",
+    "DELETE FROM bot_config WHERE key = 'cinema_limit'",
+]
@@ -0,0 +1,25 @@
+"""
+Append-only email_flow outcome log. BRIN on created_at: rows arrive in time order, so the index stays tiny.
+"""
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS flow_events (
+        id BIGSERIAL PRIMARY KEY,
+        created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        campaign_id INTEGER NOT NULL,
+        telegram_id BIGINT NOT NULL,
+        email VARCHAR(255),
+        outcome VARCHAR(64) NOT NULL,
+        email_status VARCHAR(32),
+        reward_type VARCHAR(32),
+        duration_ms INTEGER NOT NULL,
+        unisender_ms INTEGER,
+        db_ms INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_flow_events_created_at ON flow_events USING brin (created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_flow_events_email ON flow_events (campaign_id, lower(email), created_at)",
+]
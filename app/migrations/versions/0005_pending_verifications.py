@@ -0,0 +1,25 @@
+"""
+Queue of users waiting for their subscription to be confirmed; re-checked by PendingVerificationService.
+One row per user and campaign: a new submission replaces the email and restarts the schedule.
+"""
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS pending_verifications (
+        id BIGSERIAL PRIMARY KEY,
+        campaign_id INTEGER NOT NULL,
+        telegram_id BIGINT NOT NULL,
+        email VARCHAR(320) NOT NULL,
+        reason VARCHAR(64) NOT NULL,
+        last_status VARCHAR(32),
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_check_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+        CONSTRAINT uq_pending_verifications_user UNIQUE (campaign_id, telegram_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_pending_verifications_next_check_at ON pending_verifications (next_check_at)",
+]
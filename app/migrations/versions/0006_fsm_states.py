@@ -0,0 +1,16 @@
+"""
+FSM storage in the DB, so a user's conversation state survives restarts and is visible to every worker process.
+"""
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS fsm_states (
+        key VARCHAR(255) PRIMARY KEY,
+        state VARCHAR(255),
+        data JSONB NOT NULL DEFAULT '{}'::jsonb,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+    )
+    """,
+]
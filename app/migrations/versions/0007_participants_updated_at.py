@@ -0,0 +1,154 @@
+"""
+participants.updated_at for the incremental CRM export (app/scripts/export_participants.py).
+
+Existing rows get their created_at. From then on a BEFORE UPDATE trigger sets now() on every change,
+so a reward assigned later moves the row past the export watermark. The trigger and the index are
+defined on the partitioned table (Postgres 14+ for CREATE OR REPLACE TRIGGER), so partitions of new
+campaigns get them too.
+
+Runs outside a transaction so participants is never locked for the length of the migration:
+- ADD COLUMN (nullable, no default), SET DEFAULT, the trigger, the NOT VALID checks and SET NOT NULL
+  only change the catalog: each takes ACCESS EXCLUSIVE for milliseconds, no rewrite or scan;
+- the backfill commits every BACKFILL_BATCH rows, so only the rows of the current batch are locked;
+- VALIDATE CONSTRAINT and CREATE INDEX CONCURRENTLY scan the partitions without blocking writes.
+Every step is idempotent, a failed run is simply repeated.
+"""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+
+log = logging.getLogger(__name__)
+
+TRANSACTIONAL = False
+
+BACKFILL_BATCH = 5000
+
+
+async def partitions(conn: AsyncConnection) -> list[str]:
+    res = await conn.execute(
+        text(
+            "SELECT inhrelid::regclass::text FROM pg_inherits "
+            "WHERE inhparent = 'participants'::regclass AND NOT inhdetachpending ORDER BY 1"
+        )
+    )
+    return [row[0] for row in res.fetchall()]
+
+
+async def backfill(conn: AsyncConnection) -> None:
+    """
+    Keyset pages over the primary key; a row an UPDATE already stamped is left alone.
+    """
+    last = (-1, -1)
+    batches = 0
+    while True:
+        res = await conn.execute(
+            text(
+                """
+                WITH page AS (
+                    SELECT campaign_id, id FROM participants
+                    WHERE (campaign_id, id) > (:campaign_id, :id)
+                    ORDER BY campaign_id, id
+                    LIMIT :limit
+                ), filled AS (
+                    UPDATE participants p SET updated_at = p.created_at
+                    FROM page
+                    WHERE p.campaign_id = page.campaign_id AND p.id = page.id AND p.updated_at IS NULL
+                )
+                SELECT campaign_id, id FROM page ORDER BY campaign_id DESC, id DESC LIMIT 1
+                """
+            ),
+            {"campaign_id": last[0], "id": last[1], "limit": BACKFILL_BATCH},
+        )
+        row = res.first()
+        if row is None:
+            break
+        last = (row[0], row[1])
+        batches += 1
+        log.info(
+            "participants.updated_at backfilled",
+            extra={"batches": batches, "campaign_id": last[0], "participant_id": last[1]},
+        )
+
+
+async def set_not_null(conn: AsyncConnection) -> None:
+    """
+    SET NOT NULL skips its full scan when every partition has a valid CHECK (updated_at IS NOT NULL);
+    the checks are validated under SHARE UPDATE EXCLUSIVE, which lets writes through.
+    """
+    tables = await partitions(conn)
+    for table in tables:
+        constraint = f"{table}_updated_at_not_null"
+        await conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}"))
+        await conn.execute(
+            text(f"ALTER TABLE {table} ADD CONSTRAINT {constraint} CHECK (updated_at IS NOT NULL) NOT VALID")
+        )
+        await conn.execute(text(f"ALTER TABLE {table} VALIDATE CONSTRAINT {constraint}"))
+    await conn.execute(text("ALTER TABLE participants ALTER COLUMN updated_at SET NOT NULL"))
+    for table in tables:
+        await conn.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_updated_at_not_null"))
+
+
+async def create_index(conn: AsyncConnection) -> None:
+    """
+    An index on the partitioned table cannot be built CONCURRENTLY: it is created ON ONLY the parent
+    (invalid, instant), built concurrently on each partition and attached; the parent index turns
+    valid once every partition has one.
+    """
+    await conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_participants_updated_at ON ONLY participants (updated_at, id)")
+    )
+    for table in await partitions(conn):
+        index = f"{table}_updated_at_idx"
+        # an interrupted CONCURRENTLY build leaves an invalid index that IF NOT EXISTS would keep
+        await conn.execute(
+            text(
+                f"""
+                DO $$
+                BEGIN
+                    IF EXISTS (
+                        SELECT 1 FROM pg_index WHERE indexrelid = to_regclass('{index}') AND NOT indisvalid
+                    ) THEN
+                        EXECUTE 'DROP INDEX {index}';
+                    END IF;
+                END
+                $$
+                """
+            )
+        )
+        await conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index} ON {table} (updated_at, id)"))
+        attached = await conn.execute(
+            text(
+                "SELECT 1 FROM pg_inherits "
+                "WHERE inhrelid = to_regclass(:index) AND inhparent = 'ix_participants_updated_at'::regclass"
+            ),
+            {"index": index},
+        )
+        if attached.first() is None:
+            await conn.execute(text(f"ALTER INDEX ix_participants_updated_at ATTACH PARTITION {index}"))
+
+
+STATEMENTS = [
+    "ALTER TABLE participants ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE",
+    "ALTER TABLE participants ALTER COLUMN updated_at SET DEFAULT now()",
+    # the backfill's own UPDATE must keep created_at: a NULL turning into a value is let through
+    """
+    CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger AS $$
+    BEGIN
+        IF OLD.updated_at IS NULL AND NEW.updated_at IS NOT NULL THEN
+            RETURN NEW;
+        END IF;
+        NEW.updated_at = now();
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER participants_set_updated_at BEFORE UPDATE ON participants
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at()
+    """,
+    backfill,
+    set_not_null,
+    create_index,
+]
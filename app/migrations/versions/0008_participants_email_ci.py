@@ -0,0 +1,28 @@
+"""
+Case-insensitive email uniqueness: get_by_email and the participant upsert match on lower(email),
+so the unique index does too. It replaces both uq_participants_email (case-sensitive) and the plain
+ix_participants_email_lower, which it also serves as the lookup index.
+
+Rows that differ only in case (possible before 0002) stop the migration: merge them first, the
+query is in the error hint. The index is built on the partitioned table, which cannot be done
+CONCURRENTLY; participants is locked against writes while it builds.
+"""
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    """
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM participants GROUP BY campaign_id, lower(email) HAVING count(*) > 1) THEN
+            RAISE EXCEPTION 'participants has emails that differ only in case'
+                USING HINT = 'SELECT campaign_id, lower(email), array_agg(id) FROM participants '
+                             'GROUP BY 1, 2 HAVING count(*) > 1';
+        END IF;
+    END
+    $$
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_participants_email_lower ON participants (campaign_id, lower(email))",
+    "DROP INDEX IF EXISTS ix_participants_email_lower",
+    "ALTER TABLE participants DROP CONSTRAINT IF EXISTS uq_participants_email",
+]
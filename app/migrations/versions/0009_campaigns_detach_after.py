@@ -0,0 +1,11 @@
+"""
+campaigns.detach_after: archiving stores when the campaign's partitions may be detached, and the
+primary worker detaches them once that time has passed, so a restart in between only delays it.
+campaigns is a handful of rows; the ALTER takes its lock for milliseconds.
+"""
+
+TRANSACTIONAL = True
+
+STATEMENTS = [
+    "ALTER TABLE campaigns ADD COLUMN IF NOT EXISTS detach_after TIMESTAMP WITH TIME ZONE",
+]
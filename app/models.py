@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import String, DateTime, BigInteger, Integer, Boolean, UniqueConstraint, func, Text
+from typing import Any
+from sqlalchemy import String, DateTime, BigInteger, Integer, Boolean, UniqueConstraint, Index, func, text, Text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -9,18 +11,48 @@ class Base(DeclarativeBase):
     pass
 
 
+class Campaign(Base):
+    """
+    One giveaway. Fields left empty fall back to the global Settings.
+    """
+    __tablename__ = "campaigns"
+    __table_args__ = (UniqueConstraint("slug", name="uq_campaigns_slug"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    slug: Mapped[str] = mapped_column(String(64), nullable=False)  # /start <slug> deep link
+    title: Mapped[str] = mapped_column(String(255), nullable=False)
+    unisender_list_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    cinema_limit: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    guide_link: Mapped[str | None] = mapped_column(Text, nullable=True)
+    fallback_promo: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+    # set when the campaign is archived: its partitions are detached once this time has passed
+    detach_after: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
 class Participant(Base):
+    """
+    LIST-partitioned by campaign_id (participants_c<id>), so each campaign can be detached on its own.
+    """
     __tablename__ = "participants"
     __table_args__ = (
-        UniqueConstraint("email", name="uq_participants_email"),
-        UniqueConstraint("telegram_id", name="uq_participants_telegram_id"),
+        # emails are unique case-insensitively, the same way get_by_email and the upsert match them
+        Index("uq_participants_email_lower", "campaign_id", text("lower(email)"), unique=True),
+        UniqueConstraint("campaign_id", "telegram_id", name="uq_participants_telegram_id"),
+        Index("ix_participants_reward_type", "campaign_id", "reward_type"),
+        Index("ix_participants_updated_at", "updated_at", "id"),
+        {"postgresql_partition_by": "LIST (campaign_id)"},
     )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    campaign_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
     email: Mapped[str] = mapped_column(String(320), nullable=False)
 
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # set by the participants_set_updated_at trigger on every UPDATE; the watermark of the CRM export
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # reward
     reward_type: Mapped[str | None] = mapped_column(String(32), nullable=True)  # cinema | guide | promo
@@ -29,12 +61,18 @@ class Participant(Base):
 
 class PromoCode(Base):
     """
-    Storage for limited cinema promo codes.
+    Storage for limited cinema promo codes; LIST-partitioned by campaign_id like participants.
     """
     __tablename__ = "promo_codes"
-    __table_args__ = (UniqueConstraint("code", name="uq_promo_codes_code"),)
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "code", name="uq_promo_codes_code"),
+        Index("ix_promo_codes_free", "campaign_id", "kind", "id", postgresql_where=text("is_used IS FALSE")),
+        Index("ix_promo_codes_kind_used_id", "campaign_id", "kind", "is_used", "id"),
+        {"postgresql_partition_by": "LIST (campaign_id)"},
+    )
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    campaign_id: Mapped[int] = mapped_column(Integer, primary_key=True)
     kind: Mapped[str] = mapped_column(String(32), nullable=False, default="cinema")  # cinema
     code: Mapped[str] = mapped_column(String(128), nullable=False)
     is_used: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
@@ -45,9 +83,12 @@ class PromoCode(Base):
 
 class BotText(Base):
     __tablename__ = "bot_texts"
-    __table_args__ = (UniqueConstraint("key", name="uq_bot_texts_key"),)
+    __table_args__ = (
+        Index("uq_bot_texts_campaign_key", text("COALESCE(campaign_id, 0)"), "key", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    campaign_id: Mapped[int | None] = mapped_column(Integer, nullable=True)  # None = shared by all campaigns
     key: Mapped[str] = mapped_column(String(128), nullable=False)
     value: Mapped[str] = mapped_column(Text, nullable=False)
 
@@ -59,3 +100,95 @@ class BotConfig(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     key: Mapped[str] = mapped_column(String(128), nullable=False)
     value: Mapped[str] = mapped_column(Text, nullable=False)
+
+
+class Broadcast(Base):
+    """
+    Admin broadcast; progress is checkpointed so a restart resumes after the last finished page.
+    """
+    __tablename__ = "broadcasts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    campaign_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    text: Mapped[str] = mapped_column(Text, nullable=False)
+    reward_type: Mapped[str | None] = mapped_column(String(32), nullable=True)  # None = everyone
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="running")  # running | done | cancelled
+    admin_chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    status_message_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    last_participant_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sent: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    blocked: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class BlockedUser(Base):
+    """
+    Users who blocked the bot (seen as 403 during a broadcast); skipped by later broadcasts until they /start again.
+    """
+    __tablename__ = "blocked_users"
+
+    telegram_id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
+    blocked_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class FlowEvent(Base):
+    """
+    Append-only log of email_flow outcomes. Rows are written in batches by EventLog, never updated.
+    """
+    __tablename__ = "flow_events"
+    __table_args__ = (
+        Index("ix_flow_events_created_at", "created_at", postgresql_using="brin"),
+        Index("ix_flow_events_email", "campaign_id", text("lower(email)"), "created_at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)  # when the update was handled
+    campaign_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    email: Mapped[str | None] = mapped_column(String(255), nullable=True)  # None when the input was not an email
+    outcome: Mapped[str] = mapped_column(String(64), nullable=False)  # same values as email_flow_outcomes_total
+    email_status: Mapped[str | None] = mapped_column(String(32), nullable=True)  # Unisender status, if it was checked
+    reward_type: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    duration_ms: Mapped[int] = mapped_column(Integer, nullable=False)
+    unisender_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    db_ms: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+
+class PendingVerification(Base):
+    """
+    Users whose subscription was not confirmed yet (or whose check hit a Unisender outage).
+    PendingVerificationService re-checks them in the background until they confirm or the entry expires.
+    """
+    __tablename__ = "pending_verifications"
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "telegram_id", name="uq_pending_verifications_user"),
+        Index("ix_pending_verifications_next_check_at", "next_check_at"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    campaign_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    email: Mapped[str] = mapped_column(String(320), nullable=False)
+    reason: Mapped[str] = mapped_column(String(64), nullable=False)  # not_confirmed_invited | unisender_unavailable
+    last_status: Mapped[str | None] = mapped_column(String(32), nullable=True)  # Unisender status of the last check
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_check_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+
+class FsmState(Base):
+    """
+    aiogram FSM state and data (DbStorage), shared by all worker processes.
+    """
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)  # bot:chat:user:thread:business:destiny
+    state: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    data: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False, default=dict)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import logging
-from sqlalchemy import select, update
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import BotConfig
@@ -29,3 +29,7 @@ class BotConfigRepo:
             return
         log.info("Creating bot config", extra={"key": key})
         session.add(BotConfig(key=key, value=value))
+
+    @staticmethod
+    async def delete(session: AsyncSession, key: str) -> None:
+        await session.execute(delete(BotConfig).where(BotConfig.key == key))
@@ -10,27 +10,57 @@ log = logging.getLogger(__name__)
 
 
 class BotTextRepo:
+    """
+    campaign_id=None addresses the global text; campaign rows override it for that campaign only.
+    """
     @staticmethod
-    async def get(session: AsyncSession, key: str) -> BotText | None:
-        log.debug("Fetching bot text", extra={"key": key})
-        res = await session.execute(select(BotText).where(BotText.key == key))
+    def _scope(campaign_id: int | None):
+        if campaign_id is None:
+            return BotText.campaign_id.is_(None)
+        return BotText.campaign_id == campaign_id
+
+    @staticmethod
+    async def get_exact(session: AsyncSession, key: str, campaign_id: int | None = None) -> BotText | None:
+        res = await session.execute(select(BotText).where(BotText.key == key, BotTextRepo._scope(campaign_id)))
         return res.scalar_one_or_none()
 
     @staticmethod
-    async def set(session: AsyncSession, key: str, value: str) -> None:
-        existing = await BotTextRepo.get(session, key)
+    async def get(session: AsyncSession, key: str, campaign_id: int | None = None) -> BotText | None:
+        log.debug("Fetching bot text", extra={"key": key, "campaign_id": campaign_id})
+        if campaign_id is None:
+            return await BotTextRepo.get_exact(session, key)
+        # campaign row first, global row as fallback
+        res = await session.execute(
+            select(BotText)
+            .where(BotText.key == key, (BotText.campaign_id == campaign_id) | BotText.campaign_id.is_(None))
+            .order_by(BotText.campaign_id.asc().nulls_last())
+            .limit(1)
+        )
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def set(session: AsyncSession, key: str, value: str, campaign_id: int | None = None) -> None:
+        existing = await BotTextRepo.get_exact(session, key, campaign_id)
         if existing:
-            log.info("Updating bot text", extra={"key": key})
+            log.info("Updating bot text", extra={"key": key, "campaign_id": campaign_id})
             await session.execute(
                 update(BotText)
-                .where(BotText.key == key)
+                .where(BotText.key == key, BotTextRepo._scope(campaign_id))
                 .values(value=value)
             )
             return
-        log.info("Creating bot text", extra={"key": key})
-        session.add(BotText(key=key, value=value))
+        log.info("Creating bot text", extra={"key": key, "campaign_id": campaign_id})
+        session.add(BotText(key=key, value=value, campaign_id=campaign_id))
+
+    @staticmethod
+    async def list_all(session: AsyncSession) -> list[BotText]:
+        res = await session.execute(select(BotText))
+        return list(res.scalars().all())
 
     @staticmethod
-    async def list_keys(session: AsyncSession) -> list[str]:
-        res = await session.execute(select(BotText.key).order_by(BotText.key.asc()))
+    async def list_keys(session: AsyncSession, campaign_id: int | None = None) -> list[str]:
+        stmt = select(BotText.key).distinct().order_by(BotText.key.asc())
+        if campaign_id is not None:
+            stmt = stmt.where((BotText.campaign_id == campaign_id) | BotText.campaign_id.is_(None))
+        res = await session.execute(stmt)
         return [row[0] for row in res.fetchall()]
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+import logging
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import BlockedUser, Broadcast
+
+
+log = logging.getLogger(__name__)
+
+
+class BroadcastRepo:
+    @staticmethod
+    async def create(
+        session: AsyncSession,
+        campaign_id: int,
+        text: str,
+        reward_type: str | None,
+        admin_chat_id: int,
+        total: int,
+    ) -> Broadcast:
+        obj = Broadcast(
+            campaign_id=campaign_id,
+            text=text,
+            reward_type=reward_type,
+            admin_chat_id=admin_chat_id,
+            total=total,
+            status="running",
+        )
+        session.add(obj)
+        await session.flush()
+        log.info(
+            "Broadcast created",
+            extra={"broadcast_id": obj.id, "campaign_id": campaign_id, "reward_type": reward_type, "total": total},
+        )
+        return obj
+
+    @staticmethod
+    async def get(session: AsyncSession, broadcast_id: int) -> Broadcast | None:
+        res = await session.execute(select(Broadcast).where(Broadcast.id == broadcast_id))
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def list_running(session: AsyncSession) -> list[Broadcast]:
+        res = await session.execute(
+            select(Broadcast).where(Broadcast.status == "running").order_by(Broadcast.id.asc())
+        )
+        return list(res.scalars().all())
+
+    @staticmethod
+    async def set_status_message(session: AsyncSession, broadcast_id: int, message_id: int) -> None:
+        await session.execute(
+            update(Broadcast).where(Broadcast.id == broadcast_id).values(status_message_id=message_id)
+        )
+
+    @staticmethod
+    async def save_progress(
+        session: AsyncSession,
+        broadcast_id: int,
+        last_participant_id: int,
+        sent: int,
+        failed: int,
+        blocked: int,
+    ) -> None:
+        await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id)
+            .values(last_participant_id=last_participant_id, sent=sent, failed=failed, blocked=blocked)
+        )
+
+    @staticmethod
+    async def get_status(session: AsyncSession, broadcast_id: int) -> str | None:
+        res = await session.execute(select(Broadcast.status).where(Broadcast.id == broadcast_id))
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def finish(session: AsyncSession, broadcast_id: int, status: str) -> bool:
+        """
+        Returns False when the broadcast was no longer running.
+        """
+        log.info("Broadcast finished", extra={"broadcast_id": broadcast_id, "status": status})
+        res = await session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id, Broadcast.status == "running")
+            .values(status=status, finished_at=datetime.now(tz=timezone.utc))
+        )
+        return bool(res.rowcount)
+
+
+class BlockedUserRepo:
+    @staticmethod
+    async def add(session: AsyncSession, telegram_id: int) -> None:
+        log.debug("Marking user as blocked", extra={"telegram_id": telegram_id})
+        await session.execute(
+            pg_insert(BlockedUser).values(telegram_id=telegram_id).on_conflict_do_nothing()
+        )
+
+    @staticmethod
+    async def exists(session: AsyncSession, telegram_id: int) -> bool:
+        res = await session.execute(select(BlockedUser.telegram_id).where(BlockedUser.telegram_id == telegram_id))
+        return res.first() is not None
+
+    @staticmethod
+    async def remove(session: AsyncSession, telegram_id: int) -> None:
+        await session.execute(delete(BlockedUser).where(BlockedUser.telegram_id == telegram_id))
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+import logging
+from sqlalchemy import func, select, text, update
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.models import Campaign
+
+
+log = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("participants", "promo_codes")
+# created by migration 0003 and owning every row that existed before campaigns
+DEFAULT_CAMPAIGN_ID = 1
+
+
+class CampaignRepo:
+    @staticmethod
+    async def get(session: AsyncSession, campaign_id: int) -> Campaign | None:
+        log.debug("Fetching campaign", extra={"campaign_id": campaign_id})
+        res = await session.execute(select(Campaign).where(Campaign.id == campaign_id))
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def get_by_slug(session: AsyncSession, slug: str) -> Campaign | None:
+        log.debug("Fetching campaign by slug", extra={"slug": slug})
+        res = await session.execute(select(Campaign).where(Campaign.slug == slug))
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def list_all(session: AsyncSession, active_only: bool = False) -> list[Campaign]:
+        stmt = select(Campaign).order_by(Campaign.id.asc())
+        if active_only:
+            stmt = stmt.where(Campaign.is_active.is_(True))
+        res = await session.execute(stmt)
+        return list(res.scalars().all())
+
+    @staticmethod
+    async def create(
+        session: AsyncSession,
+        slug: str,
+        title: str,
+        unisender_list_id: str | None,
+        cinema_limit: int | None,
+    ) -> Campaign:
+        obj = Campaign(
+            slug=slug,
+            title=title,
+            unisender_list_id=unisender_list_id,
+            cinema_limit=cinema_limit,
+            is_active=True,
+        )
+        session.add(obj)
+        await session.flush()
+        log.info("Campaign created", extra={"campaign_id": obj.id, "slug": slug})
+        return obj
+
+    @staticmethod
+    async def set_cinema_limit(session: AsyncSession, campaign_id: int, cinema_limit: int) -> None:
+        log.info("Updating campaign limit", extra={"campaign_id": campaign_id, "cinema_limit": cinema_limit})
+        await session.execute(update(Campaign).where(Campaign.id == campaign_id).values(cinema_limit=cinema_limit))
+
+    @staticmethod
+    async def set_active(session: AsyncSession, campaign_id: int, is_active: bool) -> None:
+        log.info("Updating campaign status", extra={"campaign_id": campaign_id, "is_active": is_active})
+        await session.execute(update(Campaign).where(Campaign.id == campaign_id).values(is_active=is_active))
+
+    @staticmethod
+    async def schedule_detach(session: AsyncSession, campaign_id: int, grace: float) -> datetime | None:
+        """
+        Deactivates the campaign and sets detach_after on the DB clock, which every worker shares.
+        """
+        log.info("Scheduling campaign detach", extra={"campaign_id": campaign_id, "grace": grace})
+        res = await session.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id)
+            .values(is_active=False, detach_after=func.now() + timedelta(seconds=grace))
+            .returning(Campaign.detach_after)
+        )
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def restore(session: AsyncSession, campaign_id: int) -> bool:
+        """
+        Re-activates a campaign whose detach has not come due yet; once it has, the detacher owns it.
+        """
+        res = await session.execute(
+            update(Campaign)
+            .where(Campaign.id == campaign_id, Campaign.detach_after > func.now())
+            .values(is_active=True, detach_after=None)
+            .returning(Campaign.id)
+        )
+        restored = res.first() is not None
+        log.info("Campaign restore requested", extra={"campaign_id": campaign_id, "restored": restored})
+        return restored
+
+    @staticmethod
+    async def due_detach(session: AsyncSession) -> list[int]:
+        res = await session.execute(
+            select(Campaign.id).where(Campaign.detach_after <= func.now()).order_by(Campaign.id.asc())
+        )
+        return [row[0] for row in res.fetchall()]
+
+    @staticmethod
+    async def finish_detach(session: AsyncSession, campaign_id: int) -> None:
+        await session.execute(update(Campaign).where(Campaign.id == campaign_id).values(detach_after=None))
+
+    @staticmethod
+    async def create_partitions(session: AsyncSession, campaign_id: int) -> None:
+        """
+        Builds each partition as a plain table and ATTACHes it: ATTACH only needs
+        SHARE UPDATE EXCLUSIVE on the parent, so claims in other campaigns are not blocked.
+        """
+        campaign_id = int(campaign_id)
+        for table in PARTITIONED_TABLES:
+            partition = f"{table}_c{campaign_id}"
+            await session.execute(
+                text(f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+            )
+            await session.execute(
+                text(f"ALTER TABLE {partition} ADD CONSTRAINT {partition}_campaign CHECK (campaign_id = {campaign_id})")
+            )
+            await session.execute(
+                text(f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES IN ({campaign_id})")
+            )
+        log.info("Campaign partitions created", extra={"campaign_id": campaign_id})
+
+    @staticmethod
+    async def detach_partitions(conn: AsyncConnection, campaign_id: int) -> list[str]:
+        """
+        DETACH ... CONCURRENTLY cannot run in a transaction: `conn` must be in AUTOCOMMIT mode.
+        The detached tables keep their data and can be dumped or dropped later. Safe to repeat after
+        an interrupted run: detached partitions are skipped, a half-done concurrent detach is finalized.
+        """
+        campaign_id = int(campaign_id)
+        detached: list[str] = []
+        for table in PARTITIONED_TABLES:
+            partition = f"{table}_c{campaign_id}"
+            res = await conn.execute(
+                text(
+                    "SELECT inhdetachpending FROM pg_inherits "
+                    "WHERE inhrelid = to_regclass(:partition) AND inhparent = to_regclass(:table)"
+                ),
+                {"partition": partition, "table": table},
+            )
+            pending = res.scalar_one_or_none()
+            if pending is True:
+                await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition} FINALIZE"))
+            elif pending is False:
+                await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {partition} CONCURRENTLY"))
+            detached.append(partition)
+        log.info("Campaign partitions detached", extra={"campaign_id": campaign_id, "tables": detached})
+        return detached
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Sequence
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import FlowEvent
+
+
+log = logging.getLogger(__name__)
+
+# 11 bind params per row; asyncpg allows at most 32767 per statement.
+EVENTS_INSERT_BATCH_SIZE = 2000
+
+
+class FlowEventRepo:
+    @staticmethod
+    async def insert_many(session: AsyncSession, rows: Sequence[dict[str, Any]]) -> int:
+        """
+        One multi-row INSERT per EVENTS_INSERT_BATCH_SIZE rows. Returns the number of rows written.
+        """
+        for start in range(0, len(rows), EVENTS_INSERT_BATCH_SIZE):
+            await session.execute(insert(FlowEvent).values(list(rows[start:start + EVENTS_INSERT_BATCH_SIZE])))
+        log.debug("Flow events written", extra={"count": len(rows)})
+        return len(rows)
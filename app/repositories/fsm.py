@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import logging
+from typing import Any
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import FsmState
+
+
+log = logging.getLogger(__name__)
+
+
+class FsmStateRepo:
+    @staticmethod
+    async def get_state(session: AsyncSession, key: str) -> str | None:
+        res = await session.execute(select(FsmState.state).where(FsmState.key == key))
+        return res.scalar_one_or_none()
+
+    @staticmethod
+    async def get_data(session: AsyncSession, key: str) -> dict[str, Any]:
+        res = await session.execute(select(FsmState.data).where(FsmState.key == key))
+        return dict(res.scalar_one_or_none() or {})
+
+    @staticmethod
+    async def set_state(session: AsyncSession, key: str, state: str | None) -> None:
+        log.debug("Setting FSM state", extra={"key": key, "state": state})
+        stmt = pg_insert(FsmState).values(key=key, state=state, data={})
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FsmState.key],
+                set_={"state": stmt.excluded.state, "updated_at": func.now()},
+            )
+        )
+
+    @staticmethod
+    async def set_data(session: AsyncSession, key: str, data: dict[str, Any]) -> None:
+        stmt = pg_insert(FsmState).values(key=key, data=data)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[FsmState.key],
+                set_={"data": stmt.excluded.data, "updated_at": func.now()},
+            )
+        )
@@ -1,62 +1,255 @@
 from __future__ import annotations
 
+from datetime import datetime
 import logging
-from sqlalchemy import select, func
+from sqlalchemy import (
+    BigInteger,
+    CompoundSelect,
+    Integer,
+    Select,
+    String,
+    delete,
+    func,
+    literal,
+    select,
+    tuple_,
+    union_all,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Participant
+from app.models import BlockedUser, Participant
 
 
 log = logging.getLogger(__name__)
 
+UPSERT_ATTEMPTS = 3
+
 
 class ParticipantRepo:
+    """
+    Every query is scoped by campaign_id, so Postgres prunes to that campaign's partition.
+    """
     @staticmethod
-    async def get_by_telegram_id(session: AsyncSession, telegram_id: int) -> Participant | None:
-        log.debug("Fetching participant by telegram_id", extra={"telegram_id": telegram_id})
-        res = await session.execute(select(Participant).where(Participant.telegram_id == telegram_id))
+    async def get_by_telegram_id(session: AsyncSession, campaign_id: int, telegram_id: int) -> Participant | None:
+        log.debug("Fetching participant by telegram_id", extra={"campaign_id": campaign_id, "telegram_id": telegram_id})
+        res = await session.execute(
+            select(Participant).where(Participant.campaign_id == campaign_id, Participant.telegram_id == telegram_id)
+        )
         return res.scalar_one_or_none()
 
     @staticmethod
-    async def get_by_email(session: AsyncSession, email: str) -> Participant | None:
-        log.debug("Fetching participant by email", extra={"email": email})
-        res = await session.execute(select(Participant).where(Participant.email == email))
-        return res.scalar_one_or_none()
+    def by_email_query(campaign_id: int, email: str) -> Select:
+        # case-insensitive, served by the unique index uq_participants_email_lower
+        return (
+            select(Participant)
+            .where(Participant.campaign_id == campaign_id, func.lower(Participant.email) == email.lower())
+            .order_by(Participant.id.asc())
+            .limit(1)
+        )
 
     @staticmethod
-    async def create_if_missing(session: AsyncSession, telegram_id: int, email: str) -> Participant:
-        log.debug("Create participant if missing", extra={"telegram_id": telegram_id, "email": email})
-        existing = await ParticipantRepo.get_by_email(session, email)
-        if existing:
-            # If same email used by different tg — we keep first issuer; you can change this rule if needed.
-            log.info("Participant found by email", extra={"participant_id": existing.id, "email": email})
-            return existing
+    async def get_by_email(session: AsyncSession, campaign_id: int, email: str) -> Participant | None:
+        log.debug("Fetching participant by email", extra={"campaign_id": campaign_id, "email": email})
+        res = await session.execute(ParticipantRepo.by_email_query(campaign_id, email))
+        return res.scalar_one_or_none()
 
-        existing_tg = await ParticipantRepo.get_by_telegram_id(session, telegram_id)
-        if existing_tg:
-            # update email if user changed it
-            log.info("Participant found by telegram_id, updating email", extra={"participant_id": existing_tg.id})
-            existing_tg.email = email
-            return existing_tg
+    @staticmethod
+    def upsert_query(campaign_id: int, telegram_id: int, email: str) -> CompoundSelect:
+        """
+        One statement with the same rules as before:
+        1) the email already belongs to someone -> that participant (first owner wins);
+        2) this telegram_id exists -> its email is updated;
+        3) otherwise a new participant is inserted.
+        Returns no row when a concurrent transaction inserted a conflicting row first, and raises
+        IntegrityError when the UPDATE branch collides with a concurrently inserted email;
+        create_if_missing retries both.
+        """
+        p = Participant.__table__
+        by_email = (
+            select(p)
+            .where(p.c.campaign_id == campaign_id, func.lower(p.c.email) == email.lower())
+            .order_by(p.c.id.asc())
+            .limit(1)
+            .cte("by_email")
+        )
+        email_taken = select(by_email.c.id).exists()
+        updated = (
+            update(p)
+            .where(p.c.campaign_id == campaign_id, p.c.telegram_id == telegram_id, ~email_taken)
+            .values(email=email)
+            .returning(*p.c)
+            .cte("updated")
+        )
+        inserted = (
+            pg_insert(p)
+            .from_select(
+                ["campaign_id", "telegram_id", "email"],
+                select(
+                    literal(campaign_id, Integer),
+                    literal(telegram_id, BigInteger),
+                    literal(email, String),
+                ).where(
+                    ~email_taken,
+                    ~select(updated.c.id).exists(),
+                ),
+            )
+            .on_conflict_do_nothing()
+            .returning(*p.c)
+            .cte("inserted")
+        )
+        return union_all(select(by_email), select(updated), select(inserted))
 
-        obj = Participant(telegram_id=telegram_id, email=email)
-        session.add(obj)
-        await session.flush()
-        log.info("Participant created", extra={"participant_id": obj.id})
-        return obj
+    @staticmethod
+    async def create_if_missing(session: AsyncSession, campaign_id: int, telegram_id: int, email: str) -> Participant:
+        log.debug(
+            "Create participant if missing",
+            extra={"campaign_id": campaign_id, "telegram_id": telegram_id, "email": email},
+        )
+        stmt = (
+            select(Participant)
+            .from_statement(ParticipantRepo.upsert_query(campaign_id, telegram_id, email))
+            .execution_options(populate_existing=True)
+        )
+        for attempt in range(1, UPSERT_ATTEMPTS + 1):
+            try:
+                # a savepoint, so a unique violation leaves the caller's transaction usable
+                async with session.begin_nested():
+                    res = await session.execute(stmt)
+                    participant = res.scalars().first()
+            except IntegrityError:
+                # the UPDATE branch moved this telegram_id to an email a concurrent transaction
+                # inserted after our snapshot; that owner is committed now, the re-read returns it
+                log.info(
+                    "Participant upsert hit a unique violation, retrying",
+                    extra={"telegram_id": telegram_id, "attempt": attempt},
+                )
+                continue
+            if participant:
+                log.info("Participant upserted", extra={"participant_id": participant.id, "attempt": attempt})
+                return participant
+            # lost an insert race (ON CONFLICT DO NOTHING); the winner is committed now, so re-read
+            log.info("Participant upsert conflicted, retrying", extra={"telegram_id": telegram_id, "attempt": attempt})
+        raise RuntimeError(f"Participant upsert did not converge for telegram_id={telegram_id}")
 
     @staticmethod
-    async def count_cinema_winners(session: AsyncSession) -> int:
-        log.debug("Counting cinema winners")
-        res = await session.execute(
-            select(func.count()).select_from(Participant).where(Participant.reward_type == "cinema")
+    def cinema_winners_query(campaign_id: int) -> Select:
+        # served by ix_participants_reward_type
+        return (
+            select(func.count())
+            .select_from(Participant)
+            .where(Participant.campaign_id == campaign_id, Participant.reward_type == "cinema")
         )
+
+    @staticmethod
+    async def count_cinema_winners(session: AsyncSession, campaign_id: int) -> int:
+        log.debug("Counting cinema winners", extra={"campaign_id": campaign_id})
+        res = await session.execute(ParticipantRepo.cinema_winners_query(campaign_id))
         count = int(res.scalar_one())
         log.debug("Cinema winners count fetched", extra={"count": count})
         return count
 
     @staticmethod
-    async def list_all(session: AsyncSession) -> list[Participant]:
-        log.debug("Listing all participants")
-        res = await session.execute(select(Participant).order_by(Participant.id.asc()))
+    async def list_all(session: AsyncSession, campaign_id: int) -> list[Participant]:
+        log.debug("Listing all participants", extra={"campaign_id": campaign_id})
+        res = await session.execute(
+            select(Participant).where(Participant.campaign_id == campaign_id).order_by(Participant.id.asc())
+        )
+        return list(res.scalars().all())
+
+    @staticmethod
+    async def max_id(session: AsyncSession, campaign_id: int) -> int | None:
+        res = await session.execute(select(func.max(Participant.id)).where(Participant.campaign_id == campaign_id))
+        return res.scalar_one()
+
+    @staticmethod
+    async def delete_batch(
+        session: AsyncSession,
+        campaign_id: int,
+        after_id: int,
+        up_to_id: int,
+        limit: int,
+    ) -> list[int]:
+        """
+        Deletes the next keyset page (after_id, up_to_id] and returns deleted ids.
+        Rows created after the caller took `up_to_id` are never touched.
+        """
+        page = (
+            select(Participant.id)
+            .where(Participant.campaign_id == campaign_id, Participant.id > after_id, Participant.id <= up_to_id)
+            .order_by(Participant.id.asc())
+            .limit(limit)
+            .scalar_subquery()
+        )
+        res = await session.execute(
+            delete(Participant)
+            .where(Participant.campaign_id == campaign_id, Participant.id.in_(page))
+            .returning(Participant.id)
+        )
+        ids = [row[0] for row in res.fetchall()]
+        log.debug("Participants batch deleted", extra={"after_id": after_id, "deleted": len(ids)})
+        return ids
+
+    @staticmethod
+    def _recipients_filter(campaign_id: int, reward_type: str | None) -> list:
+        blocked = select(BlockedUser.telegram_id).where(BlockedUser.telegram_id == Participant.telegram_id)
+        conditions = [Participant.campaign_id == campaign_id, ~blocked.exists()]
+        if reward_type is not None:
+            conditions.append(Participant.reward_type == reward_type)
+        return conditions
+
+    @staticmethod
+    async def count_recipients(session: AsyncSession, campaign_id: int, reward_type: str | None = None) -> int:
+        res = await session.execute(
+            select(func.count())
+            .select_from(Participant)
+            .where(*ParticipantRepo._recipients_filter(campaign_id, reward_type))
+        )
+        return int(res.scalar_one())
+
+    @staticmethod
+    async def recipients_page(
+        session: AsyncSession,
+        campaign_id: int,
+        after_id: int,
+        limit: int,
+        reward_type: str | None = None,
+    ) -> list[tuple[int, int]]:
+        """
+        Keyset page of (participant_id, telegram_id) for broadcasts, skipping users who blocked the bot.
+        """
+        res = await session.execute(
+            select(Participant.id, Participant.telegram_id)
+            .where(Participant.id > after_id, *ParticipantRepo._recipients_filter(campaign_id, reward_type))
+            .order_by(Participant.id.asc())
+            .limit(limit)
+        )
+        return [(row[0], row[1]) for row in res.all()]
+
+    @staticmethod
+    async def changed_page(
+        session: AsyncSession,
+        after: tuple[datetime, int] | None,
+        until: datetime,
+        limit: int,
+        campaign_id: int | None = None,
+    ) -> list[Participant]:
+        """
+        Keyset page of participants created or changed after the `after` watermark (updated_at, id)
+        and no later than `until`, in watermark order; served by ix_participants_updated_at.
+        Without `campaign_id` it spans all campaigns (ids come from one sequence, so they are unique).
+        """
+        conditions = [Participant.updated_at <= until]
+        if after is not None:
+            conditions.append(tuple_(Participant.updated_at, Participant.id) > tuple_(after[0], after[1]))
+        if campaign_id is not None:
+            conditions.append(Participant.campaign_id == campaign_id)
+        res = await session.execute(
+            select(Participant)
+            .where(*conditions)
+            .order_by(Participant.updated_at.asc(), Participant.id.asc())
+            .limit(limit)
+        )
         return list(res.scalars().all())
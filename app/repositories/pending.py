@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import PendingVerification
+
+
+log = logging.getLogger(__name__)
+
+
+class PendingVerificationRepo:
+    @staticmethod
+    async def upsert(
+        session: AsyncSession,
+        campaign_id: int,
+        telegram_id: int,
+        email: str,
+        reason: str,
+        next_check_at: datetime,
+        expires_at: datetime,
+    ) -> None:
+        """
+        A repeated submission replaces the email and restarts the schedule and the expiry window.
+        """
+        log.debug(
+            "Upserting pending verification",
+            extra={"campaign_id": campaign_id, "telegram_id": telegram_id, "reason": reason},
+        )
+        stmt = pg_insert(PendingVerification).values(
+            campaign_id=campaign_id,
+            telegram_id=telegram_id,
+            email=email,
+            reason=reason,
+            attempts=0,
+            next_check_at=next_check_at,
+            expires_at=expires_at,
+        )
+        await session.execute(
+            stmt.on_conflict_do_update(
+                constraint="uq_pending_verifications_user",
+                set_={
+                    "email": stmt.excluded.email,
+                    "reason": stmt.excluded.reason,
+                    "attempts": 0,
+                    "next_check_at": stmt.excluded.next_check_at,
+                    "expires_at": stmt.excluded.expires_at,
+                },
+            )
+        )
+
+    @staticmethod
+    async def claim_due(
+        session: AsyncSession,
+        now: datetime,
+        lease_until: datetime,
+        limit: int,
+    ) -> list[PendingVerification]:
+        """
+        Takes up to `limit` due entries by pushing their next_check_at to `lease_until`.
+        SKIP LOCKED lets several processes poll the queue without checking the same user twice;
+        an entry whose checker died becomes due again when the lease runs out.
+        """
+        due = (
+            select(PendingVerification.id)
+            .where(PendingVerification.next_check_at <= now, PendingVerification.expires_at > now)
+            .order_by(PendingVerification.next_check_at.asc())
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        res = await session.scalars(
+            update(PendingVerification)
+            .where(PendingVerification.id.in_(due))
+            .values(next_check_at=lease_until)
+            .returning(PendingVerification)
+            .execution_options(synchronize_session=False)
+        )
+        entries = list(res.all())
+        log.debug("Pending verifications claimed", extra={"count": len(entries)})
+        return entries
+
+    @staticmethod
+    async def reschedule(
+        session: AsyncSession,
+        entry_id: int,
+        attempts: int,
+        next_check_at: datetime,
+        last_status: str | None,
+    ) -> None:
+        await session.execute(
+            update(PendingVerification)
+            .where(PendingVerification.id == entry_id)
+            .values(attempts=attempts, next_check_at=next_check_at, last_status=last_status)
+        )
+
+    @staticmethod
+    async def delete(session: AsyncSession, entry_id: int) -> None:
+        await session.execute(delete(PendingVerification).where(PendingVerification.id == entry_id))
+
+    @staticmethod
+    async def delete_for_user(session: AsyncSession, campaign_id: int, telegram_id: int) -> None:
+        await session.execute(
+            delete(PendingVerification).where(
+                PendingVerification.campaign_id == campaign_id,
+                PendingVerification.telegram_id == telegram_id,
+            )
+        )
+
+    @staticmethod
+    async def delete_expired(session: AsyncSession, now: datetime) -> int:
+        res = await session.execute(delete(PendingVerification).where(PendingVerification.expires_at <= now))
+        return res.rowcount or 0
+
+    @staticmethod
+    async def count(session: AsyncSession) -> int:
+        res = await session.execute(select(func.count()).select_from(PendingVerification))
+        return int(res.scalar_one())
@@ -1,45 +1,74 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from datetime import datetime, timezone
 import logging
-from sqlalchemy import select, update
+from typing import Iterable, Sequence
+from sqlalchemy import Select, delete, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import PromoCode
+from app.utils.promo_codes import batched
 
 
 log = logging.getLogger(__name__)
 
+# 5 bind params per row; asyncpg allows at most 32767 per statement.
+BULK_INSERT_BATCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class BulkInsertResult:
+    total: int
+    inserted: int
+
+    @property
+    def duplicates(self) -> int:
+        return self.total - self.inserted
+
 
 class PromoCodeRepo:
+    """
+    Every query is scoped by campaign_id, so Postgres prunes to that campaign's partition
+    and claims in different campaigns never touch the same rows or index pages.
+    """
     @staticmethod
-    async def get_free_code_for_update(session: AsyncSession, kind: str = "cinema") -> PromoCode | None:
-        """
-        Selects one unused code with FOR UPDATE to avoid races.
-        Works reliably inside a transaction.
-        """
-        log.debug("Selecting free promo code", extra={"kind": kind})
-        stmt = (
+    def free_code_query(campaign_id: int, kind: str = "cinema") -> Select:
+        # served by the partial index ix_promo_codes_free (campaign_id, kind, id) WHERE is_used IS FALSE
+        return (
             select(PromoCode)
-            .where(PromoCode.kind == kind, PromoCode.is_used.is_(False))
+            .where(PromoCode.campaign_id == campaign_id, PromoCode.kind == kind, PromoCode.is_used.is_(False))
             .order_by(PromoCode.id.asc())
             .with_for_update(skip_locked=True)
             .limit(1)
         )
-        res = await session.execute(stmt)
+
+    @staticmethod
+    async def get_free_code_for_update(
+        session: AsyncSession,
+        campaign_id: int,
+        kind: str = "cinema",
+    ) -> PromoCode | None:
+        """
+        Selects one unused code with FOR UPDATE to avoid races.
+        Works reliably inside a transaction.
+        """
+        log.debug("Selecting free promo code", extra={"campaign_id": campaign_id, "kind": kind})
+        res = await session.execute(PromoCodeRepo.free_code_query(campaign_id, kind))
         code = res.scalar_one_or_none()
         log.debug("Promo code selected", extra={"found": bool(code), "promo_code_id": code.id if code else None})
         return code
 
     @staticmethod
-    async def mark_used(session: AsyncSession, promo_code_id: int, participant_id: int) -> None:
+    async def mark_used(session: AsyncSession, campaign_id: int, promo_code_id: int, participant_id: int) -> None:
         log.info(
             "Marking promo code as used",
             extra={"promo_code_id": promo_code_id, "participant_id": participant_id},
         )
         await session.execute(
             update(PromoCode)
-            .where(PromoCode.id == promo_code_id, PromoCode.is_used.is_(False))
+            .where(PromoCode.campaign_id == campaign_id, PromoCode.id == promo_code_id, PromoCode.is_used.is_(False))
             .values(
                 is_used=True,
                 used_by_participant_id=participant_id,
@@ -48,14 +77,144 @@ class PromoCodeRepo:
         )
 
     @staticmethod
-    async def stats(session: AsyncSession, kind: str = "cinema") -> dict[str, int]:
-        total_res = await session.execute(
-            select(PromoCode.id).where(PromoCode.kind == kind)
+    async def stats(session: AsyncSession, campaign_id: int, kind: str = "cinema") -> dict[str, int]:
+        by_kind = await PromoCodeRepo.stats_by_kind(session, campaign_id, kinds=[kind])
+        return by_kind.get(kind, {"total": 0, "used": 0, "free": 0, "used_since": 0})
+
+    @staticmethod
+    async def stats_by_kind(
+        session: AsyncSession,
+        campaign_id: int,
+        kinds: Sequence[str] | None = None,
+        used_since: datetime | None = None,
+    ) -> dict[str, dict[str, int]]:
+        """
+        Total/used/free per kind in one aggregate query.
+        `used_since` counts codes claimed after that moment (0 when not given).
+        """
+        used_since_expr = (
+            func.count().filter(PromoCode.used_at >= used_since)
+            if used_since is not None
+            else literal(0)
+        )
+        stmt = (
+            select(
+                PromoCode.kind,
+                func.count().label("total"),
+                func.count().filter(PromoCode.is_used.is_(True)).label("used"),
+                used_since_expr.label("used_since"),
+            )
+            .where(PromoCode.campaign_id == campaign_id)
+            .group_by(PromoCode.kind)
+            .order_by(PromoCode.kind.asc())
+        )
+        if kinds is not None:
+            stmt = stmt.where(PromoCode.kind.in_(kinds))
+        res = await session.execute(stmt)
+        stats: dict[str, dict[str, int]] = {}
+        for kind, total, used, claimed in res.all():
+            stats[kind] = {"total": total, "used": used, "free": total - used, "used_since": int(claimed)}
+        log.debug("Promo code stats fetched", extra={"kinds": list(stats)})
+        return stats
+
+    @staticmethod
+    async def reset_used_batch(
+        session: AsyncSession,
+        campaign_id: int,
+        after_id: int,
+        participant_up_to_id: int,
+        limit: int,
+    ) -> list[int]:
+        """
+        Frees the next keyset page of used codes whose owner id is <= participant_up_to_id
+        (or unknown). Codes claimed by newer participants stay used.
+        Returns ids of codes that were reset.
+        """
+        page = (
+            select(PromoCode.id)
+            .where(
+                PromoCode.campaign_id == campaign_id,
+                PromoCode.id > after_id,
+                PromoCode.is_used.is_(True),
+                or_(
+                    PromoCode.used_by_participant_id.is_(None),
+                    PromoCode.used_by_participant_id <= participant_up_to_id,
+                ),
+            )
+            .order_by(PromoCode.id.asc())
+            .limit(limit)
+            .scalar_subquery()
         )
-        total = len(total_res.fetchall())
-        used_res = await session.execute(
-            select(PromoCode.id).where(PromoCode.kind == kind, PromoCode.is_used.is_(True))
+        res = await session.execute(
+            update(PromoCode)
+            .where(PromoCode.campaign_id == campaign_id, PromoCode.id.in_(page))
+            .values(is_used=False, used_by_participant_id=None, used_at=None)
+            .returning(PromoCode.id)
         )
-        used = len(used_res.fetchall())
-        free = total - used
-        return {"total": total, "used": used, "free": free}
+        ids = [row[0] for row in res.fetchall()]
+        log.debug("Promo codes batch reset", extra={"after_id": after_id, "reset": len(ids)})
+        return ids
+
+    @staticmethod
+    async def existing_codes(session: AsyncSession, campaign_id: int, codes: Sequence[str]) -> set[str]:
+        if not codes:
+            return set()
+        res = await session.execute(
+            select(PromoCode.code).where(PromoCode.campaign_id == campaign_id, PromoCode.code.in_(codes))
+        )
+        return {row[0] for row in res.fetchall()}
+
+    @staticmethod
+    async def insert_batch(
+        session: AsyncSession,
+        campaign_id: int,
+        codes: Sequence[str],
+        kind: str = "cinema",
+        note: str | None = None,
+    ) -> int:
+        """
+        Inserts one batch with a single INSERT ... ON CONFLICT DO NOTHING.
+        Returns the number of rows actually inserted (duplicates are skipped by the DB).
+        """
+        if not codes:
+            return 0
+        stmt = (
+            pg_insert(PromoCode)
+            .values(
+                [
+                    {"campaign_id": campaign_id, "kind": kind, "code": code, "note": note, "is_used": False}
+                    for code in codes
+                ]
+            )
+            .on_conflict_do_nothing(constraint="uq_promo_codes_code")
+            .returning(PromoCode.id)
+        )
+        res = await session.execute(stmt)
+        return len(res.fetchall())
+
+    @staticmethod
+    async def bulk_insert(
+        session: AsyncSession,
+        campaign_id: int,
+        codes: Iterable[str],
+        kind: str = "cinema",
+        note: str | None = None,
+        batch_size: int = BULK_INSERT_BATCH_SIZE,
+    ) -> BulkInsertResult:
+        """
+        Streams codes into the table in batches; `codes` may be a lazy iterator of any size.
+        Transaction boundaries are up to the caller.
+        """
+        total = 0
+        inserted = 0
+        for batch in batched(codes, batch_size):
+            total += len(batch)
+            inserted += await PromoCodeRepo.insert_batch(session, campaign_id, batch, kind=kind, note=note)
+            log.debug("Promo code batch inserted", extra={"kind": kind, "total": total, "inserted": inserted})
+        log.info("Promo codes bulk inserted", extra={"kind": kind, "total": total, "inserted": inserted})
+        return BulkInsertResult(total=total, inserted=inserted)
+
+    @staticmethod
+    async def delete_kind(session: AsyncSession, campaign_id: int, kind: str = "cinema") -> None:
+        log.info("Deleting promo codes", extra={"campaign_id": campaign_id, "kind": kind})
+        await session.execute(delete(PromoCode).where(PromoCode.campaign_id == campaign_id, PromoCode.kind == kind))
@@ -0,0 +1,112 @@
+"""
+What logging costs an email_flow-like handler: synchronous basicConfig vs the queue + JSON setup.
+
+    python app/scripts/bench_logging.py
+    python app/scripts/bench_logging.py --updates 20000 --sink-delay-ms 1
+
+Each simulated update logs like email_flow does (a few INFO/DEBUG lines with extra={...},
+including repository DEBUG lines) around awaits. --sink-delay-ms makes every stream write slow,
+like a blocked stderr pipe under a log shipper; with the queue setup only the listener thread pays for it.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.logging_cfg import TEXT_FORMAT, setup_logging, stop_listener
+
+
+class SlowSink(io.StringIO):
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+
+    def write(self, s: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        return len(s)
+
+
+async def handle_update(i: int) -> float:
+    handler_log = logging.getLogger("app.bot.handlers")
+    repo_log = logging.getLogger("app.repositories.participants")
+    started = time.perf_counter()
+    handler_log.info("Email received", extra={"telegram_id": i, "email": f"user{i}@example.com", "campaign_id": 1})
+    await asyncio.sleep(0)
+    handler_log.debug("Unisender status fetched", extra={"email": f"user{i}@example.com", "email_status": "active"})
+    repo_log.debug("Fetching participant by email", extra={"campaign_id": 1, "email": f"user{i}@example.com"})
+    repo_log.debug("Create participant if missing", extra={"campaign_id": 1, "telegram_id": i})
+    await asyncio.sleep(0)
+    handler_log.info("Reward assigned and committed", extra={"participant_id": i, "reward_type": "cinema"})
+    return time.perf_counter() - started
+
+
+async def run_updates(updates: int, concurrency: int) -> list[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> float:
+        async with semaphore:
+            return await handle_update(i)
+
+    return await asyncio.gather(*(one(i) for i in range(updates)))
+
+
+def configure(mode: str, sink: SlowSink):
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    if mode == "sync-text":
+        logging.basicConfig(level=logging.DEBUG, format=TEXT_FORMAT, stream=sink, force=True)
+        return None
+    sampling = "app.repositories=0.1" if mode == "queue-json-sampled" else ""
+    listener = setup_logging("DEBUG", "json", sampling)
+    # point the listener's stream handler at the sink
+    for handler in listener.handlers:
+        handler.setStream(sink)
+    return listener
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark per-update logging cost.")
+    parser.add_argument("--updates", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.0, help="artificial delay per stream write")
+    args = parser.parse_args()
+
+    modes = ["disabled", "sync-text", "queue-json", "queue-json-sampled"]
+    baseline = None
+    for mode in modes:
+        sink = SlowSink(args.sink_delay_ms / 1000)
+        listener = None
+        if mode == "disabled":
+            logging.getLogger().setLevel(logging.CRITICAL)
+        else:
+            listener = configure(mode, sink)
+        started = time.perf_counter()
+        durations = asyncio.run(run_updates(args.updates, args.concurrency))
+        elapsed = time.perf_counter() - started
+        if listener is not None:
+            stop_listener(listener)
+        drained = time.perf_counter() - started
+        mean_us = statistics.fmean(durations) * 1e6
+        p99_us = sorted(durations)[int(len(durations) * 0.99)] * 1e6
+        baseline = mean_us if baseline is None else baseline
+        print(
+            f"{mode:<20} updates/s={args.updates / elapsed:>9,.0f} handler mean={mean_us:8.1f}us "
+            f"p99={p99_us:9.1f}us logging cost={mean_us - baseline:8.1f}us/update "
+            f"(queue drained after {drained:.2f}s)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+normalize_email cost over a realistic message corpus, compared with calling validate_email directly.
+
+    python app/scripts/bench_normalize_email.py
+    python app/scripts/bench_normalize_email.py --messages 200000 --unique-emails 5000
+
+The corpus mixes what users actually send: free-form chat text, addresses with typos,
+and valid addresses repeated by "проверить ещё раз". Before timing, every message is checked
+to give the same result (normalized value or ValueError text) through both paths.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from email_validator import EmailNotValidError, validate_email
+
+from app.utils import validators
+from app.utils.validators import normalize_email
+
+
+logging.basicConfig(level=logging.ERROR, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+
+CHAT_TEXT = [
+    "Привет",
+    "как получить подарок?",
+    "Админ панель",
+    "спасибо!",
+    "я подтвердил подписку",
+    "не приходит письмо",
+    "ок",
+    "👍",
+    "",
+    "   ",
+]
+DOMAINS = ["gmail.com", "yandex.ru", "mail.ru", "bk.ru", "inbox.ru", "icloud.com", "rambler.ru"]
+TYPOS = [
+    "{user}@{domain} ",
+    "{user}@@{domain}",
+    "{user}@{domain}.",
+    "{user} @{domain}",
+    "{user}@gmailcom",
+    "{user}",
+    "{user}@.{domain}",
+    "{user}..x@{domain}",
+]
+
+
+def build_corpus(messages: int, unique_emails: int, seed: int) -> list[str]:
+    rnd = random.Random(seed)
+    emails = [f"user{i}.{rnd.randint(1000, 9999)}@{rnd.choice(DOMAINS)}" for i in range(unique_emails)]
+    corpus: list[str] = []
+    for _ in range(messages):
+        roll = rnd.random()
+        if roll < 0.25:
+            corpus.append(rnd.choice(CHAT_TEXT))
+        elif roll < 0.35:
+            corpus.append(rnd.choice(TYPOS).format(user=f"user{rnd.randint(0, 99999)}", domain=rnd.choice(DOMAINS)))
+        else:
+            # a few popular addresses are sent over and over, most only a couple of times
+            email = emails[min(int(rnd.paretovariate(1.2)) - 1, unique_emails - 1)] if roll < 0.6 else rnd.choice(emails)
+            corpus.append(email.upper() if rnd.random() < 0.05 else email)
+    return corpus
+
+
+def baseline(raw: str) -> str:
+    """
+    normalize_email as it was before the pre-filter and cache.
+    """
+    raw = (raw or "").strip()
+    if not raw:
+        raise ValueError("Пустой email")
+    try:
+        return validate_email(raw, check_deliverability=False).normalized
+    except EmailNotValidError as e:
+        raise ValueError("Некорректный email") from e
+
+
+def outcome(fn: Callable[[str], str], raw: str) -> str:
+    try:
+        return fn(raw)
+    except ValueError as e:
+        return f"ValueError: {e}"
+
+
+def timed(fn: Callable[[str], str], corpus: list[str]) -> float:
+    started = time.perf_counter()
+    for raw in corpus:
+        try:
+            fn(raw)
+        except ValueError:
+            pass
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark normalize_email against the plain validator.")
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--unique-emails", type=int, default=3_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    corpus = build_corpus(args.messages, args.unique_emails, args.seed)
+
+    mismatches = [raw for raw in set(corpus) if outcome(baseline, raw) != outcome(normalize_email, raw)]
+    if mismatches:
+        raise SystemExit(f"normalize_email differs from the validator for: {mismatches[:10]}")
+
+    validators._validate_cached.cache_clear()
+    results = {"validate_email": timed(baseline, corpus), "normalize_email": timed(normalize_email, corpus)}
+    info = validators._validate_cached.cache_info()
+    for name, elapsed in results.items():
+        print(f"{name:<16} {elapsed:.3f}s  {elapsed / len(corpus) * 1e6:8.2f} us/msg  {len(corpus) / elapsed:,.0f} msg/s")
+    print(f"speedup x{results['validate_email'] / results['normalize_email']:.1f}; "
+          f"cache hits={info.hits} misses={info.misses} size={info.currsize}/{info.maxsize}; "
+          f"pre-filtered={len(corpus) - info.hits - info.misses}")
+
+
+if __name__ == "__main__":
+    main()
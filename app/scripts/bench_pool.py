@@ -0,0 +1,112 @@
+"""
+Claim throughput for different pool configurations.
+
+    python app/scripts/bench_pool.py --workers 50 --codes 20000
+    python app/scripts/bench_pool.py --config 5:0:1 --config 20:10:0
+
+Each --config is pool_size:max_overflow:pre_ping. Every worker runs the same transaction as a real claim
+(SELECT ... FOR UPDATE SKIP LOCKED + UPDATE) on a throwaway kind until the seeded codes run out.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db import build_engine
+from app.metrics import DB_POOL_CHECKOUT_WAIT_SECONDS
+from app.repositories.campaigns import DEFAULT_CAMPAIGN_ID
+from app.repositories.promo_codes import PromoCodeRepo
+
+
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+log = logging.getLogger(__name__)
+
+BENCH_KIND = "bench_pool"
+DEFAULT_CONFIGS = ["5:0:1", "5:0:0", "10:10:0", "20:10:0", "40:20:0"]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def seed(maker: async_sessionmaker[AsyncSession], count: int) -> None:
+    prefix = uuid.uuid4().hex[:8]
+    async with maker() as session:
+        async with session.begin():
+            await PromoCodeRepo.delete_kind(session, DEFAULT_CAMPAIGN_ID, kind=BENCH_KIND)
+            await PromoCodeRepo.bulk_insert(
+                session, DEFAULT_CAMPAIGN_ID, (f"{prefix}{i:010d}" for i in range(count)), kind=BENCH_KIND
+            )
+
+
+async def claim_worker(maker: async_sessionmaker[AsyncSession], worker_id: int, latencies: list[float]) -> None:
+    while True:
+        started = time.perf_counter()
+        async with maker() as session:
+            async with session.begin():
+                code = await PromoCodeRepo.get_free_code_for_update(session, DEFAULT_CAMPAIGN_ID, kind=BENCH_KIND)
+                if code is None:
+                    return
+                await PromoCodeRepo.mark_used(session, DEFAULT_CAMPAIGN_ID, promo_code_id=code.id, participant_id=worker_id)
+        latencies.append(time.perf_counter() - started)
+
+
+def checkout_wait_total() -> tuple[float, float]:
+    samples = {s.name: s.value for metric in DB_POOL_CHECKOUT_WAIT_SECONDS.collect() for s in metric.samples}
+    return samples.get("db_pool_checkout_wait_seconds_sum", 0.0), samples.get("db_pool_checkout_wait_seconds_count", 0.0)
+
+
+async def run_config(config: str, workers: int, codes: int) -> None:
+    pool_size, max_overflow, pre_ping = (int(part) for part in config.split(":"))
+    engine = build_engine(pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=bool(pre_ping))
+    maker = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    try:
+        await seed(maker, codes)
+        wait_sum_before, wait_count_before = checkout_wait_total()
+        latencies: list[float] = []
+        started = time.perf_counter()
+        await asyncio.gather(*(claim_worker(maker, i, latencies) for i in range(workers)))
+        elapsed = time.perf_counter() - started
+        wait_sum, wait_count = checkout_wait_total()
+        checkouts = wait_count - wait_count_before
+        avg_wait_ms = (wait_sum - wait_sum_before) / checkouts * 1000 if checkouts else 0.0
+        print(
+            f"pool={pool_size:>3} overflow={max_overflow:>3} pre_ping={pre_ping} "
+            f"claims={len(latencies)} rate={len(latencies) / elapsed:,.0f}/s "
+            f"p50={statistics.median(latencies) * 1000:.1f}ms p95={percentile(latencies, 0.95) * 1000:.1f}ms "
+            f"p99={percentile(latencies, 0.99) * 1000:.1f}ms avg_checkout_wait={avg_wait_ms:.2f}ms"
+        )
+    finally:
+        async with maker() as session:
+            async with session.begin():
+                await PromoCodeRepo.delete_kind(session, DEFAULT_CAMPAIGN_ID, kind=BENCH_KIND)
+        await engine.dispose()
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark promo claim throughput per pool configuration.")
+    parser.add_argument("--config", action="append", dest="configs", help="pool_size:max_overflow:pre_ping")
+    parser.add_argument("--workers", type=int, default=50, help="concurrent claimers")
+    parser.add_argument("--codes", type=int, default=10_000, help="codes seeded per configuration")
+    args = parser.parse_args()
+    for config in args.configs or DEFAULT_CONFIGS:
+        await run_config(config, args.workers, args.codes)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Iterator
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.db import SessionMaker
+from app.repositories.campaigns import DEFAULT_CAMPAIGN_ID
+from app.repositories.promo_codes import BULK_INSERT_BATCH_SIZE, PromoCodeRepo
+
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+log = logging.getLogger(__name__)
+
+BENCH_KIND = "bench"
+
+
+def generate_codes(prefix: str, count: int) -> Iterator[str]:
+    # Same shape as partner files: "80  88151262"
+    for i in range(count):
+        yield f"{prefix}  {i:010d}"
+
+
+async def run_import(prefix: str, count: int, batch_size: int) -> None:
+    started = time.perf_counter()
+    async with SessionMaker() as session:
+        async with session.begin():
+            result = await PromoCodeRepo.bulk_insert(
+                session,
+                DEFAULT_CAMPAIGN_ID,
+                (code.replace(" ", "") for code in generate_codes(prefix, count)),
+                kind=BENCH_KIND,
+                batch_size=batch_size,
+            )
+    elapsed = time.perf_counter() - started
+    print(
+        f"batch={batch_size:>6} total={result.total} inserted={result.inserted} "
+        f"duplicates={result.duplicates} elapsed={elapsed:.2f}s rate={result.total / elapsed:,.0f} codes/s"
+    )
+
+
+async def cleanup() -> None:
+    async with SessionMaker() as session:
+        async with session.begin():
+            await PromoCodeRepo.delete_kind(session, DEFAULT_CAMPAIGN_ID, kind=BENCH_KIND)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark bulk promo code import against DATABASE_URL.")
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, action="append", dest="batch_sizes")
+    args = parser.parse_args()
+    batch_sizes = args.batch_sizes or [1000, BULK_INSERT_BATCH_SIZE]
+
+    try:
+        for batch_size in batch_sizes:
+            prefix = uuid.uuid4().hex[:8]
+            print(f"-- fresh import of {args.count} codes")
+            await run_import(prefix, args.count, batch_size)
+            print(f"-- re-import of the same {args.count} codes (all duplicates)")
+            await run_import(prefix, args.count, batch_size)
+    finally:
+        await cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,335 @@
+"""
+Micro-benchmarks of the repository and reward operations on the email_flow path.
+
+    python app/scripts/bench_repos.py --output bench.json
+    python app/scripts/bench_repos.py --scale 1000 --scale 100000 --scale 1000000 --concurrency 32
+    python app/scripts/bench_repos.py --op promo.get_free_code_for_update --compare baseline.json
+
+For every --scale a throwaway campaign is created with its own partitions and seeded with that many
+participants (half of them cinema winners) and promo codes (half used). Each operation is then run
+alone (one worker) and under contention (--concurrency workers on a pool of the same size, so the
+numbers show database contention rather than pool waits). Every iteration is one transaction,
+timed including its rollback, so writes never change the dataset.
+
+Results are written as JSON (one entry per scale/op/mode with ops/s and latency percentiles).
+With --compare the run is checked against an earlier file and entries whose p50 or p95 grew by
+more than --threshold are reported; the exit code is non-zero if there are any.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+import itertools
+import json
+import logging
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db import SessionMaker, build_engine
+from app.repositories.bot_texts import BotTextRepo
+from app.repositories.participants import ParticipantRepo
+from app.repositories.promo_codes import PromoCodeRepo
+from app.services.campaigns import CampaignInfo, CampaignService
+from app.services.rewards import RewardService
+
+
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+log = logging.getLogger(__name__)
+
+DEFAULT_SCALES = [1_000, 100_000, 1_000_000]
+TELEGRAM_ID_BASE = 2 * 10**12  # far above real user ids
+
+SEED_PARTICIPANTS = text(
+    """
+    INSERT INTO participants (campaign_id, telegram_id, email, reward_type, promo_code)
+    SELECT :campaign_id, :telegram_base + g, 'bench' || g || '@bench.example',
+           CASE WHEN g % 2 = 0 THEN 'cinema' ELSE 'guide' END,
+           CASE WHEN g % 2 = 0 THEN 'BENCH' || g END
+    FROM generate_series(1, :count) AS g
+    """
+)
+SEED_PROMO_CODES = text(
+    """
+    INSERT INTO promo_codes (campaign_id, kind, code, is_used, used_at)
+    SELECT :campaign_id, 'cinema', 'BENCH' || g, g % 2 = 0, CASE WHEN g % 2 = 0 THEN now() END
+    FROM generate_series(1, :count) AS g
+    """
+)
+
+
+@dataclass
+class BenchContext:
+    campaign: CampaignInfo
+    scale: int
+    participant_ids: list[int]
+    new_telegram_ids: itertools.count
+
+
+@dataclass
+class BenchResult:
+    scale: int
+    op: str
+    mode: str
+    concurrency: int
+    iterations: int
+    errors: int
+    ops_per_s: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+Operation = Callable[[AsyncSession, BenchContext], Awaitable[object]]
+
+
+async def op_get_free_code(session: AsyncSession, ctx: BenchContext) -> object:
+    return await PromoCodeRepo.get_free_code_for_update(session, ctx.campaign.id, kind="cinema")
+
+
+async def op_mark_used(session: AsyncSession, ctx: BenchContext) -> object:
+    code = await PromoCodeRepo.get_free_code_for_update(session, ctx.campaign.id, kind="cinema")
+    if code is not None:
+        await PromoCodeRepo.mark_used(
+            session, ctx.campaign.id, promo_code_id=code.id, participant_id=random.choice(ctx.participant_ids)
+        )
+    return code
+
+
+async def op_stats(session: AsyncSession, ctx: BenchContext) -> object:
+    return await PromoCodeRepo.stats(session, ctx.campaign.id, kind="cinema")
+
+
+async def op_create_new(session: AsyncSession, ctx: BenchContext) -> object:
+    telegram_id = next(ctx.new_telegram_ids)
+    email = f"new{telegram_id}@bench.example"
+    return await ParticipantRepo.create_if_missing(session, ctx.campaign.id, telegram_id, email)
+
+
+async def op_create_existing(session: AsyncSession, ctx: BenchContext) -> object:
+    g = random.randint(1, ctx.scale)
+    email = f"bench{g}@bench.example"
+    return await ParticipantRepo.create_if_missing(session, ctx.campaign.id, TELEGRAM_ID_BASE + g, email)
+
+
+async def op_count_winners(session: AsyncSession, ctx: BenchContext) -> object:
+    return await ParticipantRepo.count_cinema_winners(session, ctx.campaign.id)
+
+
+async def op_bot_text(session: AsyncSession, ctx: BenchContext) -> object:
+    # no campaign override exists, so this measures the campaign lookup plus the global fallback
+    return await BotTextRepo.get(session, "winner_message", ctx.campaign.id)
+
+
+async def op_assign_reward(session: AsyncSession, ctx: BenchContext) -> object:
+    return await RewardService.assign_reward(session, ctx.campaign, random.choice(ctx.participant_ids))
+
+
+OPERATIONS: dict[str, Operation] = {
+    "promo.get_free_code_for_update": op_get_free_code,
+    "promo.mark_used": op_mark_used,
+    "promo.stats": op_stats,
+    "participant.create_if_missing.new": op_create_new,
+    "participant.create_if_missing.existing": op_create_existing,
+    "participant.count_cinema_winners": op_count_winners,
+    "bot_text.get": op_bot_text,
+    "reward.assign_reward": op_assign_reward,
+}
+
+
+def percentile(values: list[float], pct: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def run_op(
+    maker: async_sessionmaker[AsyncSession],
+    ctx: BenchContext,
+    name: str,
+    concurrency: int,
+    iterations: int,
+    warmup: int,
+) -> BenchResult:
+    operation = OPERATIONS[name]
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker(count: int, record: bool) -> None:
+        nonlocal errors
+        async with maker() as session:
+            for _ in range(count):
+                started = time.perf_counter()
+                try:
+                    await operation(session, ctx)
+                    # every iteration is its own transaction and is rolled back, writes included
+                    await session.rollback()
+                except Exception:
+                    errors += 1
+                    log.exception("Benchmark operation failed", extra={"op": name})
+                    await session.rollback()
+                    continue
+                if record:
+                    latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker(warmup, record=False) for _ in range(concurrency)))
+    errors = 0
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(iterations, record=True) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies) or [0.0]
+    return BenchResult(
+        scale=ctx.scale,
+        op=name,
+        mode="alone" if concurrency == 1 else "contention",
+        concurrency=concurrency,
+        iterations=len(latencies),
+        errors=errors,
+        ops_per_s=round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        mean_ms=round(statistics.fmean(ordered) * 1000, 3),
+        p50_ms=round(statistics.median(ordered) * 1000, 3),
+        p95_ms=round(percentile(ordered, 0.95) * 1000, 3),
+        p99_ms=round(percentile(ordered, 0.99) * 1000, 3),
+        max_ms=round(ordered[-1] * 1000, 3),
+    )
+
+
+async def seed(scale: int) -> BenchContext:
+    slug = f"bench{uuid.uuid4().hex[:8]}"
+    # limit above the seeded winners, so assign_reward takes the claim path
+    campaign = await CampaignService.create(slug, f"Benchmark {slug}", None, scale)
+    started = time.perf_counter()
+    async with SessionMaker() as session:
+        async with session.begin():
+            params = {"campaign_id": campaign.id, "count": scale}
+            await session.execute(SEED_PARTICIPANTS, {**params, "telegram_base": TELEGRAM_ID_BASE})
+            await session.execute(SEED_PROMO_CODES, params)
+        for table in ("participants", "promo_codes"):
+            await session.execute(text(f"ANALYZE {table}_c{campaign.id}"))
+        res = await session.execute(
+            text("SELECT id FROM participants WHERE campaign_id = :campaign_id ORDER BY random() LIMIT 1000"),
+            {"campaign_id": campaign.id},
+        )
+        participant_ids = [row[0] for row in res.all()]
+    print(f"-- seeded scale={scale} campaign={slug} in {time.perf_counter() - started:.1f}s")
+    return BenchContext(
+        campaign=campaign,
+        scale=scale,
+        participant_ids=participant_ids,
+        new_telegram_ids=itertools.count(TELEGRAM_ID_BASE + 10 * scale + 1),
+    )
+
+
+async def drop(ctx: BenchContext) -> None:
+    detached = await CampaignService.archive(ctx.campaign.id)
+    async with SessionMaker() as session:
+        async with session.begin():
+            for table in detached:
+                await session.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            await session.execute(text("DELETE FROM campaigns WHERE id = :id"), {"id": ctx.campaign.id})
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[BenchResult], baseline_path: str, threshold: float) -> int:
+    baseline = {
+        (item["scale"], item["op"], item["mode"]): item
+        for item in json.loads(Path(baseline_path).read_text(encoding="utf-8"))["results"]
+    }
+    regressions = 0
+    print(f"\n== compared with {baseline_path} (threshold +{threshold:.0%})")
+    for result in results:
+        before = baseline.get((result.scale, result.op, result.mode))
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            old, new = before[metric], getattr(result, metric)
+            if old and new > old * (1 + threshold):
+                regressions += 1
+                print(f"  REGRESSION {result.scale:>8} {result.op:<40} {result.mode:<10} {metric} {old:.2f} -> {new:.2f}ms")
+    print(f"  {regressions} regression(s)")
+    return regressions
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark repository operations at several dataset scales.")
+    parser.add_argument("--scale", type=int, action="append", dest="scales", help="rows seeded per table (repeatable)")
+    parser.add_argument("--op", action="append", dest="ops", choices=sorted(OPERATIONS), help="operation (repeatable)")
+    parser.add_argument("--iterations", type=int, default=200, help="timed iterations per worker")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed iterations per worker")
+    parser.add_argument("--concurrency", type=int, default=16, help="workers in the contention mode")
+    parser.add_argument("--output", default=None, help="JSON results file (default: bench_repos_<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50/p95 growth for --compare")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark campaigns and their data")
+    args = parser.parse_args()
+
+    ops = args.ops or list(OPERATIONS)
+    bench_engine = build_engine(name="bench", pool_size=args.concurrency, max_overflow=0)
+    maker = async_sessionmaker(bench_engine, expire_on_commit=False, class_=AsyncSession)
+    results: list[BenchResult] = []
+    async with maker() as session:
+        server_version = (await session.execute(text("SHOW server_version"))).scalar_one()
+    try:
+        for scale in args.scales or DEFAULT_SCALES:
+            ctx = await seed(scale)
+            try:
+                for name in ops:
+                    for concurrency in (1, args.concurrency):
+                        result = await run_op(maker, ctx, name, concurrency, args.iterations, args.warmup)
+                        results.append(result)
+                        print(
+                            f"scale={scale:>8} {name:<40} {result.mode:<10} c={concurrency:<3} "
+                            f"{result.ops_per_s:>9,.0f} ops/s p50={result.p50_ms:7.2f}ms "
+                            f"p95={result.p95_ms:7.2f}ms p99={result.p99_ms:7.2f}ms errors={result.errors}"
+                        )
+            finally:
+                if not args.keep:
+                    await drop(ctx)
+    finally:
+        await bench_engine.dispose()
+
+    started_at = datetime.now(tz=timezone.utc)
+    output = Path(args.output or f"bench_repos_{started_at:%Y%m%d_%H%M%S}.json")
+    payload = {
+        "meta": {
+            "created_at": started_at.isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "postgres": server_version,
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+        },
+        "results": [asdict(result) for result in results],
+    }
+    output.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nResults written to {output}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
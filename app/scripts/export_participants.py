@@ -0,0 +1,200 @@
+"""
+Incremental export of participants for the CRM sync.
+
+    python app/scripts/export_participants.py --state crm_state.json --output participants.jsonl
+    python app/scripts/export_participants.py --state crm_state.json --format csv --output - > delta.csv
+    python app/scripts/export_participants.py --campaign spring --state spring_state.json --full --output spring.jsonl
+
+Exports every participant created or changed since the watermark in --state: rows are read in
+keyset pages on (updated_at, id) and written as JSON Lines or CSV, one page at a time. After each
+page is written and flushed the watermark is saved, so an interrupted run resumes after the last
+complete page (the page in flight may be exported twice: the CRM should upsert by id).
+
+Rows changed in the last --lag seconds are left for the next run: updated_at is the time the
+writing transaction started, so a transaction that commits late can land behind a watermark that
+has already passed it. Deleted participants (admin cleanup) are not part of the delta.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+from datetime import datetime, timedelta
+import json
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, TextIO
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import func, select
+
+from app.db import SessionMaker, engine
+from app.logging_cfg import TEXT_FORMAT, TextFormatter
+from app.models import Participant
+from app.repositories.campaigns import CampaignRepo
+from app.repositories.participants import ParticipantRepo
+
+
+# TextFormatter appends the extra={...} fields to each line; logs go to stderr, so --output - stays clean
+handler = logging.StreamHandler()
+handler.setFormatter(TextFormatter(TEXT_FORMAT))
+logging.basicConfig(level=logging.INFO, handlers=[handler])
+log = logging.getLogger(__name__)
+
+FIELDS = ["id", "campaign_id", "telegram_id", "email", "reward_type", "promo_code", "created_at", "updated_at"]
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_LAG = 60.0
+
+
+def row_of(participant: Participant) -> dict[str, Any]:
+    return {
+        "id": participant.id,
+        "campaign_id": participant.campaign_id,
+        "telegram_id": participant.telegram_id,
+        "email": participant.email,
+        "reward_type": participant.reward_type,
+        "promo_code": participant.promo_code,
+        "created_at": participant.created_at.isoformat(),
+        "updated_at": participant.updated_at.isoformat(),
+    }
+
+
+def load_state(path: Path) -> dict[str, Any]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_state(path: Path, state: dict[str, Any]) -> None:
+    # write-and-rename, so a crash never leaves a half-written watermark
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class ChunkWriter:
+    """
+    Appends pages to the output; CSV gets its header only when the file is new or empty.
+    """
+    def __init__(self, stream: TextIO, fmt: str, write_header: bool) -> None:
+        self.stream = stream
+        self.fmt = fmt
+        self.csv = csv.DictWriter(stream, fieldnames=FIELDS) if fmt == "csv" else None
+        if self.csv is not None and write_header:
+            self.csv.writeheader()
+
+    def write(self, rows: list[dict[str, Any]]) -> None:
+        if self.csv is not None:
+            self.csv.writerows(rows)
+        else:
+            self.stream.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        self.stream.flush()
+        if self.stream is not sys.stdout:
+            os.fsync(self.stream.fileno())
+
+
+def start_watermark(args: argparse.Namespace, state: dict[str, Any]) -> tuple[datetime, int] | None:
+    if args.since:
+        return datetime.fromisoformat(args.since), 0
+    if args.full or not state.get("updated_at"):
+        return None
+    return datetime.fromisoformat(state["updated_at"]), int(state["id"])
+
+
+async def export(args: argparse.Namespace) -> int:
+    state_path = Path(args.state)
+    state = load_state(state_path)
+    campaign_id: int | None = None
+    async with SessionMaker() as session:
+        if args.campaign:
+            campaign = await CampaignRepo.get_by_slug(session, args.campaign)
+            if campaign is None:
+                raise SystemExit(f"Unknown campaign {args.campaign!r}")
+            campaign_id = campaign.id
+        # the database clock, so the lag does not depend on this machine's time
+        until = await session.scalar(select(func.now())) - timedelta(seconds=args.lag)
+    if state and state.get("campaign") != args.campaign and not (args.full or args.since):
+        raise SystemExit(f"{state_path} belongs to campaign {state.get('campaign')!r}; use another --state")
+
+    after = start_watermark(args, state)
+    log.info(
+        "Exporting changed participants",
+        extra={
+            "after": None if after is None else after[0].isoformat(),
+            "after_id": None if after is None else after[1],
+            "until": until.isoformat(),
+        },
+    )
+    to_stdout = args.output == "-"
+    stream = sys.stdout if to_stdout else open(args.output, "a", encoding="utf-8", newline="")
+    exported = 0
+    started = time.perf_counter()
+    try:
+        writer = ChunkWriter(stream, args.format, write_header=to_stdout or stream.tell() == 0)
+        while True:
+            # a short read transaction per page: nothing is held open while the output is written
+            async with SessionMaker() as session:
+                page = await ParticipantRepo.changed_page(session, after, until, args.chunk_size, campaign_id)
+            if not page:
+                break
+            writer.write([row_of(participant) for participant in page])
+            exported += len(page)
+            after = (page[-1].updated_at, page[-1].id)
+            save_state(
+                state_path,
+                {
+                    "campaign": args.campaign,
+                    "updated_at": after[0].isoformat(),
+                    "id": after[1],
+                    "saved_at": datetime.now().astimezone().isoformat(),
+                },
+            )
+            if len(page) < args.chunk_size:
+                break
+    finally:
+        if not to_stdout:
+            stream.close()
+    log.info(
+        "Export finished",
+        extra={
+            "rows": exported,
+            "seconds": round(time.perf_counter() - started, 1),
+            "watermark": None if after is None else after[0].isoformat(),
+            "watermark_id": None if after is None else after[1],
+        },
+    )
+    return exported
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Export participants changed since the last run (CRM sync).")
+    parser.add_argument("--state", default="export_state.json", help="watermark file, updated after every page")
+    parser.add_argument("--output", default="-", help="file to append to, or '-' for stdout")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--campaign", default=None, help="campaign slug (default: all campaigns)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per keyset page")
+    parser.add_argument("--lag", type=float, default=DEFAULT_LAG,
+                        help="seconds; rows changed more recently wait for the next run")
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument("--full", action="store_true", help="ignore the saved watermark and export everything")
+    start.add_argument("--since", default=None,
+                       help="ISO timestamp with offset to start from instead of the saved watermark")
+    return parser
+
+
+async def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    try:
+        await export(args)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,95 +1,196 @@
+"""
+Import promo codes from partner files.
+
+    python app/scripts/import_promo_codes.py codes.txt
+    python app/scripts/import_promo_codes.py 'partners/*.csv' --kind cinema --note "partner batch 3"
+    python app/scripts/import_promo_codes.py codes.txt --campaign spring
+    cat codes.txt | python app/scripts/import_promo_codes.py - --dry-run
+
+Lines are parsed like in the admin panel (`80 88151262` == `8088151262`); for .csv the first column is used.
+Files are streamed and written in batches, each batch in its own transaction, so a crash
+leaves every finished batch committed and a re-run only inserts what is missing.
+"""
 from __future__ import annotations
 
+import argparse
 import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+import glob
 import logging
 import sys
+import time
 from pathlib import Path
-
-from sqlalchemy import select
+from typing import Iterable, Iterator, TextIO
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from app.config import settings
 from app.db import SessionMaker
-from app.models import PromoCode
+from app.logging_cfg import TEXT_FORMAT, TextFormatter
+from app.repositories.campaigns import CampaignRepo
+from app.repositories.promo_codes import BULK_INSERT_BATCH_SIZE, PromoCodeRepo
+from app.utils.promo_codes import batched, iter_codes, iter_csv_codes
 
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+# TextFormatter appends the extra={...} fields to each line
+handler = logging.StreamHandler()
+handler.setFormatter(TextFormatter(TEXT_FORMAT))
+logging.basicConfig(level=logging.INFO, handlers=[handler])
 log = logging.getLogger(__name__)
 
-
-RAW_CODES = """
-80  88151262
-80  88151381
-80  88151464
-80  88151546
-80  88151619
-80  88151752
-80  88151818
-80  88151999
-80  88152022
-80  88152185
-80  88152279
-80  88152316
-80  88152497
-80  88152510
-80  88152676
-80  88152762
-80  88152874
-80  88152917
-80  88153040
-80  88153110
-80  88153221
-80  88153341
-80  88153477
-80  88153522
-80  88153647
-80  88153787
-80  88153822
-80  88153930
-80  88154078
-80  88154166
-80  88154273
-80  88154350
-80  88154433
-80  88154563
-80  88154632
-80  88154727
-80  88154885
-80  88154948
-80  88155054
-80  88155123
-""".strip()
-
-
-def parse_codes(raw: str) -> list[str]:
-    codes: list[str] = []
-    for line in raw.splitlines():
-        parts = line.strip().split()
-        if not parts:
+DEFAULT_DEDUPE_WINDOW = 200_000
+PROGRESS_EVERY_BATCHES = 10
+
+
+class RecentCodes:
+    """
+    Bounded LRU of codes seen in this run. It only saves round trips for repeats that are close
+    to each other in the input; the unique (campaign_id, code) constraint is what guarantees no duplicates.
+    """
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._seen: OrderedDict[str, None] = OrderedDict()
+
+    def add(self, code: str) -> bool:
+        if code in self._seen:
+            self._seen.move_to_end(code)
+            return False
+        self._seen[code] = None
+        if len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+        return True
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    repeated_in_input: int = 0
+    inserted: int = 0
+    already_in_db: int = 0
+
+
+def expand_sources(patterns: Iterable[str]) -> list[str]:
+    sources: list[str] = []
+    for pattern in patterns:
+        if pattern == "-":
+            sources.append(pattern)
             continue
-        if len(parts) == 1:
-            code = parts[0]
-        else:
-            code = "".join(parts)
-        codes.append(code)
-    return codes
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise SystemExit(f"No files match {pattern!r}")
+        sources.extend(matches)
+    return sources
 
 
-async def insert_codes(codes: list[str]) -> None:
-    async with SessionMaker() as session:
-        async with session.begin():
-            existing = await session.execute(select(PromoCode.code))
-            existing_codes = {row[0] for row in existing.fetchall()}
+def parse_stream(stream: TextIO, as_csv: bool) -> Iterator[str]:
+    return iter_csv_codes(stream) if as_csv else iter_codes(stream)
 
-            to_insert = [code for code in codes if code not in existing_codes]
-            for code in to_insert:
-                session.add(PromoCode(kind="cinema", code=code))
 
-    log.info("Promo codes inserted", extra={"total": len(codes), "inserted": len(to_insert)})
+def iter_source_codes(sources: list[str], fmt: str) -> Iterator[str]:
+    for source in sources:
+        as_csv = fmt == "csv" or (fmt == "auto" and source.lower().endswith(".csv"))
+        log.info("Reading promo codes", extra={"source": "stdin" if source == "-" else source})
+        if source == "-":
+            yield from parse_stream(sys.stdin, as_csv)
+            continue
+        with open(source, encoding="utf-8-sig", errors="replace", newline="") as stream:
+            yield from parse_stream(stream, as_csv)
+
+
+def dedupe(codes: Iterable[str], recent: RecentCodes, stats: ImportStats) -> Iterator[str]:
+    for code in codes:
+        stats.read += 1
+        if recent.add(code):
+            yield code
+        else:
+            stats.repeated_in_input += 1
+
+
+async def import_codes(
+    campaign_id: int,
+    codes: Iterable[str],
+    kind: str,
+    note: str | None,
+    batch_size: int,
+    dry_run: bool,
+    stats: ImportStats,
+) -> None:
+    started = time.perf_counter()
+    for index, batch in enumerate(batched(codes, batch_size), start=1):
+        async with SessionMaker() as session:
+            if dry_run:
+                existing = await PromoCodeRepo.existing_codes(session, campaign_id, batch)
+                inserted = len(batch) - len(existing)
+            else:
+                async with session.begin():
+                    inserted = await PromoCodeRepo.insert_batch(session, campaign_id, batch, kind=kind, note=note)
+        stats.inserted += inserted
+        stats.already_in_db += len(batch) - inserted
+        if index % PROGRESS_EVERY_BATCHES == 0:
+            elapsed = time.perf_counter() - started
+            log.info(
+                "Import progress",
+                extra={
+                    "read": stats.read,
+                    "inserted": stats.inserted,
+                    "already_in_db": stats.already_in_db,
+                    "repeated_in_input": stats.repeated_in_input,
+                    "codes_per_second": round(stats.read / elapsed) if elapsed else 0,
+                },
+            )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Import promo codes from files, globs or stdin ('-').",
+    )
+    parser.add_argument("sources", nargs="+", help="files, glob patterns or '-' for stdin")
+    parser.add_argument("--campaign", default=settings.default_campaign,
+                        help="campaign slug (default: DEFAULT_CAMPAIGN)")
+    parser.add_argument("--kind", default="cinema", help="promo code kind (default: cinema)")
+    parser.add_argument("--note", default=None, help="note stored with every imported code")
+    parser.add_argument("--format", choices=["auto", "txt", "csv"], default="auto",
+                        help="input format; auto picks csv by file extension")
+    parser.add_argument("--batch-size", type=int, default=BULK_INSERT_BATCH_SIZE)
+    parser.add_argument("--dedupe-window", type=int, default=DEFAULT_DEDUPE_WINDOW,
+                        help="how many recent codes to remember for in-input duplicate detection")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only count what would be inserted; repeats farther apart than "
+                             "--dedupe-window are counted as new")
+    return parser
+
+
+async def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    sources = expand_sources(args.sources)
+    async with SessionMaker() as session:
+        campaign = await CampaignRepo.get_by_slug(session, args.campaign)
+    if campaign is None:
+        raise SystemExit(f"Unknown campaign {args.campaign!r}")
+    stats = ImportStats()
+    codes = dedupe(iter_source_codes(sources, args.format), RecentCodes(args.dedupe_window), stats)
+    await import_codes(
+        campaign.id,
+        codes,
+        kind=args.kind,
+        note=args.note,
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+        stats=stats,
+    )
+    log.info(
+        "Dry run finished" if args.dry_run else "Import finished",
+        extra={
+            "read": stats.read,
+            "would_insert" if args.dry_run else "inserted": stats.inserted,
+            "already_in_db": stats.already_in_db,
+            "repeated_in_input": stats.repeated_in_input,
+        },
+    )
 
 
 if __name__ == "__main__":
-    codes_list = parse_codes(RAW_CODES)
-    asyncio.run(insert_codes(codes_list))
+    asyncio.run(main())
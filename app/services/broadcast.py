@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+
+from app.config import settings
+from app.db import SessionMaker, read_session
+from app.models import Broadcast
+from app.repositories.broadcasts import BlockedUserRepo, BroadcastRepo
+from app.repositories.participants import ParticipantRepo
+from app.utils.rate_limit import RateLimiter
+
+
+log = logging.getLogger(__name__)
+
+# A page is the checkpoint unit: after a crash at most one page is re-sent.
+BROADCAST_PAGE_SIZE = 200
+SEND_ATTEMPTS = 3
+
+
+@dataclass
+class BroadcastProgress:
+    broadcast_id: int
+    total: int
+    last_participant_id: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    processed_this_run: int = 0
+    cancelled: bool = False
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def eta_seconds(self) -> float | None:
+        elapsed = time.monotonic() - self.started_at
+        if not self.processed_this_run or elapsed <= 0:
+            return None
+        rate = self.processed_this_run / elapsed
+        return max(0, self.total - self.processed) / rate
+
+    @classmethod
+    def from_model(cls, broadcast: Broadcast) -> "BroadcastProgress":
+        return cls(
+            broadcast_id=broadcast.id,
+            total=broadcast.total,
+            last_participant_id=broadcast.last_participant_id,
+            sent=broadcast.sent,
+            failed=broadcast.failed,
+            blocked=broadcast.blocked,
+        )
+
+
+ProgressCallback = Callable[[BroadcastProgress], Awaitable[None]]
+
+
+class BroadcastService:
+    @staticmethod
+    async def send_one(bot: Bot, limiter: RateLimiter, telegram_id: int, text: str) -> str:
+        """
+        Returns sent | blocked | failed.
+        """
+        for attempt in range(1, SEND_ATTEMPTS + 1):
+            await limiter.acquire()
+            try:
+                await bot.send_message(telegram_id, text)
+                return "sent"
+            except TelegramRetryAfter as e:
+                # flood control is per bot, so every sender backs off
+                log.warning("Broadcast hit flood control", extra={"retry_after": e.retry_after})
+                limiter.pause(e.retry_after)
+            except TelegramForbiddenError:
+                return "blocked"
+            except TelegramBadRequest:
+                log.warning("Broadcast message rejected", extra={"telegram_id": telegram_id}, exc_info=True)
+                return "failed"
+            except TelegramNetworkError:
+                log.warning("Broadcast network error", extra={"telegram_id": telegram_id, "attempt": attempt})
+                await asyncio.sleep(attempt)
+        return "failed"
+
+    @staticmethod
+    async def run(bot: Bot, broadcast: Broadcast, on_page: ProgressCallback | None = None) -> BroadcastProgress:
+        """
+        Sends the broadcast from its last checkpoint. Cancelling the task leaves the broadcast `running`,
+        so it resumes on the next start; use `cancel()` to stop it for good (from any process:
+        the status is re-read before every page).
+        """
+        progress = BroadcastProgress.from_model(broadcast)
+        limiter = RateLimiter(settings.broadcast_rate, burst=settings.broadcast_concurrency)
+        semaphore = asyncio.Semaphore(settings.broadcast_concurrency)
+        log.info(
+            "Broadcast running",
+            extra={
+                "broadcast_id": broadcast.id,
+                "campaign_id": broadcast.campaign_id,
+                "after_id": progress.last_participant_id,
+                "total": progress.total,
+            },
+        )
+
+        async def deliver(telegram_id: int) -> tuple[int, str]:
+            async with semaphore:
+                return telegram_id, await BroadcastService.send_one(bot, limiter, telegram_id, broadcast.text)
+
+        while True:
+            # the cancel button may be pressed in another worker process: the DB status is the signal
+            async with SessionMaker() as session:
+                status = await BroadcastRepo.get_status(session, broadcast.id)
+            if status != "running":
+                log.info("Broadcast stopped by status", extra={"broadcast_id": broadcast.id, "status": status})
+                progress.cancelled = True
+                return progress
+            async with read_session() as session:
+                page = await ParticipantRepo.recipients_page(
+                    session,
+                    broadcast.campaign_id,
+                    after_id=progress.last_participant_id,
+                    limit=BROADCAST_PAGE_SIZE,
+                    reward_type=broadcast.reward_type,
+                )
+            if not page:
+                break
+
+            results = await asyncio.gather(*(deliver(telegram_id) for _, telegram_id in page))
+            blocked_ids = [telegram_id for telegram_id, result in results if result == "blocked"]
+            for _, result in results:
+                setattr(progress, result, getattr(progress, result) + 1)
+            progress.processed_this_run += len(results)
+            progress.last_participant_id = page[-1][0]
+
+            async with SessionMaker() as session:
+                async with session.begin():
+                    for telegram_id in blocked_ids:
+                        await BlockedUserRepo.add(session, telegram_id)
+                    await BroadcastRepo.save_progress(
+                        session,
+                        broadcast.id,
+                        last_participant_id=progress.last_participant_id,
+                        sent=progress.sent,
+                        failed=progress.failed,
+                        blocked=progress.blocked,
+                    )
+            if on_page:
+                await on_page(progress)
+
+        async with SessionMaker() as session:
+            async with session.begin():
+                await BroadcastRepo.finish(session, broadcast.id, status="done")
+        return progress
+
+    @staticmethod
+    async def cancel(broadcast_id: int) -> bool:
+        """
+        Returns False when the broadcast had already finished.
+        """
+        async with SessionMaker() as session:
+            async with session.begin():
+                return await BroadcastRepo.finish(session, broadcast_id, status="cancelled")
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+import logging
+import time
+
+from app.config import settings
+from app.db import SessionMaker, engine
+from app.models import Campaign
+from app.repositories.bot_config import BotConfigRepo
+from app.repositories.campaigns import CampaignRepo
+
+
+log = logging.getLogger(__name__)
+
+ADMIN_CAMPAIGN_KEY = "admin_campaign:{admin_id}"
+# seconds on top of CAMPAIGN_CACHE_TTL before an archived campaign's partitions are detached
+ARCHIVE_DETACH_MARGIN = 30.0
+DETACH_POLL_INTERVAL = 15.0
+
+
+@dataclass(frozen=True)
+class CampaignInfo:
+    """
+    Detached snapshot of a campaign row; empty fields fall back to the global settings.
+    """
+    id: int
+    slug: str
+    title: str
+    is_active: bool
+    unisender_list_id: str | None = None
+    cinema_limit: int | None = None
+    guide_link: str | None = None
+    fallback_promo: str | None = None
+    detach_after: datetime | None = None  # archived, partitions not detached yet
+
+    @classmethod
+    def from_model(cls, campaign: Campaign) -> "CampaignInfo":
+        return cls(
+            id=campaign.id,
+            slug=campaign.slug,
+            title=campaign.title,
+            is_active=campaign.is_active,
+            unisender_list_id=campaign.unisender_list_id,
+            cinema_limit=campaign.cinema_limit,
+            guide_link=campaign.guide_link,
+            fallback_promo=campaign.fallback_promo,
+            detach_after=campaign.detach_after,
+        )
+
+    @property
+    def list_id(self) -> str:
+        return self.unisender_list_id or settings.unisender_list_id
+
+    @property
+    def limit(self) -> int:
+        return self.cinema_limit if self.cinema_limit is not None else settings.cinema_limit
+
+    @property
+    def guide(self) -> str:
+        return self.guide_link or settings.guide_link
+
+    @property
+    def fallback(self) -> str | None:
+        return self.fallback_promo or settings.fallback_promo
+
+
+class CampaignService:
+    """
+    Campaigns are looked up on every message, so rows are cached for a short TTL.
+    Changes made through this service invalidate the cache immediately.
+    """
+    _by_id: dict[int, tuple[float, CampaignInfo]] = {}
+    _by_slug: dict[str, tuple[float, CampaignInfo]] = {}
+
+    @classmethod
+    def _remember(cls, campaign: CampaignInfo) -> CampaignInfo:
+        now = time.monotonic()
+        cls._by_id[campaign.id] = (now, campaign)
+        cls._by_slug[campaign.slug] = (now, campaign)
+        return campaign
+
+    @staticmethod
+    def _fresh(entry: tuple[float, CampaignInfo] | None) -> CampaignInfo | None:
+        if entry and time.monotonic() - entry[0] < settings.campaign_cache_ttl:
+            return entry[1]
+        return None
+
+    @classmethod
+    def invalidate(cls) -> None:
+        cls._by_id.clear()
+        cls._by_slug.clear()
+
+    @classmethod
+    async def get(cls, campaign_id: int) -> CampaignInfo | None:
+        cached = cls._fresh(cls._by_id.get(campaign_id))
+        if cached:
+            return cached
+        # primary, not the replica: a just-created campaign must be visible to its first /start
+        async with SessionMaker() as session:
+            campaign = await CampaignRepo.get(session, campaign_id)
+        return cls._remember(CampaignInfo.from_model(campaign)) if campaign else None
+
+    @classmethod
+    async def get_by_slug(cls, slug: str) -> CampaignInfo | None:
+        cached = cls._fresh(cls._by_slug.get(slug))
+        if cached:
+            return cached
+        async with SessionMaker() as session:
+            campaign = await CampaignRepo.get_by_slug(session, slug)
+        return cls._remember(CampaignInfo.from_model(campaign)) if campaign else None
+
+    @classmethod
+    async def default(cls) -> CampaignInfo:
+        campaign = await cls.get_by_slug(settings.default_campaign)
+        if campaign is None:
+            raise RuntimeError(f"Default campaign {settings.default_campaign!r} does not exist")
+        return campaign
+
+    @classmethod
+    async def resolve(cls, slug: str | None = None, campaign_id: int | None = None) -> CampaignInfo:
+        """
+        The campaign a user talks to: the requested one if it exists and is active, else the default.
+        """
+        campaign = None
+        if campaign_id is not None:
+            campaign = await cls.get(campaign_id)
+        elif slug:
+            campaign = await cls.get_by_slug(slug)
+        if campaign and campaign.is_active:
+            return campaign
+        return await cls.default()
+
+    @classmethod
+    async def preload(cls) -> list[CampaignInfo]:
+        """
+        Warms the cache with every active campaign.
+        """
+        campaigns = await cls.list_all(active_only=True)
+        for campaign in campaigns:
+            cls._remember(campaign)
+        return campaigns
+
+    @staticmethod
+    async def list_all(active_only: bool = False) -> list[CampaignInfo]:
+        async with SessionMaker() as session:
+            campaigns = await CampaignRepo.list_all(session, active_only=active_only)
+        return [CampaignInfo.from_model(item) for item in campaigns]
+
+    @classmethod
+    async def create(
+        cls,
+        slug: str,
+        title: str,
+        unisender_list_id: str | None = None,
+        cinema_limit: int | None = None,
+    ) -> CampaignInfo:
+        async with SessionMaker() as session:
+            async with session.begin():
+                campaign = await CampaignRepo.create(session, slug, title, unisender_list_id, cinema_limit)
+                await CampaignRepo.create_partitions(session, campaign.id)
+        return cls._remember(CampaignInfo.from_model(campaign))
+
+    @classmethod
+    async def set_cinema_limit(cls, campaign_id: int, cinema_limit: int) -> None:
+        async with SessionMaker() as session:
+            async with session.begin():
+                await CampaignRepo.set_cinema_limit(session, campaign_id, cinema_limit)
+        cls.invalidate()
+
+    @staticmethod
+    def detach_grace() -> float:
+        return settings.campaign_cache_ttl + ARCHIVE_DETACH_MARGIN
+
+    @classmethod
+    async def deactivate(cls, campaign_id: int, grace: float | None = None) -> datetime | None:
+        """
+        Archives the campaign: new /start and FSM lookups fall back to the default campaign and its
+        partitions are detached by `run_detacher` once detach_after has passed.
+
+        The delay is stored in the row, not held in memory: `invalidate()` only clears this process's
+        cache, other workers keep the campaign as active for up to CAMPAIGN_CACHE_TTL and their writes
+        to it would fail once the partitions are gone ("no partition of relation found for row").
+        By default it is the cache TTL plus ARCHIVE_DETACH_MARGIN for flows already in flight.
+        """
+        default = await cls.default()
+        if campaign_id == default.id:
+            raise ValueError("Нельзя архивировать кампанию по умолчанию")
+        async with SessionMaker() as session:
+            async with session.begin():
+                detach_after = await CampaignRepo.schedule_detach(
+                    session, campaign_id, cls.detach_grace() if grace is None else grace
+                )
+        cls.invalidate()
+        return detach_after
+
+    @classmethod
+    async def restore(cls, campaign_id: int) -> bool:
+        """
+        Cancels an archive whose partitions are still attached; False once the detach has come due.
+        """
+        async with SessionMaker() as session:
+            async with session.begin():
+                restored = await CampaignRepo.restore(session, campaign_id)
+        cls.invalidate()
+        return restored
+
+    @staticmethod
+    async def detach(campaign_id: int) -> list[str]:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            detached = await CampaignRepo.detach_partitions(conn, campaign_id)
+        async with SessionMaker() as session:
+            async with session.begin():
+                await CampaignRepo.finish_detach(session, campaign_id)
+        return detached
+
+    @classmethod
+    async def detach_due(cls) -> int:
+        async with SessionMaker() as session:
+            due = await CampaignRepo.due_detach(session)
+        for campaign_id in due:
+            try:
+                await cls.detach(campaign_id)
+            except Exception:
+                # detach_after stays set, so the next poll (or the next primary worker) retries
+                log.exception("Campaign detach failed", extra={"campaign_id": campaign_id})
+        return len(due)
+
+    @classmethod
+    async def run_detacher(cls, interval: float = DETACH_POLL_INTERVAL) -> None:
+        """
+        Background loop of the primary worker; a restart in the middle of an archive only delays it.
+        """
+        while True:
+            try:
+                await cls.detach_due()
+            except Exception:
+                log.exception("Campaign detach poll failed")
+            await asyncio.sleep(interval)
+
+    @classmethod
+    async def archive(cls, campaign_id: int) -> list[str]:
+        """
+        Deactivates and detaches at once, for single-process callers like the load-test scripts;
+        the bot goes through `deactivate` and the detacher.
+        """
+        await cls.deactivate(campaign_id, grace=0)
+        return await cls.detach(campaign_id)
+
+    @classmethod
+    async def get_admin_campaign(cls, admin_id: int) -> CampaignInfo:
+        async with SessionMaker() as session:
+            record = await BotConfigRepo.get(session, ADMIN_CAMPAIGN_KEY.format(admin_id=admin_id))
+        return await cls.resolve(campaign_id=int(record.value) if record else None)
+
+    @staticmethod
+    async def set_admin_campaign(admin_id: int, campaign_id: int) -> None:
+        async with SessionMaker() as session:
+            async with session.begin():
+                await BotConfigRepo.set(session, ADMIN_CAMPAIGN_KEY.format(admin_id=admin_id), str(campaign_id))
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import logging
+from typing import Awaitable, Callable
+
+from app.db import SessionMaker
+from app.repositories.participants import ParticipantRepo
+from app.repositories.promo_codes import PromoCodeRepo
+
+
+log = logging.getLogger(__name__)
+
+CLEAR_BATCH_SIZE = 1000
+# pause between batches so live claims get the connection pool and row locks in between
+CLEAR_BATCH_PAUSE = 0.05
+
+
+@dataclass
+class ClearProgress:
+    campaign_id: int
+    reset_promos: bool
+    participants_deleted: int = 0
+    promo_codes_reset: int = 0
+    stage: str = "participants"  # participants | promo_codes | done
+
+
+ProgressCallback = Callable[[ClearProgress], Awaitable[None]]
+
+
+class CleanupService:
+    @staticmethod
+    async def clear_participants(
+        progress: ClearProgress,
+        on_batch: ProgressCallback | None = None,
+        batch_size: int = CLEAR_BATCH_SIZE,
+    ) -> None:
+        """
+        Deletes participants that existed when the job started, then (optionally) frees their promo codes.
+        Every batch is its own short transaction, so live users keep registering and claiming codes;
+        rows they create after the snapshot are left alone. Cancelling the task stops after the current batch.
+        """
+        async with SessionMaker() as session:
+            up_to_id = await ParticipantRepo.max_id(session, progress.campaign_id) or 0
+        log.info(
+            "Clearing participants",
+            extra={"campaign_id": progress.campaign_id, "up_to_id": up_to_id, "reset_promos": progress.reset_promos},
+        )
+
+        last_id = 0
+        while True:
+            async with SessionMaker() as session:
+                async with session.begin():
+                    ids = await ParticipantRepo.delete_batch(
+                        session, progress.campaign_id, after_id=last_id, up_to_id=up_to_id, limit=batch_size
+                    )
+            if not ids:
+                break
+            last_id = max(ids)
+            progress.participants_deleted += len(ids)
+            if on_batch:
+                await on_batch(progress)
+            await asyncio.sleep(CLEAR_BATCH_PAUSE)
+
+        if progress.reset_promos:
+            # participants go first: once they are deleted nobody from the snapshot can claim a new code
+            progress.stage = "promo_codes"
+            last_id = 0
+            while True:
+                async with SessionMaker() as session:
+                    async with session.begin():
+                        ids = await PromoCodeRepo.reset_used_batch(
+                            session, progress.campaign_id, after_id=last_id, participant_up_to_id=up_to_id, limit=batch_size
+                        )
+                if not ids:
+                    break
+                last_id = max(ids)
+                progress.promo_codes_reset += len(ids)
+                if on_batch:
+                    await on_batch(progress)
+                await asyncio.sleep(CLEAR_BATCH_PAUSE)
+
+        progress.stage = "done"
+        log.info(
+            "Participants cleared",
+            extra={
+                "campaign_id": progress.campaign_id,
+                "participants_deleted": progress.participants_deleted,
+                "promo_codes_reset": progress.promo_codes_reset,
+            },
+        )
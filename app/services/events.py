@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+import logging
+import time
+from typing import Any
+
+from app.config import settings
+from app.db import SessionMaker
+from app.metrics import FLOW_EVENTS_BUFFERED, FLOW_EVENTS_DROPPED, FLOW_EVENTS_FLUSH_SECONDS, FLOW_EVENTS_WRITTEN
+from app.repositories.events import FlowEventRepo
+
+
+log = logging.getLogger(__name__)
+
+
+def elapsed_ms(started: float | None) -> int | None:
+    return None if started is None else int((time.perf_counter() - started) * 1000)
+
+
+class EventLog:
+    """
+    In-memory buffer in front of flow_events. `record()` never awaits, so handlers do not pay
+    for the INSERT; `run_flusher()` writes batches when EVENT_FLUSH_SIZE events are waiting
+    or every EVENT_FLUSH_INTERVAL seconds. The buffer is bounded: when the DB cannot keep up,
+    new events are dropped and counted instead of growing memory.
+    """
+    _buffer: list[dict[str, Any]] = []
+    _wakeup = asyncio.Event()
+
+    @classmethod
+    def record(
+        cls,
+        outcome: str,
+        campaign_id: int,
+        telegram_id: int,
+        duration_ms: int,
+        email: str | None = None,
+        email_status: str | None = None,
+        reward_type: str | None = None,
+        unisender_ms: int | None = None,
+        db_ms: int | None = None,
+    ) -> None:
+        if len(cls._buffer) >= settings.event_buffer_size:
+            FLOW_EVENTS_DROPPED.labels("overflow").inc()
+            return
+        cls._buffer.append(
+            {
+                "created_at": datetime.now(tz=timezone.utc),
+                "campaign_id": campaign_id,
+                "telegram_id": telegram_id,
+                "email": email,
+                "outcome": outcome,
+                "email_status": email_status,
+                "reward_type": reward_type,
+                "duration_ms": duration_ms,
+                "unisender_ms": unisender_ms,
+                "db_ms": db_ms,
+            }
+        )
+        FLOW_EVENTS_BUFFERED.set(len(cls._buffer))
+        if len(cls._buffer) >= settings.event_flush_size:
+            cls._wakeup.set()
+
+    @classmethod
+    async def flush(cls) -> int:
+        if not cls._buffer:
+            return 0
+        batch, cls._buffer = cls._buffer, []
+        FLOW_EVENTS_BUFFERED.set(0)
+        started = time.perf_counter()
+        try:
+            async with SessionMaker() as session:
+                async with session.begin():
+                    await FlowEventRepo.insert_many(session, batch)
+        except Exception:
+            log.exception("Failed to write flow events", extra={"count": len(batch)})
+            # keep the batch for the next attempt as long as it fits next to the newer events
+            room = max(0, settings.event_buffer_size - len(cls._buffer))
+            cls._buffer[:0] = batch[:room]
+            FLOW_EVENTS_BUFFERED.set(len(cls._buffer))
+            if len(batch) > room:
+                FLOW_EVENTS_DROPPED.labels("write_error").inc(len(batch) - room)
+            return 0
+        FLOW_EVENTS_FLUSH_SECONDS.observe(time.perf_counter() - started)
+        FLOW_EVENTS_WRITTEN.inc(len(batch))
+        return len(batch)
+
+    @classmethod
+    async def run_flusher(cls) -> None:
+        """
+        Background loop; on cancellation it drains what is left before exiting.
+        """
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(cls._wakeup.wait(), timeout=settings.event_flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                cls._wakeup.clear()
+                await cls.flush()
+        except asyncio.CancelledError:
+            await cls.flush()
+            raise
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Coroutine, Any
+
+from app.db import SessionMaker
+from app.repositories.bot_config import BotConfigRepo
+
+
+log = logging.getLogger(__name__)
+
+# BotConfig key of a cancel request for a job that runs in another worker process
+CANCEL_REQUEST_KEY = "job_cancel:{name}"
+CANCEL_WATCH_INTERVAL = 2.0
+
+
+class JobRegistry:
+    """
+    Named background tasks started from admin handlers. At most one task per name runs at a time;
+    references are kept here so the tasks are not garbage-collected mid-flight.
+    """
+    _tasks: dict[str, asyncio.Task] = {}
+    _started_at: dict[str, float] = {}
+
+    @classmethod
+    def is_running(cls, name: str) -> bool:
+        task = cls._tasks.get(name)
+        return task is not None and not task.done()
+
+    @classmethod
+    def start(cls, name: str, coro: Coroutine[Any, Any, None]) -> asyncio.Task:
+        if cls.is_running(name):
+            coro.close()
+            raise RuntimeError(f"Job {name} is already running")
+        task = asyncio.create_task(coro, name=f"job:{name}")
+        cls._tasks[name] = task
+        cls._started_at[name] = time.time()
+        task.add_done_callback(lambda t: cls._on_done(name, t))
+        log.info("Background job started", extra={"job": name})
+        return task
+
+    @classmethod
+    def cancel(cls, name: str) -> bool:
+        if not cls.is_running(name):
+            return False
+        log.info("Background job cancel requested", extra={"job": name})
+        cls._tasks[name].cancel()
+        return True
+
+    @classmethod
+    def _on_done(cls, name: str, task: asyncio.Task) -> None:
+        if cls._tasks.get(name) is task:
+            del cls._tasks[name]
+            cls._started_at.pop(name, None)
+        if task.cancelled():
+            log.info("Background job cancelled", extra={"job": name})
+        elif task.exception():
+            log.error("Background job failed", extra={"job": name}, exc_info=task.exception())
+        else:
+            log.info("Background job finished", extra={"job": name})
+
+    @staticmethod
+    async def request_cancel(name: str) -> None:
+        """
+        For jobs running in another worker process: the request goes through the DB
+        and that process's `watch_cancellations()` cancels the task.
+        """
+        async with SessionMaker() as session:
+            async with session.begin():
+                await BotConfigRepo.set(session, CANCEL_REQUEST_KEY.format(name=name), str(time.time()))
+        log.info("Background job cancel requested via DB", extra={"job": name})
+
+    @classmethod
+    async def watch_cancellations(cls, interval: float = CANCEL_WATCH_INTERVAL) -> None:
+        """
+        Cancels local jobs that got a cancel request newer than their start; stale requests
+        (for a job that had already finished) are ignored.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            names = [name for name in list(cls._tasks) if cls.is_running(name)]
+            if not names:
+                continue
+            try:
+                async with SessionMaker() as session:
+                    async with session.begin():
+                        for name in names:
+                            key = CANCEL_REQUEST_KEY.format(name=name)
+                            record = await BotConfigRepo.get(session, key)
+                            if record is None:
+                                continue
+                            await BotConfigRepo.delete(session, key)
+                            if float(record.value) >= cls._started_at.get(name, 0.0):
+                                cls.cancel(name)
+            except Exception:
+                log.exception("Failed to check job cancel requests")
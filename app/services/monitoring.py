@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+from app.metrics import EVENT_LOOP_LAG_SECONDS, PROMO_CODES_FREE
+from app.services.campaigns import CampaignService
+from app.services.stats import StatsService
+
+
+log = logging.getLogger(__name__)
+
+EVENT_LOOP_LAG_INTERVAL = 0.5
+PROMO_GAUGES_INTERVAL = 15.0
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=generate_latest(REGISTRY), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("Metrics endpoint started", extra={"host": host, "port": port})
+    return runner
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_LAG_INTERVAL) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.observe(max(0.0, loop.time() - started - interval))
+
+
+async def refresh_promo_gauges(interval: float = PROMO_GAUGES_INTERVAL) -> None:
+    """
+    Reads through the dashboard cache, so scrapes never trigger promo_codes scans of their own.
+    """
+    while True:
+        try:
+            for campaign in await CampaignService.list_all(active_only=True):
+                dashboard = await StatsService.get_dashboard(campaign.id)
+                for kind, item in dashboard.kinds.items():
+                    PROMO_CODES_FREE.labels(campaign.slug, kind).set(item.free)
+        except Exception:
+            log.exception("Failed to refresh promo code gauges")
+        await asyncio.sleep(interval)
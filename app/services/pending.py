@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import logging
+import random
+import time
+
+from aiogram import Bot
+
+from app.config import settings
+from app.db import SessionMaker
+from app.metrics import PENDING_QUEUE_SIZE, PENDING_VERIFICATIONS, REWARDS_ASSIGNED
+from app.models import PendingVerification
+from app.repositories.broadcasts import BlockedUserRepo
+from app.repositories.pending import PendingVerificationRepo
+from app.services.broadcast import BroadcastService
+from app.services.campaigns import CampaignService
+from app.services.events import EventLog, elapsed_ms
+from app.services.rewards import RewardService
+from app.services.texts import TextService
+from app.services.unisender import unisender
+from app.utils.rate_limit import RateLimiter
+
+
+log = logging.getLogger(__name__)
+
+PENDING_REASONS = frozenset({"not_confirmed_invited", "unisender_unavailable"})
+# a claimed batch is invisible to other pollers for this long beyond its expected check time
+LEASE_MARGIN = 60.0
+
+
+class PendingVerificationService:
+    """
+    Users who were told to confirm their subscription (or hit a Unisender outage) are re-checked
+    in the background instead of having to come back: batches are taken from pending_verifications,
+    checked at PENDING_CHECK_RATE with exponential backoff per user, and a user who turned active
+    gets the reward pushed to the chat. The queue lives in the DB, so it survives restarts.
+    """
+    @staticmethod
+    def backoff(attempts: int) -> timedelta:
+        delay = min(settings.pending_max_delay, settings.pending_initial_delay * 2 ** attempts)
+        # jitter spreads out users who were enqueued together, e.g. during an outage
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    @staticmethod
+    async def enqueue(campaign_id: int, telegram_id: int, email: str, reason: str) -> None:
+        """
+        Never raises: the user already got a reply, a failed enqueue only means no automatic re-check.
+        """
+        if not settings.pending_enabled or reason not in PENDING_REASONS:
+            return
+        now = datetime.now(tz=timezone.utc)
+        try:
+            async with SessionMaker() as session:
+                async with session.begin():
+                    await PendingVerificationRepo.upsert(
+                        session,
+                        campaign_id,
+                        telegram_id,
+                        email,
+                        reason,
+                        next_check_at=now + PendingVerificationService.backoff(0),
+                        expires_at=now + timedelta(hours=settings.pending_ttl_hours),
+                    )
+        except Exception:
+            log.exception("Failed to enqueue pending verification", extra={"telegram_id": telegram_id})
+            return
+        PENDING_VERIFICATIONS.labels("enqueued").inc()
+        log.info(
+            "Pending verification enqueued",
+            extra={"campaign_id": campaign_id, "telegram_id": telegram_id, "reason": reason},
+        )
+
+    @staticmethod
+    async def reschedule(entry: PendingVerification, last_status: str | None) -> None:
+        attempts = entry.attempts + 1
+        next_check_at = datetime.now(tz=timezone.utc) + PendingVerificationService.backoff(attempts)
+        async with SessionMaker() as session:
+            async with session.begin():
+                await PendingVerificationRepo.reschedule(session, entry.id, attempts, next_check_at, last_status)
+
+    @staticmethod
+    async def check_one(bot: Bot, send_limiter: RateLimiter, entry: PendingVerification) -> str:
+        """
+        Returns the result label used by pending_verifications_total.
+        """
+        campaign = await CampaignService.get(entry.campaign_id)
+        if campaign is None or not campaign.is_active:
+            async with SessionMaker() as session:
+                async with session.begin():
+                    await PendingVerificationRepo.delete(session, entry.id)
+            return "campaign_closed"
+
+        started = time.perf_counter()
+        try:
+            status = await unisender.check_confirmed_in_list(email=entry.email, list_id=campaign.list_id)
+        except Exception:
+            log.warning("Pending re-check failed", extra={"pending_id": entry.id}, exc_info=True)
+            await PendingVerificationService.reschedule(entry, entry.last_status)
+            return "error"
+        unisender_ms = elapsed_ms(started)
+        confirmed = (status.email_status == "active") and status.in_list and (status.list_status == "active")
+        if not confirmed:
+            await PendingVerificationService.reschedule(entry, status.email_status)
+            return "still_pending"
+
+        # removes the pending entry in the same transaction
+        claim = await RewardService.claim(campaign, entry.telegram_id, entry.email)
+        if not claim.is_new:
+            # the user retried by hand in the meantime and already has the message
+            return "already_rewarded"
+        REWARDS_ASSIGNED.labels(campaign.slug, claim.reward_type).inc()
+        EventLog.record(
+            "pending_reward_assigned",
+            campaign.id,
+            entry.telegram_id,
+            elapsed_ms(started),
+            email=entry.email,
+            email_status=status.email_status,
+            reward_type=claim.reward_type,
+            unisender_ms=unisender_ms,
+        )
+        template = await TextService.get_text_global("pending_confirmed", campaign.id)
+        delivery = await BroadcastService.send_one(
+            bot, send_limiter, entry.telegram_id, template.format(reward_message=claim.message)
+        )
+        if delivery == "blocked":
+            async with SessionMaker() as session:
+                async with session.begin():
+                    await BlockedUserRepo.add(session, entry.telegram_id)
+        log.info(
+            "Pending user confirmed and rewarded",
+            extra={
+                "participant_id": claim.participant_id,
+                "reward_type": claim.reward_type,
+                "attempts": entry.attempts + 1,
+                "delivery": delivery,
+            },
+        )
+        return "rewarded"
+
+    @staticmethod
+    async def run_batch(bot: Bot, check_limiter: RateLimiter, send_limiter: RateLimiter) -> int:
+        """
+        Expires old entries, claims one batch of due ones and checks them. Returns the batch size.
+        """
+        now = datetime.now(tz=timezone.utc)
+        lease = timedelta(seconds=settings.pending_batch_size / settings.pending_check_rate + LEASE_MARGIN)
+        async with SessionMaker() as session:
+            async with session.begin():
+                expired = await PendingVerificationRepo.delete_expired(session, now)
+                entries = await PendingVerificationRepo.claim_due(
+                    session, now, lease_until=now + lease, limit=settings.pending_batch_size
+                )
+            PENDING_QUEUE_SIZE.set(await PendingVerificationRepo.count(session))
+        if expired:
+            PENDING_VERIFICATIONS.labels("expired").inc(expired)
+            log.info("Pending verifications expired", extra={"count": expired})
+
+        async def process(entry: PendingVerification) -> None:
+            await check_limiter.acquire()
+            try:
+                result = await PendingVerificationService.check_one(bot, send_limiter, entry)
+            except Exception:
+                # the lease runs out and the entry is picked up again
+                log.exception("Pending verification failed", extra={"pending_id": entry.id})
+                result = "error"
+            PENDING_VERIFICATIONS.labels(result).inc()
+
+        await asyncio.gather(*(process(entry) for entry in entries))
+        return len(entries)
+
+    @staticmethod
+    async def run(bot: Bot) -> None:
+        """
+        Background loop: a full batch is followed by the next one right away, an idle queue is
+        polled every PENDING_POLL_INTERVAL seconds.
+        """
+        check_limiter = RateLimiter(settings.pending_check_rate)
+        send_limiter = RateLimiter(settings.broadcast_rate)
+        log.info("Pending verification scheduler started")
+        while True:
+            try:
+                processed = await PendingVerificationService.run_batch(bot, check_limiter, send_limiter)
+            except Exception:
+                log.exception("Pending verification batch failed")
+                processed = 0
+            if processed < settings.pending_batch_size:
+                await asyncio.sleep(settings.pending_poll_interval)
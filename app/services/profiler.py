@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+from types import FrameType
+
+
+log = logging.getLogger(__name__)
+
+TASK_SAMPLE_INTERVAL = 0.1
+LAG_SAMPLE_INTERVAL = 0.05
+MAX_STACK_DEPTH = 128
+TOP_ENTRIES = 25
+# a sample whose innermost frame is here is the loop waiting for I/O, not work
+IDLE_FRAMES = {("selectors.py", "select")}
+
+
+def frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+@dataclass
+class ProfileReport:
+    seconds: float
+    interval: float
+    stacks: Counter[str] = field(default_factory=Counter)  # collapsed stack -> samples
+    running: Counter[str] = field(default_factory=Counter)  # coroutine on the loop thread -> samples
+    tasks: Counter[str] = field(default_factory=Counter)  # coroutine -> task samples (alive, any state)
+    awaiting: Counter[str] = field(default_factory=Counter)  # where suspended tasks wait -> samples
+    lags: list[float] = field(default_factory=list)
+    samples: int = 0
+    idle: int = 0
+    max_tasks: int = 0
+    cancelled: bool = False
+
+    def collapsed(self) -> str:
+        """
+        Brendan Gregg's folded format: flamegraph.pl, speedscope and inferno read it as is.
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> str:
+        busy = self.samples - self.idle
+        lines = [
+            f"Profile: {self.seconds:.1f}s, sampling every {self.interval * 1000:g}ms, pid {os.getpid()}"
+            + (" (stopped early)" if self.cancelled else ""),
+            f"Loop thread samples: {self.samples}, busy: {busy} ({busy / self.samples:.0%})" if self.samples else
+            "Loop thread samples: 0",
+            f"Tasks alive: max {self.max_tasks}",
+        ]
+        if self.lags:
+            ordered = sorted(self.lags)
+            lines.append(
+                "Event loop lag: "
+                f"p50={statistics.median(ordered) * 1000:.1f}ms "
+                f"p95={ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000:.1f}ms "
+                f"max={ordered[-1] * 1000:.1f}ms"
+            )
+        for title, counter, total in (
+            ("Top coroutines on the loop thread (CPU samples)", self.running, busy),
+            ("Top coroutines by task count (task samples)", self.tasks, sum(self.tasks.values())),
+            ("Top await points of suspended tasks", self.awaiting, sum(self.awaiting.values())),
+        ):
+            lines.append(f"\n{title}:")
+            for name, count in counter.most_common(TOP_ENTRIES):
+                lines.append(f"  {count:>7} {count / total if total else 0:>6.1%}  {name}")
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """
+    Sampling profiler for the running bot: a daemon thread reads the event loop thread's stack from
+    sys._current_frames() every `interval`, while two coroutines on the loop sample asyncio tasks and
+    loop lag. Nothing is instrumented, so the cost is one stack walk per sample and the bot runs
+    at full speed between samples. Only one profile may run per process (the switch interval is global).
+    """
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._stop = threading.Event()
+
+    def _sample_thread(self, loop_thread_id: int, report: ProfileReport) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(loop_thread_id)
+            if frame is None or loop_thread_id == me:
+                continue
+            stack: list[FrameType] = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                stack.append(frame)
+                frame = frame.f_back
+            stack.reverse()
+            report.samples += 1
+            innermost = stack[-1].f_code
+            if (os.path.basename(innermost.co_filename), innermost.co_name) in IDLE_FRAMES:
+                report.idle += 1
+                report.stacks["<idle>"] += 1
+                continue
+            report.stacks[";".join(frame_label(item) for item in stack)] += 1
+            # the frame right after Handle._run is the coroutine the current task is running
+            for position, item in enumerate(stack[:-1]):
+                if item.f_code.co_name == "_run" and item.f_code.co_filename.endswith("events.py"):
+                    report.running[frame_label(stack[position + 1])] += 1
+                    break
+            else:
+                report.running["<event loop / callbacks>"] += 1
+
+    async def _sample_tasks(self, report: ProfileReport) -> None:
+        current = asyncio.current_task()
+        while True:
+            tasks = [task for task in asyncio.all_tasks() if task is not current and not task.done()]
+            report.max_tasks = max(report.max_tasks, len(tasks))
+            for task in tasks:
+                coro = task.get_coro()
+                report.tasks[getattr(coro, "__qualname__", repr(coro))] += 1
+                # follow the await chain down to the innermost coroutine outside asyncio itself:
+                # "handlers.py:email_flow:99" says more than "tasks.py:sleep"
+                frame = None
+                awaitable = coro
+                while awaitable is not None and getattr(awaitable, "cr_frame", None) is not None:
+                    if os.path.basename(os.path.dirname(awaitable.cr_frame.f_code.co_filename)) != "asyncio":
+                        frame = awaitable.cr_frame
+                    awaitable = awaitable.cr_await
+                if frame is not None:
+                    report.awaiting[f"{frame_label(frame)}:{frame.f_lineno}"] += 1
+            await asyncio.sleep(TASK_SAMPLE_INTERVAL)
+
+    @staticmethod
+    async def _sample_lag(report: ProfileReport) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+            report.lags.append(max(0.0, loop.time() - started - LAG_SAMPLE_INTERVAL))
+
+    async def run(self, seconds: float) -> ProfileReport:
+        """
+        Samples for `seconds`. On cancellation the samples taken so far are kept: the report
+        is returned with `cancelled` set instead of raising.
+        """
+        report = ProfileReport(seconds=0.0, interval=self.interval)
+        sampler = threading.Thread(
+            target=self._sample_thread,
+            args=(threading.get_ident(), report),
+            name="profiler",
+            daemon=True,
+        )
+        helpers = [
+            asyncio.create_task(self._sample_tasks(report), name="profiler:tasks"),
+            asyncio.create_task(self._sample_lag(report), name="profiler:lag"),
+        ]
+        # the sampler can only look while it holds the GIL; with the default 5ms switch interval it
+        # would mostly get it when the loop blocks in select() and the profile would look idle
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(switch_interval, self.interval / 10))
+        started = time.perf_counter()
+        sampler.start()
+        log.info("Profiling started", extra={"seconds": seconds, "interval": self.interval})
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            report.cancelled = True
+        finally:
+            self._stop.set()
+            for task in helpers:
+                task.cancel()
+            await asyncio.gather(*helpers, return_exceptions=True)
+            await asyncio.to_thread(sampler.join)
+            sys.setswitchinterval(switch_interval)
+            report.seconds = time.perf_counter() - started
+        log.info(
+            "Profiling finished",
+            extra={"seconds": round(report.seconds, 1), "samples": report.samples, "cancelled": report.cancelled},
+        )
+        return report
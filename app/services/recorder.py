@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import re
+import time
+from typing import Any
+
+from aiogram.types import Update
+
+from app.config import settings
+from app.metrics import RECORDED_EVENTS
+
+
+log = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 1.0
+EMAIL_RE = re.compile(r"[^\s@<>\"']+@[^\s@<>\"']+")
+# the only user fields kept; names and usernames are dropped
+USER_FIELDS = ("id", "is_bot", "language_code")
+USER_ID_BASE = 10**12  # hashed ids land above real Telegram ids
+
+
+class TrafficRecorder:
+    """
+    Opt-in recording of incoming updates and Unisender responses for `app/scripts/replay.py`.
+    Enabled by RECORD_FILE together with a non-empty RECORD_SALT; lines are buffered and appended
+    to the gzip file every second (one gzip member per flush, which gzip readers concatenate).
+
+    Updates are rebuilt from an allowlist (see `anonymize`), so nothing the flow does not read is
+    written. User/chat ids and the local part of emails are HMAC-hashed with RECORD_SALT: one person
+    keeps one id and one address across the file and Unisender answers still match the emails in
+    the updates. Free text is masked with its length kept, names are replaced. Commands and button
+    texts are kept, they drive the flow.
+    """
+    _buffer: list[str] = []
+    _keep_texts: frozenset[str] | None = None
+
+    @staticmethod
+    def enabled() -> bool:
+        # without a key the hashes are a public function: ids and email local parts could be brute-forced
+        return bool(settings.record_file and settings.record_salt)
+
+    @staticmethod
+    def path() -> str:
+        # one file per worker process, so concurrent appends never interleave
+        if settings.worker_index is None:
+            return settings.record_file
+        return f"{settings.record_file}.w{settings.worker_index}"
+
+    @staticmethod
+    def digest(value: str) -> str:
+        return hmac.new(settings.record_salt.encode(), value.encode(), hashlib.sha256).hexdigest()[:16]
+
+    @classmethod
+    def hash_id(cls, value: int) -> int:
+        return USER_ID_BASE + int(cls.digest(f"id:{value}"), 16) % USER_ID_BASE
+
+    @classmethod
+    def hash_email(cls, email: str) -> str:
+        # the domain stays: typos like gmial.com are part of the traffic mix and carry no identity
+        # case is folded on both parts, so the raw text and the normalized address hash alike
+        local, _, domain = email.rpartition("@")
+        return f"u{cls.digest('email:' + local.lower())}@{domain.lower()}"
+
+    @classmethod
+    def keep_texts(cls) -> frozenset[str]:
+        if cls._keep_texts is None:
+            from app.bot import keyboards
+
+            markups = [
+                keyboards.kb_main(True),
+                keyboards.kb_admin_main(),
+                keyboards.kb_admin_texts(),
+                keyboards.kb_admin_promos(),
+                keyboards.kb_admin_confirm_clear(),
+                keyboards.kb_admin_back(),
+                keyboards.kb_admin_broadcast_confirm(),
+            ]
+            cls._keep_texts = frozenset(
+                button.text for markup in markups for row in markup.keyboard for button in row
+            )
+        return cls._keep_texts
+
+    @staticmethod
+    def mask(text: str) -> str:
+        # same length and whitespace, no content: the text still fails or passes validation the same way
+        return re.sub(r"\S", "x", text)
+
+    @classmethod
+    def anonymize_text(cls, text: str) -> str:
+        if text.startswith("/") or text.strip() in cls.keep_texts():
+            return text
+        parts: list[str] = []
+        pos = 0
+        for match in EMAIL_RE.finditer(text):
+            parts.append(cls.mask(text[pos:match.start()]))
+            parts.append(cls.hash_email(match.group(0)))
+            pos = match.end()
+        parts.append(cls.mask(text[pos:]))
+        return "".join(parts)
+
+    @classmethod
+    def anonymize_user(cls, user: dict[str, Any]) -> dict[str, Any]:
+        kept = {name: user[name] for name in USER_FIELDS if name in user}
+        kept["id"] = cls.hash_id(user["id"])
+        kept["first_name"] = "x"  # required by the User type, so it is replaced, not dropped
+        return kept
+
+    @classmethod
+    def anonymize_chat(cls, chat: dict[str, Any]) -> dict[str, Any]:
+        return {"id": cls.hash_id(chat["id"]), "type": chat.get("type", "private")}
+
+    @classmethod
+    def anonymize_message(cls, message: dict[str, Any]) -> dict[str, Any]:
+        kept: dict[str, Any] = {"message_id": message["message_id"], "date": message["date"]}
+        kept["chat"] = cls.anonymize_chat(message["chat"])
+        if "from" in message:
+            kept["from"] = cls.anonymize_user(message["from"])
+        if isinstance(message.get("text"), str):
+            kept["text"] = cls.anonymize_text(message["text"])
+        return kept
+
+    @classmethod
+    def anonymize(cls, payload: dict[str, Any]) -> dict[str, Any] | None:
+        """
+        Builds the recorded update from an allowlist: text messages and callback queries with only
+        the fields the flow reads. Anything else a user can send (contacts, forwards, documents,
+        captions, entities) is never copied; other update types are not recorded at all.
+        """
+        if "message" in payload:
+            return {"update_id": payload["update_id"], "message": cls.anonymize_message(payload["message"])}
+        if "callback_query" in payload:
+            query = payload["callback_query"]
+            kept: dict[str, Any] = {
+                "id": query["id"],
+                "from": cls.anonymize_user(query["from"]),
+                # opaque, but stable per chat: hashed like the ids
+                "chat_instance": cls.digest(f"chat_instance:{query.get('chat_instance', '')}"),
+            }
+            if "data" in query:
+                kept["data"] = query["data"]
+            message = query.get("message")
+            if message:
+                # message_id, and the chat and date the CallbackQuery type needs to parse it
+                kept["message"] = {
+                    "message_id": message["message_id"],
+                    "date": message.get("date", 0),
+                    "chat": cls.anonymize_chat(message["chat"]),
+                }
+            return {"update_id": payload["update_id"], "callback_query": kept}
+        return None
+
+    @classmethod
+    def _append(cls, record: dict[str, Any]) -> None:
+        if len(cls._buffer) >= settings.record_buffer_size:
+            RECORDED_EVENTS.labels(record["t"], "dropped").inc()
+            return
+        # wall clock, so the files of several workers merge into one timeline
+        record["ts"] = round(time.time(), 4)
+        cls._buffer.append(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        RECORDED_EVENTS.labels(record["t"], "recorded").inc()
+
+    @classmethod
+    def record_update(cls, update: Update) -> None:
+        if not cls.enabled():
+            return
+        try:
+            payload = cls.anonymize(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+        except Exception:
+            log.warning("Failed to record update", exc_info=True)
+            return
+        if payload is None:
+            RECORDED_EVENTS.labels("update", "skipped").inc()
+            return
+        cls._append({"t": "update", "u": payload})
+
+    @classmethod
+    def record_unisender(
+        cls,
+        email: str,
+        response: dict[str, Any] | None,
+        elapsed: float,
+        error: str | None = None,
+    ) -> None:
+        if not cls.enabled():
+            return
+        compact: dict[str, Any] | None = None
+        if isinstance(response, dict):
+            if "error" in response:
+                compact = {"error": "recorded", "code": response.get("code")}
+            else:
+                result = response.get("result") or {}
+                compact = {
+                    "result": {
+                        "email": {"status": (result.get("email") or {}).get("status")},
+                        "lists": [
+                            {"id": item.get("id"), "status": item.get("status")}
+                            for item in result.get("lists") or []
+                        ],
+                    }
+                }
+        cls._append(
+            {
+                "t": "unisender",
+                "email": cls.hash_email(email),
+                "ms": round(elapsed * 1000, 1),
+                "response": compact,
+                "exception": error,
+            }
+        )
+
+    @staticmethod
+    def write_file(path: str, lines: list[str]) -> None:
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    @classmethod
+    async def flush(cls) -> int:
+        if not cls._buffer:
+            return 0
+        lines, cls._buffer = cls._buffer, []
+        try:
+            await asyncio.to_thread(cls.write_file, cls.path(), lines)
+        except Exception:
+            log.warning("Failed to write recording", extra={"records": len(lines)}, exc_info=True)
+            return 0
+        return len(lines)
+
+    @classmethod
+    async def run(cls, interval: float = FLUSH_INTERVAL) -> None:
+        if settings.record_file and not settings.record_salt:
+            log.error("RECORD_FILE is set without RECORD_SALT, traffic recording is disabled")
+            return
+        if not cls.enabled():
+            return
+        log.info("Traffic recording enabled", extra={"path": cls.path()})
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await cls.flush()
+        except asyncio.CancelledError:
+            await cls.flush()
+            raise
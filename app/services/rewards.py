@@ -5,10 +5,15 @@ import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.db import SessionMaker
+from app.models import Participant
 from app.repositories.participants import ParticipantRepo
+from app.repositories.pending import PendingVerificationRepo
 from app.repositories.promo_codes import PromoCodeRepo
-from app.repositories.bot_config import BotConfigRepo
+from app.repositories.campaigns import CampaignRepo
+from app.services.campaigns import CampaignInfo
 from app.services.texts import TextService
+from app.tracing import span
 
 
 log = logging.getLogger(__name__)
@@ -23,6 +28,14 @@ class RewardResult:
     message: str
 
 
+@dataclass(frozen=True)
+class ClaimResult:
+    participant_id: int
+    reward_type: str
+    message: str
+    is_new: bool  # False: the participant had been rewarded before and `message` is the "already rewarded" text
+
+
 class RewardService:
     @staticmethod
     def format_promo_code(promo_code: str) -> str:
@@ -33,54 +46,125 @@ class RewardService:
         return promo_code
 
     @staticmethod
-    async def render_message(session: AsyncSession, reward_type: str, promo_code: str | None) -> str:
+    async def render_message(
+        session: AsyncSession,
+        campaign: CampaignInfo,
+        reward_type: str,
+        promo_code: str | None,
+    ) -> str:
         log.debug("Rendering reward message", extra={"reward_type": reward_type})
         if reward_type in {"cinema", "promo"}:
             if promo_code:
                 code = RewardService.format_promo_code(promo_code)
             else:
                 code = WINNER_PROMO_PLACEHOLDER
-            template = await TextService.get_text(session, "winner_message")
+            template = await TextService.get_text(session, "winner_message", campaign.id)
             return template.format(promo_code=code)
-        template = await TextService.get_text(session, "non_winner_message")
-        return template.format(guide_link=settings.guide_link)
+        template = await TextService.get_text(session, "non_winner_message", campaign.id)
+        return template.format(guide_link=campaign.guide)
+
+    @staticmethod
+    async def render_already_rewarded(session: AsyncSession, campaign: CampaignInfo, participant: Participant) -> str:
+        reward_message = await RewardService.render_message(
+            session=session,
+            campaign=campaign,
+            reward_type=participant.reward_type,
+            promo_code=participant.promo_code,
+        )
+        prefix = await TextService.get_text(session, "already_rewarded", campaign.id)
+        return prefix.format(reward_message=reward_message)
+
+    @staticmethod
+    async def get_cinema_limit(session: AsyncSession, campaign_id: int) -> int:
+        # read in the caller's transaction, not from the campaign cache: the limit must be exact
+        campaign = await CampaignRepo.get(session, campaign_id)
+        if campaign and campaign.cinema_limit is not None:
+            return campaign.cinema_limit
+        return settings.cinema_limit
 
     @staticmethod
-    async def assign_reward(session: AsyncSession, participant_id: int) -> RewardResult:
+    async def assign_reward(session: AsyncSession, campaign: CampaignInfo, participant_id: int) -> RewardResult:
         """
         Must be called inside a DB transaction.
         Priority:
         1) cinema if winners < limit AND there is free cinema code
-        2) promo if FALLBACK_PROMO set
+        2) promo if the campaign (or FALLBACK_PROMO) has one
         3) guide
         """
-        log.info("Assigning reward", extra={"participant_id": participant_id})
-        winners = await ParticipantRepo.count_cinema_winners(session)
-        cinema_limit_record = await BotConfigRepo.get(session, "cinema_limit")
-        cinema_limit = int(cinema_limit_record.value) if cinema_limit_record else settings.cinema_limit
+        log.info("Assigning reward", extra={"campaign_id": campaign.id, "participant_id": participant_id})
+        winners = await ParticipantRepo.count_cinema_winners(session, campaign.id)
+        cinema_limit = await RewardService.get_cinema_limit(session, campaign.id)
         log.debug("Cinema winners count", extra={"winners": winners, "limit": cinema_limit})
         if winners < cinema_limit:
-            code = await PromoCodeRepo.get_free_code_for_update(session, kind="cinema")
+            # FOR UPDATE SKIP LOCKED: the span shows time spent waiting on row locks
+            with span("db.claim_code") as claim:
+                code = await PromoCodeRepo.get_free_code_for_update(session, campaign.id, kind="cinema")
+                if claim is not None:
+                    claim.set(**{"promo.found": code is not None})
             if code:
                 log.info("Cinema promo code assigned", extra={"promo_code_id": code.id})
-                await PromoCodeRepo.mark_used(session, promo_code_id=code.id, participant_id=participant_id)
+                await PromoCodeRepo.mark_used(session, campaign.id, promo_code_id=code.id, participant_id=participant_id)
                 return RewardResult(
                     reward_type="cinema",
                     promo_code=code.code,
-                    message=await RewardService.render_message(session, "cinema", code.code),
+                    message=await RewardService.render_message(session, campaign, "cinema", code.code),
                 )
 
-        if settings.fallback_promo:
+        if campaign.fallback:
             log.warning("Cinema limit reached or no codes; using fallback promo", extra={"participant_id": participant_id})
             return RewardResult(
                 reward_type="promo",
-                promo_code=settings.fallback_promo,
-                message=await RewardService.render_message(session, "promo", settings.fallback_promo),
+                promo_code=campaign.fallback,
+                message=await RewardService.render_message(session, campaign, "promo", campaign.fallback),
             )
 
         log.warning("Cinema limit reached or no codes; using guide", extra={"participant_id": participant_id})
         return RewardResult(
             reward_type="guide",
             promo_code=None,
-            message=await RewardService.render_message(session, "guide", None),
+            message=await RewardService.render_message(session, campaign, "guide", None),
+        )
+
+    @staticmethod
+    async def claim(campaign: CampaignInfo, telegram_id: int, email: str) -> ClaimResult:
+        """
+        The primary-side transaction shared by email_flow and the pending re-check: create or load
+        the participant and assign a reward atomically. Also drops the user's pending entry,
+        so a manual retry and the background re-check cannot both deliver.
+        """
+        with span("email_flow.db.transaction"):
+            async with SessionMaker() as session:
+                async with session.begin():
+                    log.info("Creating or loading participant", extra={"telegram_id": telegram_id, "email": email})
+                    with span("db.upsert_participant"):
+                        participant = await ParticipantRepo.create_if_missing(
+                            session, campaign.id, telegram_id=telegram_id, email=email
+                        )
+                    await PendingVerificationRepo.delete_for_user(session, campaign.id, telegram_id)
+
+                    # if already rewarded — show the same (replica may have lagged behind)
+                    if participant.reward_type:
+                        log.info(
+                            "Participant already rewarded",
+                            extra={
+                                "participant_id": participant.id,
+                                "reward_type": participant.reward_type,
+                            },
+                        )
+                        return ClaimResult(
+                            participant_id=participant.id,
+                            reward_type=participant.reward_type,
+                            message=await RewardService.render_already_rewarded(session, campaign, participant),
+                            is_new=False,
+                        )
+
+                    log.info("Assigning new reward", extra={"participant_id": participant.id})
+                    reward = await RewardService.assign_reward(session, campaign, participant_id=participant.id)
+                    participant.reward_type = reward.reward_type
+                    participant.promo_code = reward.promo_code
+        return ClaimResult(
+            participant_id=participant.id,
+            reward_type=reward.reward_type,
+            message=reward.message,
+            is_new=True,
         )
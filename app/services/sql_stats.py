@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import settings
+from app.db import SqlStats, StatementStats, engine, get_replica_engine, normalize_statement
+from app.metrics import SQL_LOCK_WAIT_SECONDS
+
+
+log = logging.getLogger(__name__)
+
+EXPLAIN_STATEMENT_TIMEOUT_MS = 10_000
+EXPLAIN_POLL_INTERVAL = 1.0
+# pg_stat_activity.query is cut at track_activity_query_size (1024 by default)
+ACTIVITY_QUERY_TRUNCATED = 1000
+ACTIVITY_QUERY = text(
+    "SELECT query, wait_event_type FROM pg_stat_activity "
+    "WHERE datname = current_database() AND state = 'active' "
+    "AND backend_type = 'client backend' AND pid <> pg_backend_pid()"
+)
+SUMMARY_STATEMENTS = 30
+# EXPLAIN ANALYZE executes the statement: only plain reads get it. Writes, data-modifying CTEs,
+# locking reads (FOR UPDATE / FOR [KEY] SHARE) and sequence or advisory-lock calls would take row
+# locks, fire triggers and burn sequence values on the primary, which a rollback does not undo
+NOT_READ_ONLY_RE = re.compile(r"\b(insert|update|delete|merge|share|nextval|setval|pg_advisory\w*)\b", re.IGNORECASE)
+
+
+class SqlStatsService:
+    """
+    Background side of the statement stats collected in app.db: EXPLAIN of sampled slow statements
+    (ANALYZE, BUFFERS for plain reads only) and a lock-wait estimate from pg_stat_activity samples.
+    Every sample that finds a backend waiting on a Lock adds one sampling interval to that
+    statement's lock wait, so execution time is roughly total minus lock wait.
+    """
+    @staticmethod
+    def engine_for(name: str) -> AsyncEngine | None:
+        return get_replica_engine() if name == "replica" else engine
+
+    @staticmethod
+    def find(query: str) -> StatementStats:
+        normalized = normalize_statement(query)
+        stats = SqlStats.statements.get(normalized)
+        if stats is None and len(query) >= ACTIVITY_QUERY_TRUNCATED:
+            prefix = normalized[: ACTIVITY_QUERY_TRUNCATED // 2]
+            stats = next((item for key, item in SqlStats.statements.items() if key.startswith(prefix)), None)
+        # statements of other worker processes show up with lock wait only
+        return stats or SqlStats.get(query)
+
+    @staticmethod
+    async def sample_activity(interval: float) -> int:
+        """
+        Returns how many backends were waiting on a lock.
+        """
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(sql_stats=False)
+            rows = (await conn.execute(ACTIVITY_QUERY)).all()
+        waiting = 0
+        for query, wait_event_type in rows:
+            if wait_event_type != "Lock" or not query:
+                continue
+            waiting += 1
+            stats = SqlStatsService.find(query)
+            stats.lock_wait += interval
+            SQL_LOCK_WAIT_SECONDS.labels(stats.label).inc(interval)
+        return waiting
+
+    @staticmethod
+    def explain_options(statement: str) -> str:
+        read = statement.lstrip()[:6].lower().startswith(("select", "with"))
+        return "ANALYZE, BUFFERS" if read and not NOT_READ_ONLY_RE.search(statement) else ""
+
+    @staticmethod
+    async def explain(engine_name: str, statement: str, parameters: object, elapsed: float) -> None:
+        """
+        Plain reads are EXPLAIN ANALYZEd in a transaction that is always rolled back; everything
+        else gets a plain EXPLAIN, which plans the statement without running it.
+        """
+        target = SqlStatsService.engine_for(engine_name)
+        if target is None:
+            return
+        options = SqlStatsService.explain_options(statement)
+        command = f"EXPLAIN ({options}) " if options else "EXPLAIN "
+        async with target.connect() as conn:
+            conn = await conn.execution_options(sql_stats=False)
+            async with conn.begin() as transaction:
+                await conn.exec_driver_sql(f"SET LOCAL statement_timeout = {EXPLAIN_STATEMENT_TIMEOUT_MS}")
+                result = await conn.exec_driver_sql(command + statement, parameters)
+                plan = "\n".join(row[0] for row in result)
+                await transaction.rollback()
+        stats = SqlStats.get(statement)
+        stats.plan = plan
+        stats.plan_options = options
+        stats.plan_duration = elapsed
+        log.info(
+            "Slow statement explained",
+            extra={"statement": stats.label, "elapsed_ms": round(elapsed * 1000, 1), "analyze": bool(options)},
+        )
+
+    @staticmethod
+    async def run() -> None:
+        """
+        Drains the EXPLAIN queue; the primary worker also samples pg_stat_activity, which sees
+        the backends of every process.
+        """
+        if not settings.sql_stats_enabled:
+            return
+        activity_interval = settings.sql_activity_interval if settings.is_primary_worker else 0.0
+        interval = min(activity_interval or EXPLAIN_POLL_INTERVAL, EXPLAIN_POLL_INTERVAL)
+        last_activity = 0.0
+        while True:
+            await asyncio.sleep(interval)
+            if activity_interval and time.monotonic() - last_activity >= activity_interval:
+                last_activity = time.monotonic()
+                try:
+                    await SqlStatsService.sample_activity(activity_interval)
+                except Exception:
+                    log.warning("pg_stat_activity sampling failed", exc_info=True)
+            while SqlStats.explain_queue:
+                engine_name, statement, parameters, elapsed = SqlStats.explain_queue.popleft()
+                try:
+                    await SqlStatsService.explain(engine_name, statement, parameters, elapsed)
+                except Exception:
+                    log.warning("EXPLAIN of a slow statement failed", exc_info=True)
+
+    @staticmethod
+    def render_summary(limit: int = SUMMARY_STATEMENTS) -> str:
+        statements = sorted(SqlStats.statements.values(), key=lambda item: item.total, reverse=True)
+        total = sum(item.total for item in statements)
+        since = datetime.fromtimestamp(SqlStats.started_at, tz=timezone.utc).isoformat(timespec="seconds")
+        lines = [
+            f"SQL statements since {since}, pid {os.getpid()}"
+            + ("" if settings.worker_index is None else f", worker {settings.worker_index}"),
+            f"Statements: {len(statements)}, calls: {sum(item.calls for item in statements)}, "
+            f"time: {total:.1f}s, slow (>{settings.sql_slow_threshold * 1000:g}ms): "
+            f"{sum(item.slow for item in statements)}",
+            "Lock wait is estimated from pg_stat_activity samples every "
+            f"{settings.sql_activity_interval:g}s (primary worker only); exec = total - lock wait.",
+            "",
+            f"{'total s':>9} {'share':>6} {'calls':>8} {'mean ms':>9} {'max ms':>9} {'lock s':>8} {'exec s':>8} "
+            f"{'slow':>5} {'err':>4}  statement",
+        ]
+        for item in statements[:limit]:
+            mean = item.total / item.calls * 1000 if item.calls else 0.0
+            lines.append(
+                f"{item.total:>9.2f} {item.total / total if total else 0:>6.1%} {item.calls:>8} {mean:>9.2f} "
+                f"{item.max * 1000:>9.1f} {item.lock_wait:>8.1f} {max(0.0, item.total - item.lock_wait):>8.2f} "
+                f"{item.slow:>5} {item.errors:>4}  {item.statement}"
+            )
+        plans = [item for item in statements if item.plan]
+        if plans:
+            lines.append(
+                "\nEXPLAIN of sampled slow executions (ANALYZE, BUFFERS for plain reads; writes and locking "
+                "reads are not executed, their plans show estimates only):"
+            )
+        for item in plans:
+            lines.append(f"\n-- {item.statement}\n-- original execution: {item.plan_duration * 1000:.1f}ms")
+            lines.append(f"-- EXPLAIN ({item.plan_options})" if item.plan_options else "-- EXPLAIN (estimates only)")
+            lines.append(item.plan or "")
+        return "\n".join(lines) + "\n"
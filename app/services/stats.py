@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+import logging
+import time
+
+from app.config import settings
+from app.db import read_session
+from app.repositories.participants import ParticipantRepo
+from app.repositories.promo_codes import PromoCodeRepo
+from app.services.rewards import RewardService
+
+
+log = logging.getLogger(__name__)
+
+CLAIM_RATE_WINDOW = timedelta(hours=1)
+
+
+@dataclass(frozen=True)
+class PromoKindStats:
+    kind: str
+    total: int
+    used: int
+    free: int
+    claimed_last_hour: int
+
+
+@dataclass(frozen=True)
+class PromoDashboard:
+    kinds: dict[str, PromoKindStats]
+    campaign_id: int
+    cinema_winners: int
+    cinema_limit: int
+    generated_at: datetime
+
+    @property
+    def cinema(self) -> PromoKindStats:
+        return self.kinds.get("cinema") or PromoKindStats("cinema", 0, 0, 0, 0)
+
+    @property
+    def cinema_remaining(self) -> int:
+        """
+        Cinema rewards still available: bounded by both free codes and the winners limit.
+        """
+        return max(0, min(self.cinema.free, self.cinema_limit - self.cinema_winners))
+
+    @property
+    def projected_sellout(self) -> datetime | None:
+        rate = self.cinema.claimed_last_hour
+        if rate <= 0 or self.cinema_remaining <= 0:
+            return None
+        return self.generated_at + timedelta(hours=self.cinema_remaining / rate)
+
+
+class StatsService:
+    """
+    Short-lived per-campaign cache in front of the aggregate queries: admins refresh the dashboard
+    constantly during launches, concurrent refreshes share one DB round.
+    """
+    _cached: dict[int, tuple[float, PromoDashboard]] = {}
+    _lock = asyncio.Lock()
+
+    @staticmethod
+    async def load_dashboard(campaign_id: int) -> PromoDashboard:
+        now = datetime.now(tz=timezone.utc)
+        async with read_session() as session:
+            by_kind = await PromoCodeRepo.stats_by_kind(session, campaign_id, used_since=now - CLAIM_RATE_WINDOW)
+            winners = await ParticipantRepo.count_cinema_winners(session, campaign_id)
+            cinema_limit = await RewardService.get_cinema_limit(session, campaign_id)
+        kinds = {
+            kind: PromoKindStats(
+                kind=kind,
+                total=item["total"],
+                used=item["used"],
+                free=item["free"],
+                claimed_last_hour=item["used_since"],
+            )
+            for kind, item in by_kind.items()
+        }
+        return PromoDashboard(
+            kinds=kinds,
+            campaign_id=campaign_id,
+            cinema_winners=winners,
+            cinema_limit=cinema_limit,
+            generated_at=now,
+        )
+
+    @classmethod
+    def _fresh(cls, campaign_id: int) -> PromoDashboard | None:
+        entry = cls._cached.get(campaign_id)
+        if entry and time.monotonic() - entry[0] < settings.stats_cache_ttl:
+            return entry[1]
+        return None
+
+    @classmethod
+    async def get_dashboard(cls, campaign_id: int, force: bool = False) -> PromoDashboard:
+        cached = None if force else cls._fresh(campaign_id)
+        if cached:
+            return cached
+        async with cls._lock:
+            # another caller may have refreshed while we were waiting
+            cached = None if force else cls._fresh(campaign_id)
+            if cached:
+                return cached
+            log.debug("Refreshing promo dashboard", extra={"campaign_id": campaign_id})
+            dashboard = await cls.load_dashboard(campaign_id)
+            cls._cached[campaign_id] = (time.monotonic(), dashboard)
+            return dashboard
+
+    @classmethod
+    def invalidate(cls, campaign_id: int | None = None) -> None:
+        if campaign_id is None:
+            cls._cached.clear()
+        else:
+            cls._cached.pop(campaign_id, None)
@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import logging
+import time
+from typing import Iterable
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import SessionMaker
+from app.config import settings
+from app.db import read_session
 from app.repositories.bot_texts import BotTextRepo
 
 log = logging.getLogger(__name__)
@@ -19,6 +23,7 @@ DEFAULT_TEXTS: dict[str, str] = {
     "telegram_id_missing": "Не смог определить Ваш Telegram ID. Попробуйте ещё раз.",
     "invalid_email": "Похоже, это не email. Пришлите адрес в формате name@example.com",
     "unisender_unavailable": "Сервис проверки подписки временно недоступен. Попробуйте чуть позже.",
+    "overloaded": "⏳ Сейчас очень много желающих получить подарок. Пожалуйста, пришлите email ещё раз через минуту.",
     "not_confirmed_invited": (
         "❗ Подписка ещё не подтверждена.\n"
         "Проверьте почту: откройте письмо и нажмите «Подтвердить подписку».\n\n"
@@ -38,6 +43,7 @@ DEFAULT_TEXTS: dict[str, str] = {
         "В списке: {in_list}, статус в списке: {list_status}"
     ),
     "already_rewarded": "✅ Вы уже получали подарок.\n\n{reward_message}",
+    "pending_confirmed": "✅ Подписка подтверждена!\n\n{reward_message}",
     "winner_message": (
         "ДЛЯ ТЕХ, КТО ВЫИГРАЛ\n\n"
         "Спасибо, что подписались на нашу рассылку! Делимся промокодом для посещения кинотеатра 🔽\n\n"
@@ -75,35 +81,68 @@ TEXT_DESCRIPTIONS: dict[str, str] = {
     "telegram_id_missing": "Ошибка, если не удалось получить Telegram ID.",
     "invalid_email": "Ответ на неверный формат email.",
     "unisender_unavailable": "Сообщение при ошибке/недоступности Unisender.",
+    "overloaded": "Ответ, когда бот перегружен и не может сразу проверить email.",
     "not_confirmed_invited": "Подписка не подтверждена (status invited).",
     "not_confirmed_new": "Подписка не найдена/не подтверждена (status new или None).",
     "not_confirmed_unsubscribed": "Подписка неактивна (unsubscribed/blocked/inactive).",
     "not_confirmed_other": "Общий случай, когда статусы не подходят.",
     "already_rewarded": "Префикс, если подарок уже был получен.",
+    "pending_confirmed": "Префикс, когда бот сам дождался подтверждения подписки и выдал подарок.",
     "winner_message": "Текст для победителей с промокодом.",
     "non_winner_message": "Текст для тех, кто не выиграл.",
 }
 
 
 class TextService:
-    @staticmethod
-    async def get_text(session: AsyncSession, key: str) -> str:
-        record = await BotTextRepo.get(session, key)
+    """
+    Resolved texts (campaign override -> global row -> default) are cached for TEXT_CACHE_TTL seconds;
+    almost every reply needs one, and they change only when an admin edits them.
+    """
+    _cache: dict[tuple[str, int | None], tuple[float, str]] = {}
+
+    @classmethod
+    def invalidate(cls) -> None:
+        cls._cache.clear()
+
+    @classmethod
+    async def get_text(cls, session: AsyncSession, key: str, campaign_id: int | None = None) -> str:
+        cached = cls._cache.get((key, campaign_id))
+        if cached and time.monotonic() - cached[0] < settings.text_cache_ttl:
+            return cached[1]
+        record = await BotTextRepo.get(session, key, campaign_id)
         if record:
-            return record.value
-        fallback = DEFAULT_TEXTS.get(key, "")
-        if not fallback:
-            log.warning("Missing text fallback", extra={"key": key})
-        return fallback
+            value = record.value
+        else:
+            value = DEFAULT_TEXTS.get(key, "")
+            if not value:
+                log.warning("Missing text fallback", extra={"key": key})
+        cls._cache[(key, campaign_id)] = (time.monotonic(), value)
+        return value
+
+    @classmethod
+    async def preload(cls, campaign_ids: Iterable[int] = ()) -> int:
+        """
+        Fills the cache for every known key with one query. Returns the number of cached entries.
+        """
+        async with read_session() as session:
+            rows = await BotTextRepo.list_all(session)
+        shared = {row.key: row.value for row in rows if row.campaign_id is None}
+        overrides = {(row.key, row.campaign_id): row.value for row in rows if row.campaign_id is not None}
+        now = time.monotonic()
+        for campaign_id in [None, *campaign_ids]:
+            for key in DEFAULT_TEXTS:
+                value = overrides.get((key, campaign_id)) or shared.get(key) or DEFAULT_TEXTS[key]
+                cls._cache[(key, campaign_id)] = (now, value)
+        return len(cls._cache)
 
     @staticmethod
-    async def get_text_global(key: str) -> str:
-        async with SessionMaker() as session:
-            return await TextService.get_text(session, key)
+    async def get_text_global(key: str, campaign_id: int | None = None) -> str:
+        async with read_session() as session:
+            return await TextService.get_text(session, key, campaign_id)
 
     @staticmethod
-    async def set_text(session: AsyncSession, key: str, value: str) -> None:
-        await BotTextRepo.set(session, key, value)
+    async def set_text(session: AsyncSession, key: str, value: str, campaign_id: int | None = None) -> None:
+        await BotTextRepo.set(session, key, value, campaign_id)
 
     @staticmethod
     def list_keys() -> list[str]:
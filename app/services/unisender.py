@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 import logging
+import time
 from dataclasses import dataclass
 from typing import Any
 
 import aiohttp
 
 from app.config import settings
+from app.metrics import UNISENDER_REQUEST_SECONDS
+from app.services.recorder import TrafficRecorder
+from app.utils.lazy import LazyProxy
 
 log = logging.getLogger(__name__)
 
+REQUEST_TIMEOUT = 15.0
+
 
 @dataclass(frozen=True)
 class UnisenderContactStatus:
@@ -23,10 +29,37 @@ class UnisenderClient:
     Uses Unisender 'getContact' method.
     Docs: status values like invited/active/etc.  [oai_citation:2‡Unisender](https://www.unisender.com/ru/support/api/contacts/getcontact/)
     """
-    def __init__(self, api_key: str, base_url: str, lang: str) -> None:
+    def __init__(self, api_key: str, base_url: str, lang: str, pool_size: int = 20) -> None:
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
         self.lang = lang
+        self.pool_size = pool_size
+        self._session: aiohttp.ClientSession | None = None
+
+    def session(self) -> aiohttp.ClientSession:
+        """
+        One keep-alive session for the process instead of a new connection (and TLS handshake) per request.
+        """
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def warmup(self) -> None:
+        """
+        Opens the session and one connection to the API host, so the first user skips DNS and TLS setup.
+        """
+        try:
+            async with self.session().head(self.base_url) as resp:
+                log.info("Unisender connection warmed", extra={"status": resp.status})
+        except Exception:
+            log.warning("Unisender warmup request failed", exc_info=True)
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
 
     async def get_contact(self, email: str, include_lists: bool = True) -> dict[str, Any]:
         url = f"{self.base_url}/{self.lang}/api/getContact"
@@ -39,19 +72,28 @@ class UnisenderClient:
             params["include_lists"] = "1"
 
         log.debug("Unisender getContact request", extra={"email": email, "include_lists": include_lists})
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15)) as session:
-            async with session.get(url, params=params) as resp:
+        started = time.perf_counter()
+        try:
+            async with self.session().get(url, params=params) as resp:
                 log.debug("Unisender response status", extra={"status": resp.status})
                 data = await resp.json(content_type=None)
+        except Exception as exc:
+            UNISENDER_REQUEST_SECONDS.labels("exception").observe(time.perf_counter() - started)
+            TrafficRecorder.record_unisender(email, None, time.perf_counter() - started, error=type(exc).__name__)
+            raise
+        TrafficRecorder.record_unisender(email, data, time.perf_counter() - started)
 
         # Unisender returns {"result": {...}} or {"error": "...", "code": "..."}
         if isinstance(data, dict) and "error" in data:
+            outcome = "not_found" if data.get("code") == "object_not_found" else "error"
+            UNISENDER_REQUEST_SECONDS.labels(outcome).observe(time.perf_counter() - started)
             log.error(
                 "Unisender error response",
                 extra={"email": email, "error": data.get("error"), "code": data.get("code")},
             )
             return data
 
+        UNISENDER_REQUEST_SECONDS.labels("ok").observe(time.perf_counter() - started)
         log.debug("Unisender getContact success", extra={"email": email})
         return data
 
@@ -100,8 +142,11 @@ class UnisenderClient:
         )
 
 
-unisender = UnisenderClient(
-    api_key=settings.unisender_api_key,
-    base_url=settings.unisender_base_url,
-    lang=settings.unisender_lang,
+unisender: UnisenderClient = LazyProxy(  # type: ignore[assignment]
+    lambda: UnisenderClient(
+        api_key=settings.unisender_api_key,
+        base_url=settings.unisender_base_url,
+        lang=settings.unisender_lang,
+        pool_size=settings.unisender_pool_size,
+    )
 )
@@ -0,0 +1,360 @@
+"""
+Multi-process mode: a supervisor and WORKERS webhook worker processes, so one bot uses every core.
+
+    WEBHOOK_URL=https://bot.example.com WORKERS=4 python -m app.supervisor
+
+The supervisor checks the schema, registers the webhook and spawns the workers. Every worker
+serves WEBHOOK_HOST:WEBHOOK_PORT with SO_REUSEPORT, so the kernel spreads Telegram's connections
+between them. Workers that exit or stop sending heartbeats (a blocked event loop) are restarted
+with a backoff. The supervisor serves the aggregated metrics of all workers (prometheus_client
+multiprocess mode) and /health on METRICS_PORT.
+
+Shared state:
+- FSM state is kept in the DB (DbStorage): a user's next update may land on another worker;
+- campaign, text and stats caches stay per process; an admin edit invalidates them in the
+  worker that handled it, the others pick it up within CAMPAIGN_CACHE_TTL / TEXT_CACHE_TTL;
+- singletons run on worker 0 only: broadcasts (created anywhere, sent by worker 0), the pending
+  re-verification scheduler and the promo gauges. Event and trace buffers are flushed by each worker;
+- cancel buttons work from any worker: broadcasts stop on their DB status, other jobs get a DB request.
+
+Each worker has its own DB pool, so up to WORKERS * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections
+are opened; size the pool settings and Postgres max_connections for that.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+import glob
+import logging
+import multiprocessing
+from multiprocessing.context import SpawnContext, SpawnProcess
+import os
+import signal
+import tempfile
+import time
+from typing import Any
+
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest, multiprocess
+
+from app.config import settings
+from app.logging_cfg import setup_logging
+from app.bot.admin import watch_broadcasts
+from app.bot.storage import DbStorage
+from app.db import engine, get_replica_engine
+from app.main import build_bot, build_dispatcher, check_schema, warmup
+from app.metrics import STARTUP_PHASE_SECONDS, observe_pool, update_pool_gauges
+from app.services.campaigns import CampaignService
+from app.services.events import EventLog
+from app.services.jobs import JobRegistry
+from app.services.monitoring import monitor_event_loop_lag, refresh_promo_gauges
+from app.services.pending import PendingVerificationService
+from app.services.recorder import TrafficRecorder
+from app.services.sql_stats import SqlStatsService
+from app.services.unisender import unisender
+from app.tracing import TraceExporter
+
+
+log = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 1.0
+CHECK_INTERVAL = 1.0
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = 60.0
+CRASH_WINDOW = 300.0  # crashes older than this no longer grow the restart backoff
+STOP_TIMEOUT = 20.0  # seconds a worker gets to finish in-flight updates on shutdown
+SHUTDOWN_GRACE = 10.0
+
+
+# --- worker -------------------------------------------------------------------------------------
+
+
+async def send_heartbeats(index: int, heartbeats: Any) -> None:
+    while True:
+        heartbeats[index] = time.time()
+        update_pool_gauges()
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+
+async def run_worker(index: int, heartbeats: Any) -> None:
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+    setup_logging(settings.log_level, settings.log_format, settings.log_sampling, settings.log_queue_size)
+
+    bot = build_bot()
+    dp = build_dispatcher(DbStorage())
+    observe_pool(engine)
+    if get_replica_engine() is not None:
+        observe_pool(get_replica_engine(), name="replica")
+
+    background = [
+        asyncio.create_task(send_heartbeats(index, heartbeats)),
+        asyncio.create_task(monitor_event_loop_lag()),
+        asyncio.create_task(JobRegistry.watch_cancellations()),
+        asyncio.create_task(SqlStatsService.run()),
+    ]
+    if settings.is_primary_worker:
+        background.append(asyncio.create_task(refresh_promo_gauges()))
+        background.append(asyncio.create_task(CampaignService.run_detacher()))
+    event_flusher = asyncio.create_task(EventLog.run_flusher())
+    trace_exporter = asyncio.create_task(TraceExporter.run())
+    recorder = asyncio.create_task(TrafficRecorder.run())
+
+    await warmup(bot, timings)
+    if settings.is_primary_worker:
+        background.append(asyncio.create_task(watch_broadcasts(bot)))
+        if settings.pending_enabled:
+            background.append(asyncio.create_task(PendingVerificationService.run(bot)))
+
+    app = web.Application()
+    handler = SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=settings.webhook_secret)
+    handler.register(app, path=settings.webhook_path)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, settings.webhook_host, settings.webhook_port, reuse_port=True).start()
+
+    time_to_ready = time.perf_counter() - started
+    STARTUP_PHASE_SECONDS.labels("total").set(time_to_ready)
+    log.info(
+        "Worker started",
+        extra={
+            "worker_index": index,
+            "time_to_ready_ms": round(time_to_ready * 1000),
+            "phases_ms": {name: round(value * 1000) for name, value in timings.items()},
+        },
+    )
+
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        log.info("Worker stopping", extra={"worker_index": index})
+        await runner.cleanup()
+        # updates are handled in background tasks after the 200 reply; let them finish
+        in_flight = list(getattr(handler, "_background_feed_update_tasks", ()))
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=SHUTDOWN_GRACE)
+        for task in background:
+            task.cancel()
+        event_flusher.cancel()
+        trace_exporter.cancel()
+        recorder.cancel()
+        await asyncio.gather(*background, event_flusher, trace_exporter, recorder, return_exceptions=True)
+        await unisender.close()
+        await bot.session.close()
+
+
+def worker_main(index: int, heartbeats: Any) -> None:
+    """
+    Entry point of a spawned worker process. Settings are built lazily, so WORKER_INDEX set here is seen.
+    """
+    os.environ["WORKER_INDEX"] = str(index)
+    # Ctrl+C reaches the whole process group; the supervisor turns it into an orderly SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(run_worker(index, heartbeats))
+
+
+# --- supervisor ---------------------------------------------------------------------------------
+
+
+@dataclass
+class WorkerSlot:
+    index: int
+    process: SpawnProcess | None = None
+    started_at: float = 0.0
+    restart_at: float = 0.0
+    restarts: int = 0
+    crashes: deque[float] = field(default_factory=deque)
+
+
+class Supervisor:
+    def __init__(self, ctx: SpawnContext, workers: int) -> None:
+        self.ctx = ctx
+        self.heartbeats = ctx.Array("d", workers, lock=False)
+        self.slots = [WorkerSlot(index) for index in range(workers)]
+
+    def spawn(self, slot: WorkerSlot) -> None:
+        self.heartbeats[slot.index] = 0.0
+        process = self.ctx.Process(
+            target=worker_main, args=(slot.index, self.heartbeats), name=f"bot-worker-{slot.index}"
+        )
+        process.start()
+        slot.process = process
+        slot.started_at = time.time()
+        log.info("Worker spawned", extra={"worker_index": slot.index, "pid": process.pid})
+
+    def heartbeat_age(self, slot: WorkerSlot) -> float | None:
+        beat = self.heartbeats[slot.index]
+        return time.time() - beat if beat else None
+
+    def on_exit(self, slot: WorkerSlot, reason: str) -> None:
+        process = slot.process
+        assert process is not None
+        process.join(timeout=0)
+        multiprocess.mark_process_dead(process.pid)
+        now = time.time()
+        slot.crashes.append(now)
+        while slot.crashes and now - slot.crashes[0] > CRASH_WINDOW:
+            slot.crashes.popleft()
+        delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF_BASE * 2 ** (len(slot.crashes) - 1))
+        slot.process = None
+        slot.restart_at = now + delay
+        slot.restarts += 1
+        log.error(
+            "Worker died, restarting",
+            extra={
+                "worker_index": slot.index,
+                "pid": process.pid,
+                "exitcode": process.exitcode,
+                "reason": reason,
+                "restart_in_s": delay,
+            },
+        )
+
+    def check(self) -> None:
+        now = time.time()
+        for slot in self.slots:
+            if slot.process is None:
+                if now >= slot.restart_at:
+                    self.spawn(slot)
+                continue
+            if not slot.process.is_alive():
+                self.on_exit(slot, "exited")
+                continue
+            # a worker gets the timeout once for its startup, then must keep beating
+            age = self.heartbeat_age(slot)
+            silent_for = age if age is not None else now - slot.started_at
+            if silent_for > settings.worker_heartbeat_timeout:
+                log.error(
+                    "Worker heartbeat lost, killing it",
+                    extra={"worker_index": slot.index, "silent_s": round(silent_for, 1)},
+                )
+                slot.process.kill()
+                slot.process.join(timeout=5)
+                self.on_exit(slot, "heartbeat_lost")
+
+    async def stop_all(self) -> None:
+        processes = [slot.process for slot in self.slots if slot.process is not None]
+        for process in processes:
+            process.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        while any(process.is_alive() for process in processes) and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        for process in processes:
+            if process.is_alive():
+                log.warning("Worker did not stop in time, killing it", extra={"pid": process.pid})
+                process.kill()
+            process.join(timeout=5)
+            multiprocess.mark_process_dead(process.pid)
+
+    def health(self) -> tuple[bool, list[dict[str, Any]]]:
+        workers: list[dict[str, Any]] = []
+        healthy = True
+        for slot in self.slots:
+            alive = slot.process is not None and slot.process.is_alive()
+            age = self.heartbeat_age(slot)
+            ready = alive and age is not None and age < settings.worker_heartbeat_timeout
+            healthy = healthy and ready
+            workers.append(
+                {
+                    "index": slot.index,
+                    "pid": slot.process.pid if slot.process else None,
+                    "alive": alive,
+                    "ready": ready,
+                    "heartbeat_age_s": round(age, 3) if age is not None else None,
+                    "restarts": slot.restarts,
+                }
+            )
+        return healthy, workers
+
+
+async def start_supervisor_server(supervisor: Supervisor, host: str, port: int) -> web.AppRunner:
+    async def metrics_handler(request: web.Request) -> web.Response:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return web.Response(body=generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+    async def health_handler(request: web.Request) -> web.Response:
+        healthy, workers = supervisor.health()
+        return web.json_response({"healthy": healthy, "workers": workers}, status=200 if healthy else 503)
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    app.router.add_get("/health", health_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    log.info("Supervisor endpoint started", extra={"host": host, "port": port})
+    return runner
+
+
+def prepare_metrics_dir() -> str:
+    """
+    Must run before any worker starts: prometheus_client picks its storage when it is imported.
+    """
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="bot-metrics-")
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+    return path
+
+
+async def register_webhook() -> None:
+    if not settings.webhook_url:
+        raise SystemExit("WEBHOOK_URL is required in multi-process mode")
+    bot = build_bot()
+    try:
+        await bot.set_webhook(
+            url=settings.webhook_url.rstrip("/") + settings.webhook_path,
+            secret_token=settings.webhook_secret,
+            allowed_updates=build_dispatcher(DbStorage()).resolve_used_update_types(),
+        )
+    finally:
+        await bot.session.close()
+
+
+async def supervise() -> None:
+    setup_logging(settings.log_level, settings.log_format, settings.log_sampling, settings.log_queue_size)
+    await check_schema()
+    await register_webhook()
+    await engine.dispose()
+
+    workers = settings.workers or os.cpu_count() or 1
+    supervisor = Supervisor(multiprocessing.get_context("spawn"), workers)
+    runner = None
+    if settings.metrics_port:
+        runner = await start_supervisor_server(supervisor, settings.metrics_host, settings.metrics_port)
+    log.info(
+        "Supervisor started",
+        extra={"workers": workers, "port": settings.webhook_port, "metrics_dir": os.environ["PROMETHEUS_MULTIPROC_DIR"]},
+    )
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        while not stop.is_set():
+            supervisor.check()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=CHECK_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        log.info("Supervisor stopping")
+        await supervisor.stop_all()
+        if runner:
+            await runner.cleanup()
+
+
+def main() -> None:
+    prepare_metrics_dir()
+    asyncio.run(supervise())
+
+
+if __name__ == "__main__":
+    main()
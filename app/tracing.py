@@ -0,0 +1,272 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Iterator
+
+import aiohttp
+
+from app.config import settings
+from app.metrics import TRACES_DROPPED, TRACES_EXPORTED
+
+
+log = logging.getLogger(__name__)
+
+SERVICE_NAME = "unisender_giveaway_bot"
+EXPORT_INTERVAL = 5.0
+EXPORT_TIMEOUT = 10.0
+
+# OTLP enums
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    name: str
+    kind: int = SPAN_KIND_INTERNAL
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> dict[str, Any]:
+        data: dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": STATUS_ERROR, "message": self.error} if self.error else {"code": STATUS_OK},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    spans: list[Span] = field(default_factory=list)
+
+    @property
+    def root(self) -> Span:
+        return self.spans[0]
+
+    def render_tree(self) -> str:
+        children: dict[str | None, list[Span]] = {}
+        for item in self.spans:
+            children.setdefault(item.parent_id, []).append(item)
+        lines: list[str] = []
+
+        def walk(node: Span, depth: int) -> None:
+            offset = (node.start_ns - self.root.start_ns) / 1e6
+            status = f" ERROR {node.error}" if node.error else ""
+            lines.append(f"{'  ' * depth}{node.name} +{offset:.1f}ms {node.duration_ms:.1f}ms{status}")
+            for child in sorted(children.get(node.span_id, []), key=lambda s: s.start_ns):
+                walk(child, depth + 1)
+
+        walk(self.root, 0)
+        return "\n".join(lines)
+
+
+_current_trace: ContextVar[Trace | None] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """
+    Child span of whatever span is active in this task; a no-op outside a traced update.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    item = Span(trace.trace_id, new_id(64), parent.span_id if parent else None, name, attributes=attributes)
+    trace.spans.append(item)
+    token = _current_span.set(item)
+    try:
+        yield item
+    except BaseException as e:
+        item.error = type(e).__name__
+        raise
+    finally:
+        item.end_ns = time.time_ns()
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace_update(update_id: int, event_type: str) -> Iterator[Span]:
+    """
+    Root span for one update. When it ends the trace is queued for export and, above
+    TRACE_SLOW_THRESHOLD, logged with its span tree.
+    """
+    trace = Trace(new_id(128))
+    root = Span(
+        trace.trace_id,
+        new_id(64),
+        None,
+        f"update.{event_type}",
+        kind=SPAN_KIND_SERVER,
+        attributes={"update.id": update_id, "update.type": event_type},
+    )
+    trace.spans.append(root)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = type(e).__name__
+        raise
+    finally:
+        root.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        _current_trace.reset(trace_token)
+        slow = root.duration_ms >= settings.trace_slow_threshold * 1000
+        if slow:
+            log.warning(
+                "Slow update",
+                extra={
+                    "update_id": update_id,
+                    "trace_id": trace.trace_id,
+                    "duration_ms": round(root.duration_ms, 1),
+                    "span_tree": trace.render_tree(),
+                },
+            )
+        TraceExporter.notify(trace)
+        if slow or random.random() < settings.trace_sample_rate:
+            TraceExporter.enqueue(trace)
+
+
+class TraceExporter:
+    """
+    Finished traces wait in a bounded buffer; `run()` writes them every EXPORT_INTERVAL seconds
+    as OTLP/JSON ExportTraceServiceRequest payloads to TRACE_FILE (one per line) and/or
+    POSTs them to TRACE_OTLP_ENDPOINT/v1/traces.
+    """
+    _buffer: list[Trace] = []
+    _subscribers: list[Callable[[Trace], None]] = []
+
+    @classmethod
+    def subscribe(cls, callback: Callable[[Trace], None]) -> None:
+        """
+        `callback` sees every finished trace, before sampling (used by the load test to collect stage timings).
+        """
+        cls._subscribers.append(callback)
+
+    @classmethod
+    def notify(cls, trace: Trace) -> None:
+        for callback in cls._subscribers:
+            try:
+                callback(trace)
+            except Exception:
+                log.exception("Trace subscriber failed")
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(settings.trace_file or settings.trace_otlp_endpoint)
+
+    @classmethod
+    def enqueue(cls, trace: Trace) -> None:
+        if not cls.enabled():
+            return
+        if len(cls._buffer) >= settings.trace_buffer_size:
+            TRACES_DROPPED.labels("overflow").inc()
+            return
+        cls._buffer.append(trace)
+
+    @staticmethod
+    def build_request(traces: list[Trace]) -> dict[str, Any]:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app.tracing"},
+                            "spans": [item.to_otlp() for trace in traces for item in trace.spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+    @staticmethod
+    def write_file(path: str, payload: str) -> None:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(payload + "\n")
+
+    @classmethod
+    async def export(cls, session: aiohttp.ClientSession | None = None) -> int:
+        if not cls._buffer:
+            return 0
+        traces, cls._buffer = cls._buffer, []
+        payload = json.dumps(cls.build_request(traces), ensure_ascii=False)
+        try:
+            if settings.trace_file:
+                # file writes go to a thread, never onto the event loop
+                await asyncio.to_thread(cls.write_file, settings.trace_file, payload)
+            if settings.trace_otlp_endpoint and session is not None:
+                url = settings.trace_otlp_endpoint.rstrip("/") + "/v1/traces"
+                async with session.post(url, data=payload, headers={"Content-Type": "application/json"}) as resp:
+                    resp.raise_for_status()
+        except Exception:
+            log.warning("Trace export failed", extra={"traces": len(traces)}, exc_info=True)
+            TRACES_DROPPED.labels("export_error").inc(len(traces))
+            return 0
+        TRACES_EXPORTED.inc(len(traces))
+        return len(traces)
+
+    @classmethod
+    async def run(cls, interval: float = EXPORT_INTERVAL) -> None:
+        if not cls.enabled():
+            return
+        timeout = aiohttp.ClientTimeout(total=EXPORT_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            try:
+                while True:
+                    await asyncio.sleep(interval)
+                    await cls.export(session)
+            except asyncio.CancelledError:
+                await cls.export(session)
+                raise
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+import time
+from typing import AsyncIterator
+
+from app.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_SHED, ADMISSION_WAIT_SECONDS
+
+
+class AdmissionGate:
+    """
+    At most `limit` holders at a time, a wait queue of `queue_size` and a `timeout` on waiting.
+    Whoever does not fit is refused at once instead of piling up behind a slow dependency.
+    Priority waiters are served first and are not limited by `queue_size`.
+    """
+    def __init__(self, limit: int, queue_size: int, timeout: float) -> None:
+        self.limit = max(1, limit)
+        self.queue_size = max(0, queue_size)
+        self.timeout = timeout
+        self._active = 0
+        self._waiters: dict[str, deque[asyncio.Future]] = {"admin": deque(), "user": deque()}
+
+    def _update_gauges(self) -> None:
+        ADMISSION_ACTIVE.set(self._active)
+        for lane, waiters in self._waiters.items():
+            ADMISSION_QUEUE_DEPTH.labels(lane).set(len(waiters))
+
+    def _release(self) -> None:
+        # the slot goes straight to the next waiter, so nobody can overtake the queue
+        for lane in ("admin", "user"):
+            waiters = self._waiters[lane]
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    self._update_gauges()
+                    return
+        self._active -= 1
+        self._update_gauges()
+
+    async def _acquire(self, lane: str) -> str | None:
+        """
+        Returns None when admitted, otherwise the shed reason: queue_full | timeout.
+        """
+        started = time.perf_counter()
+        if self._active < self.limit and not any(self._waiters.values()):
+            self._active += 1
+            self._update_gauges()
+            ADMISSION_WAIT_SECONDS.labels(lane).observe(0.0)
+            return None
+        waiters = self._waiters[lane]
+        if lane == "user" and len(waiters) >= self.queue_size:
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        self._update_gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiters.remove(waiter)
+                waiter.cancel()
+                self._update_gauges()
+                return "timeout"
+            # the slot was handed over right at the deadline: take it
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            elif waiter in waiters:
+                waiters.remove(waiter)
+                waiter.cancel()
+                self._update_gauges()
+            raise
+        ADMISSION_WAIT_SECONDS.labels(lane).observe(time.perf_counter() - started)
+        return None
+
+    @asynccontextmanager
+    async def slot(self, priority: bool = False) -> AsyncIterator[bool]:
+        """
+        Yields True when admitted; False means the caller should shed the request.
+        """
+        reason = await self._acquire("admin" if priority else "user")
+        if reason is not None:
+            ADMISSION_SHED.labels(reason).inc()
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            self._release()
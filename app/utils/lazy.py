@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Generic, TypeVar
+
+
+T = TypeVar("T")
+
+
+class LazyProxy(Generic[T]):
+    """
+    Stands in for an object that is built on first use: importing a module that defines
+    `settings` or `engine` no longer needs a full .env or opens anything.
+    Attribute access and calls are forwarded; use `unwrap()` where a library needs the real object.
+    """
+    __slots__ = ("_lazy_factory", "_lazy_instance", "_lazy_lock")
+
+    def __init__(self, factory: Callable[[], T]) -> None:
+        object.__setattr__(self, "_lazy_factory", factory)
+        object.__setattr__(self, "_lazy_instance", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _lazy_resolve(self) -> T:
+        instance = self._lazy_instance
+        if instance is None:
+            with self._lazy_lock:
+                instance = self._lazy_instance
+                if instance is None:
+                    instance = self._lazy_factory()
+                    object.__setattr__(self, "_lazy_instance", instance)
+        return instance
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._lazy_resolve(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._lazy_resolve(), name, value)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._lazy_resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        if self._lazy_instance is None:
+            return f"<LazyProxy of {self._lazy_factory!r} (not built)>"
+        return repr(self._lazy_instance)
+
+
+def unwrap(obj: Any) -> Any:
+    return obj._lazy_resolve() if isinstance(obj, LazyProxy) else obj
+
+
+def is_built(obj: Any) -> bool:
+    return not isinstance(obj, LazyProxy) or obj._lazy_instance is not None
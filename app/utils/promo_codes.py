@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import csv
+from itertools import islice
+from typing import Iterable, Iterator
+
+
+CSV_HEADER_CELLS = {"code", "codes", "promo_code", "promocode", "промокод"}
+
+
+def parse_code_line(line: str) -> str | None:
+    """
+    `80 88151262` and `8088151262` are the same code: whitespace inside a line is dropped.
+    """
+    parts = line.strip().split()
+    if not parts:
+        return None
+    return "".join(parts)
+
+
+def iter_codes(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        code = parse_code_line(line)
+        if code:
+            yield code
+
+
+def iter_csv_codes(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Takes the code from the first column; a header row is skipped.
+    """
+    for index, row in enumerate(csv.reader(lines)):
+        if not row:
+            continue
+        code = parse_code_line(row[0])
+        if not code:
+            continue
+        if index == 0 and code.lower() in CSV_HEADER_CELLS:
+            continue
+        yield code
+
+
+def parse_codes(raw: str) -> list[str]:
+    return list(iter_codes(raw.splitlines()))
+
+
+def batched(items: Iterable[str], size: int) -> Iterator[list[str]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
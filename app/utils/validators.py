@@ -1,11 +1,34 @@
 from __future__ import annotations
 
+from functools import lru_cache
 import logging
 from email_validator import validate_email, EmailNotValidError
 
 
 log = logging.getLogger(__name__)
 
+# Repeat submissions ("проверить ещё раз") hit the cache instead of the full validator.
+EMAIL_CACHE_SIZE = 10_000
+
+
+def looks_like_email(raw: str) -> bool:
+    """
+    Cheap syntactic pre-filter: False only for text that validate_email would reject anyway
+    (no "@", whitespace inside, no dot in the domain), so it never changes the outcome.
+    """
+    local, at, domain = raw.rpartition("@")
+    if not at or not local or "." not in domain:
+        return False
+    return not any(ch.isspace() for ch in raw)
+
+
+@lru_cache(maxsize=EMAIL_CACHE_SIZE)
+def _validate_cached(raw: str) -> str | None:
+    try:
+        return validate_email(raw, check_deliverability=False).normalized
+    except EmailNotValidError:
+        return None
+
 
 def normalize_email(raw: str) -> str:
     raw = (raw or "").strip()
@@ -13,11 +36,10 @@ def normalize_email(raw: str) -> str:
         log.warning("Empty email string received")
         raise ValueError("Пустой email")
 
-    try:
-        v = validate_email(raw, check_deliverability=False)
-    except EmailNotValidError as e:
+    normalized = _validate_cached(raw) if looks_like_email(raw) else None
+    if normalized is None:
         log.warning("Email validation failed", extra={"email": raw})
-        raise ValueError("Некорректный email") from e
+        raise ValueError("Некорректный email")
 
-    log.debug("Email normalized", extra={"email": v.normalized})
-    return v.normalized
+    log.debug("Email normalized", extra={"email": normalized})
+    return normalized
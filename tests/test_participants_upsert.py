@@ -0,0 +1,130 @@
+"""
+ParticipantRepo.create_if_missing under concurrent duplicate submissions: every call returns
+without an IntegrityError and the rules hold (one row per email, one row per telegram_id).
+"""
+from __future__ import annotations
+
+import asyncio
+import uuid
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from app.repositories.campaigns import CampaignRepo
+from app.repositories.participants import ParticipantRepo
+
+
+CONCURRENCY = 20
+TELEGRAM_ID_BASE = 9_000_000_000
+
+
+async def with_campaign(url: str, body: Callable[[AsyncEngine, int], Awaitable[None]]) -> None:
+    """
+    Runs `body` against a scratch campaign with its own partitions, dropped afterwards.
+    """
+    engine = create_async_engine(url, pool_size=CONCURRENCY, max_overflow=0)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    slug = f"test-{uuid.uuid4().hex[:12]}"
+    async with sessions() as session:
+        async with session.begin():
+            campaign = await CampaignRepo.create(session, slug, f"Test {slug}", None, None)
+            await CampaignRepo.create_partitions(session, campaign.id)
+    try:
+        await body(engine, campaign.id)
+    finally:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            detached = await CampaignRepo.detach_partitions(conn, campaign.id)
+            for table in detached:
+                await conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            await conn.execute(text("DELETE FROM campaigns WHERE id = :id"), {"id": campaign.id})
+        await engine.dispose()
+
+
+async def submit_all(engine: AsyncEngine, campaign_id: int, submissions: list[tuple[int, str]]) -> list[int]:
+    """
+    Each submission in its own transaction, as in email_flow; all start at once.
+    """
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    start = asyncio.Event()
+
+    async def submit(telegram_id: int, email: str) -> int:
+        async with sessions() as session:
+            async with session.begin():
+                # the connection is checked out before the start signal, so the upserts really overlap
+                await session.execute(text("SELECT 1"))
+                await start.wait()
+                participant = await ParticipantRepo.create_if_missing(session, campaign_id, telegram_id, email)
+                return participant.id
+
+    tasks = [asyncio.create_task(submit(telegram_id, email)) for telegram_id, email in submissions]
+    await asyncio.sleep(0.2)
+    start.set()
+    return await asyncio.gather(*tasks)
+
+
+async def count(engine: AsyncEngine, query: str, **params: object) -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(text(query), params)).scalar_one()
+
+
+def test_same_email_from_different_users(database_url: str) -> None:
+    async def body(engine: AsyncEngine, campaign_id: int) -> None:
+        emails = ["same@example.com", "Same@Example.com", "SAME@EXAMPLE.COM"]
+        submissions = [(TELEGRAM_ID_BASE + i, emails[i % len(emails)]) for i in range(CONCURRENCY)]
+        ids = await submit_all(engine, campaign_id, submissions)
+        # first owner wins: everyone gets the same participant
+        assert len(set(ids)) == 1
+        rows = await count(
+            engine,
+            "SELECT count(*) FROM participants WHERE campaign_id = :c AND lower(email) = 'same@example.com'",
+            c=campaign_id,
+        )
+        assert rows == 1
+        assert await count(engine, "SELECT count(*) FROM participants WHERE campaign_id = :c", c=campaign_id) == 1
+
+    asyncio.run(with_campaign(database_url, body))
+
+
+def test_same_user_with_different_emails(database_url: str) -> None:
+    async def body(engine: AsyncEngine, campaign_id: int) -> None:
+        submissions = [(TELEGRAM_ID_BASE, f"user{i}@example.com") for i in range(CONCURRENCY)]
+        ids = await submit_all(engine, campaign_id, submissions)
+        assert len(set(ids)) == 1
+        rows = await count(
+            engine,
+            "SELECT count(*) FROM participants WHERE campaign_id = :c AND telegram_id = :t",
+            c=campaign_id,
+            t=TELEGRAM_ID_BASE,
+        )
+        assert rows == 1
+        assert await count(engine, "SELECT count(*) FROM participants WHERE campaign_id = :c", c=campaign_id) == 1
+
+    asyncio.run(with_campaign(database_url, body))
+
+
+def test_email_change_racing_a_new_owner(database_url: str) -> None:
+    """
+    Existing users switch to an email that new users submit at the same time: the UPDATE branch
+    collides with the concurrent INSERT and create_if_missing has to retry past the unique violation.
+    """
+    async def body(engine: AsyncEngine, campaign_id: int) -> None:
+        existing = [(TELEGRAM_ID_BASE + i, f"old{i}@example.com") for i in range(CONCURRENCY // 2)]
+        await submit_all(engine, campaign_id, existing)
+        shared = "contested@example.com"
+        newcomers = [(TELEGRAM_ID_BASE + 1000 + i, shared) for i in range(CONCURRENCY // 2)]
+        ids = await submit_all(engine, campaign_id, [(telegram_id, shared) for telegram_id, _ in existing] + newcomers)
+        assert len(set(ids)) == 1
+        rows = await count(
+            engine,
+            "SELECT count(*) FROM participants WHERE campaign_id = :c AND lower(email) = :e",
+            c=campaign_id,
+            e=shared,
+        )
+        assert rows == 1
+        # the losers keep their old rows, the newcomers other than the owner get none
+        total = await count(engine, "SELECT count(*) FROM participants WHERE campaign_id = :c", c=campaign_id)
+        assert total in (len(existing), len(existing) + 1)
+
+    asyncio.run(with_campaign(database_url, body))
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+import asyncio
+
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.migrations.runner import check_plans
+
+
+async def plan_problems(url: str) -> list[str]:
+    engine = create_async_engine(url)
+    try:
+        return await check_plans(engine)
+    finally:
+        await engine.dispose()
+
+
+def test_hot_path_queries_use_their_indexes(database_url: str) -> None:
+    # the promo claim, the cinema winners count and the email lookup: any Seq Scan fails
+    assert asyncio.run(plan_problems(database_url)) == []
@@ -0,0 +1,111 @@
+"""
+TrafficRecorder.anonymize keeps nothing personal from what users can send besides text:
+contacts, forwarded messages and documents come out without phone numbers, names,
+usernames or file names.
+"""
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import recorder
+from app.services.recorder import TrafficRecorder
+
+
+PHONE = "+79991234567"
+SECRETS = [PHONE, "79991234567", "Ivan", "Petrov", "ivan_petrov", "Maria", "Sidorova", "masha_s", "passport_scan.pdf"]
+USER = {"id": 123456789, "is_bot": False, "first_name": "Ivan", "last_name": "Petrov", "username": "ivan_petrov"}
+CHAT = {"id": 123456789, "type": "private", "first_name": "Ivan", "last_name": "Petrov", "username": "ivan_petrov"}
+
+
+@pytest.fixture(autouse=True)
+def record_salt(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(recorder, "settings", SimpleNamespace(record_salt="test-salt"))
+
+
+def message(**content: object) -> dict:
+    return {
+        "update_id": 1,
+        "message": {"message_id": 10, "date": 1700000000, "chat": CHAT, "from": USER, **content},
+    }
+
+
+def assert_clean(payload: dict | None) -> None:
+    dumped = json.dumps(payload, ensure_ascii=False)
+    for secret in SECRETS:
+        assert secret not in dumped
+    assert str(USER["id"]) not in dumped
+
+
+def test_contact_is_dropped() -> None:
+    payload = TrafficRecorder.anonymize(
+        message(contact={"phone_number": PHONE, "first_name": "Maria", "last_name": "Sidorova", "user_id": 42})
+    )
+    assert_clean(payload)
+    assert "contact" not in payload["message"]
+
+
+def test_forwarded_message_keeps_only_masked_text() -> None:
+    payload = TrafficRecorder.anonymize(
+        message(
+            text=f"my number is {PHONE}",
+            forward_origin={
+                "type": "user",
+                "date": 1699999999,
+                "sender_user": {
+                    "id": 42,
+                    "is_bot": False,
+                    "first_name": "Maria",
+                    "last_name": "Sidorova",
+                    "username": "masha_s",
+                },
+            },
+        )
+    )
+    assert_clean(payload)
+    assert set(payload["message"]) == {"message_id", "date", "chat", "from", "text"}
+
+
+def test_document_is_dropped() -> None:
+    payload = TrafficRecorder.anonymize(
+        message(
+            document={"file_id": "AAA", "file_unique_id": "BBB", "file_name": "passport_scan.pdf"},
+            caption="Ivan Petrov",
+        )
+    )
+    assert_clean(payload)
+    assert set(payload["message"]) == {"message_id", "date", "chat", "from"}
+
+
+def test_callback_query_keeps_the_flow_fields() -> None:
+    payload = TrafficRecorder.anonymize(
+        {
+            "update_id": 2,
+            "callback_query": {
+                "id": "777",
+                "from": USER,
+                "chat_instance": "-123456",
+                "data": "check_again",
+                "message": {"message_id": 11, "date": 1700000001, "chat": CHAT, "text": "Ivan, не подтверждено"},
+            },
+        }
+    )
+    assert_clean(payload)
+    query = payload["callback_query"]
+    assert query["data"] == "check_again"
+    assert query["from"]["id"] == TrafficRecorder.hash_id(USER["id"])
+    assert set(query["message"]) == {"message_id", "date", "chat"}
+
+
+def test_email_is_hashed_and_commands_kept() -> None:
+    email = TrafficRecorder.anonymize(message(text="Ivan.Petrov@example.com"))
+    assert email["message"]["text"] == TrafficRecorder.hash_email("ivan.petrov@example.com")
+    assert_clean(email)
+    command = TrafficRecorder.anonymize(message(text="/start spring"))
+    assert command["message"]["text"] == "/start spring"
+
+
+def test_other_update_types_are_not_recorded() -> None:
+    assert TrafficRecorder.anonymize({"update_id": 3, "my_chat_member": {"chat": CHAT, "from": USER}}) is None